@@ -0,0 +1,153 @@
+"""Local stand-in for the Anthropic Messages API that replays recorded cassettes.
+
+Record cassettes by running the backend with AI_TRANSPORT=record, then start
+this server and point the backend at it with ANTHROPIC_BASE_URL (any
+ANTHROPIC_API_KEY works) to measure planning throughput offline:
+
+    python ai_replay_server.py --port 8090 --latency-ms 800 --chunk-delay-ms 20 \\
+        --error-rate 0.02 --max-concurrency 50
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import argparse
+import asyncio
+import json
+import random
+import uuid
+
+from app.core.config import settings
+from app.services.ai_transport import CassetteStore, cassette_key
+
+app = FastAPI(title="PC Succession AI Replay Server")
+
+config = {
+    "latency_ms": settings.AI_REPLAY_LATENCY_MS,
+    "chunk_delay_ms": settings.AI_REPLAY_CHUNK_DELAY_MS,
+    "error_rate": settings.AI_REPLAY_ERROR_RATE,
+    "fallback": settings.AI_REPLAY_FALLBACK,
+    "max_concurrency": 0,
+}
+store = CassetteStore()
+stats = {
+    "requests": 0,
+    "served": 0,
+    "missing": 0,
+    "errors_injected": 0,
+    "rate_limited": 0,
+    "active": 0,
+    "peak_active": 0,
+}
+
+
+def error_response(status_code: int, error_type: str, message: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"type": "error", "error": {"type": error_type, "message": message}}
+    )
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps({'type': event, **data})}\n\n"
+
+
+@app.post("/v1/messages")
+async def create_message(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+
+    if config["max_concurrency"] and stats["active"] >= config["max_concurrency"]:
+        stats["rate_limited"] += 1
+        return error_response(429, "rate_limit_error", "Replay server concurrency limit reached")
+
+    key = cassette_key(body["model"], body["max_tokens"], body["messages"])
+    cassette = store.find(key, config["fallback"])
+    if cassette is None:
+        stats["missing"] += 1
+        return error_response(404, "not_found_error", f"No cassette recorded for request {key}")
+
+    stats["active"] += 1
+    stats["peak_active"] = max(stats["peak_active"], stats["active"])
+    try:
+        await asyncio.sleep(config["latency_ms"] / 1000)
+        if random.random() < config["error_rate"]:
+            stats["errors_injected"] += 1
+            return error_response(529, "overloaded_error", "Injected replay error")
+    except BaseException:
+        stats["active"] -= 1
+        raise
+
+    usage = cassette.get("usage") or {}
+    message = {
+        "id": f"msg_replay_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": body["model"],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {
+            "input_tokens": usage.get("input_tokens", 0),
+            "output_tokens": usage.get("output_tokens", 0)
+        }
+    }
+
+    if not body.get("stream"):
+        stats["active"] -= 1
+        stats["served"] += 1
+        text = "".join(cassette["chunks"])
+        return {**message, "content": [{"type": "text", "text": text}]}
+
+    async def events():
+        try:
+            yield sse("message_start", {"message": {
+                **message,
+                "content": [],
+                "stop_reason": None,
+                "usage": {"input_tokens": message["usage"]["input_tokens"], "output_tokens": 0}
+            }})
+            yield sse("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+            for chunk in cassette["chunks"]:
+                if config["chunk_delay_ms"]:
+                    await asyncio.sleep(config["chunk_delay_ms"] / 1000)
+                yield sse("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": chunk}})
+            yield sse("content_block_stop", {"index": 0})
+            yield sse("message_delta", {
+                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                "usage": {"output_tokens": message["usage"]["output_tokens"]}
+            })
+            yield sse("message_stop", {})
+            stats["served"] += 1
+        finally:
+            stats["active"] -= 1
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+async def get_stats():
+    return {**stats, "cassettes": len(store.keys()), "config": config}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--cassette-dir", default=settings.AI_CASSETTE_DIR)
+    parser.add_argument("--latency-ms", type=int, default=config["latency_ms"])
+    parser.add_argument("--chunk-delay-ms", type=int, default=config["chunk_delay_ms"])
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"])
+    parser.add_argument("--fallback", choices=["error", "any"], default=config["fallback"])
+    parser.add_argument("--max-concurrency", type=int, default=0,
+                        help="Reject requests with 429 above this many in flight (0 = unlimited)")
+    args = parser.parse_args()
+
+    store = CassetteStore(args.cassette_dir)
+    config.update(
+        latency_ms=args.latency_ms,
+        chunk_delay_ms=args.chunk_delay_ms,
+        error_rate=args.error_rate,
+        fallback=args.fallback,
+        max_concurrency=args.max_concurrency,
+    )
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,117 @@
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from typing import Optional
+import time
+
+from app.core.config import settings
+from app.core.security import decode_access_token
+from app.core.ttl_cache import TTLCache
+from app.db.session import get_db
+from app.models.user import User
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
+
+
+class CurrentUser(BaseModel):
+    """The authenticated user and the tenant they belong to"""
+    id: str
+    email: str
+    full_name: Optional[str] = None
+    company_id: Optional[str] = None
+    is_superuser: bool = False
+
+
+# Token -> user id, kept until the token expires
+_tokens = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES)
+# User id -> CurrentUser, kept for AUTH_CACHE_TTL_SECONDS
+_principals = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES)
+
+
+def invalidate_user(user_id: str):
+    """Drop a user's cached principal so their next request re-reads the user
+
+    Call this whenever a user is deactivated or their tenant or role changes.
+    Other worker processes pick the change up within AUTH_CACHE_TTL_SECONDS.
+    """
+    _principals.pop(user_id)
+
+
+def clear_auth_cache():
+    _tokens.clear()
+    _principals.clear()
+
+
+def _credentials_error() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> CurrentUser:
+    """Resolve the bearer token to the active user it was issued to
+
+    Decoded tokens and user principals are cached, so an authenticated
+    request only touches the database when its user isn't cached.
+    """
+    user_id = _tokens.get(token)
+    if user_id is None:
+        try:
+            payload = decode_access_token(token)
+        except JWTError:
+            raise _credentials_error()
+        user_id = payload.get("sub")
+        if not user_id:
+            raise _credentials_error()
+        _tokens.set(token, user_id, float(payload.get("exp") or time.time()))
+
+    principal = _principals.get(user_id)
+    if principal is None:
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user or not user.is_active:
+            raise _credentials_error()
+        principal = CurrentUser(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            company_id=user.company_id,
+            is_superuser=bool(user.is_superuser)
+        )
+        _principals.set(user_id, principal, time.time() + settings.AUTH_CACHE_TTL_SECONDS)
+    return principal
+
+
+async def get_current_superuser(current_user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough privileges")
+    return current_user
+
+
+def company_scope(current_user: CurrentUser, company_id: Optional[str] = None) -> Optional[str]:
+    """The company a request acts on: the one asked for, or the user's own
+
+    Superusers may name any company, or none for all of them. Other users
+    are confined to their own company and get a 403 for any other, or for
+    everything when they belong to none.
+    """
+    if current_user.is_superuser:
+        return company_id
+    if not current_user.company_id or (company_id and company_id != current_user.company_id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed for this company")
+    return current_user.company_id
+
+
+def check_company_access(current_user: CurrentUser, company_id: Optional[str]):
+    """403 unless the user may act on a record of ``company_id``
+
+    Records of no company are for superusers only.
+    """
+    if not current_user.is_superuser and (not current_user.company_id or company_id != current_user.company_id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed for this company")
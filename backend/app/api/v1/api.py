@@ -1,12 +1,23 @@
-from fastapi import APIRouter
-from app.api.v1.endpoints import agents, companies, users, migrations, auth
+from fastapi import APIRouter, Depends
+from app.api.deps import get_current_superuser, get_current_user
+from app.api.v1.endpoints import agents, companies, users, migrations, auth, fleet, dashboard, debug
+from app.core.config import settings
 
 api_router = APIRouter()
 
+# Machines report to the agents router without a user token, so it guards its dashboard routes itself
+authenticated = [Depends(get_current_user)]
+
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
-api_router.include_router(companies.router, prefix="/companies", tags=["companies"])
-api_router.include_router(users.router, prefix="/users", tags=["users"])
+api_router.include_router(companies.router, prefix="/companies", tags=["companies"], dependencies=authenticated)
+api_router.include_router(users.router, prefix="/users", tags=["users"], dependencies=authenticated)
 api_router.include_router(agents.router, prefix="/agents", tags=["agents"])
-api_router.include_router(migrations.router, prefix="/migrations", tags=["migrations"])
-
+api_router.include_router(migrations.router, prefix="/migrations", tags=["migrations"], dependencies=authenticated)
+api_router.include_router(fleet.router, prefix="/fleet", tags=["fleet"], dependencies=authenticated)
+api_router.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"], dependencies=authenticated)
 
+if settings.SQL_PROFILING_ENABLED:
+    # Profiles hold every tenant's SQL
+    api_router.include_router(
+        debug.router, prefix="/debug", tags=["debug"], dependencies=[Depends(get_current_superuser)]
+    )
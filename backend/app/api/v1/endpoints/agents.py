@@ -1,12 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Header, Request, UploadFile
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
+import csv
+import io
 
-from app.db.session import get_db
+from app.api.deps import CurrentUser, check_company_access, company_scope, get_current_user
+from app.core.cache import cache
+from app.core.config import settings
+from app.db.partitioning import tenant_key
+from app.db.session import SessionLocal, get_db, get_read_db
 from app.models.agent import Agent, AgentStatus
+from app.models.dashboard import MANAGED_DATA_MB, adjust_counters
 from app.models.inventory import Inventory
-from app.schemas.agent import AgentResponse, AgentCreate, InventoryCreate, MetricsCreate
+from app.models.metrics import MetricsSample
+from app.schemas.agent import (
+    AgentResponse, AgentCreate, AgentIdentity, AgentProvision, InventoryCreate, MetricsCreate, FileManifest
+)
+from app.services.dedup_service import DedupIndex
+from app.services.inventory_diff import MigrationVerifier
+from app.services.plan_reuse import PlanReuseService
+from app.services.provisioning_service import AgentProvisioningService
+from app.services.usage_analytics import UsageAnalytics
 
 router = APIRouter()
 
@@ -15,12 +32,18 @@ router = APIRouter()
 async def list_agents(
     company_id: Optional[str] = None,
     status: Optional[AgentStatus] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    """List all agents, optionally filtered by company and status"""
+    """List agents, optionally filtered by status
+
+    Superusers see every company's agents unless they name one; other users
+    only their own company's.
+    """
     query = db.query(Agent)
     
-    if company_id:
+    company_id = company_scope(current_user, company_id)
+    if company_id or not current_user.is_superuser:
         query = query.filter(Agent.company_id == company_id)
     if status:
         query = query.filter(Agent.status == status)
@@ -29,52 +52,125 @@ async def list_agents(
     return agents
 
 
+async def owned_agent(db: Session, agent_id: str, current_user: CurrentUser) -> dict:
+    """The cached agent, if the user may act on its company"""
+    def load():
+        agent = db.query(Agent).filter(Agent.id == agent_id).first()
+        return AgentResponse.model_validate(agent).model_dump(mode="json") if agent else None
+    
+    agent = await cache.get_or_load("agent", agent_id, load, settings.CACHE_AGENT_TTL_SECONDS)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    check_company_access(current_user, agent["company_id"])
+    return agent
+
+
 @router.get("/{agent_id}", response_model=AgentResponse)
-async def get_agent(agent_id: str, db: Session = Depends(get_db)):
+async def get_agent(
+    agent_id: str,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
     """Get details of a specific agent"""
+    return await owned_agent(db, agent_id, current_user)
+
+
+@router.get("/{agent_id}/usage", response_model=dict)
+async def get_agent_usage(
+    agent_id: str,
+    days: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Classify an agent's installed applications as active, rare or dead"""
     agent = db.query(Agent).filter(Agent.id == agent_id).first()
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
-    return agent
+    check_company_access(current_user, agent.company_id)
+    inventory = db.query(Inventory).filter(
+        Inventory.company_id == tenant_key(agent.company_id),
+        Inventory.agent_id == agent_id
+    ).order_by(Inventory.timestamp.desc()).first()
+    if not inventory:
+        raise HTTPException(status_code=404, detail="No inventory found for agent")
+    return UsageAnalytics(db).classify(inventory, days)
 
 
 @router.post("/register", response_model=AgentResponse)
 async def register_agent(
     agent: AgentCreate,
+    request: Request,
     x_agent_id: str = Header(...),
     db: Session = Depends(get_db)
 ):
-    """Register a new agent"""
-    # Check if agent already exists
-    existing = db.query(Agent).filter(Agent.agent_id == x_agent_id).first()
-    if existing:
-        # Update last seen
-        existing.last_seen = datetime.utcnow()
-        existing.status = AgentStatus.ACTIVE
-        db.commit()
-        db.refresh(existing)
-        return existing
-    
-    # Create new agent
-    db_agent = Agent(
-        agent_id=x_agent_id,
-        computer_name=agent.computer_name,
-        user_name=agent.user_name,
-        os_version=agent.os_version,
-        company_id=agent.company_id,
-        status=AgentStatus.ACTIVE,
-        last_seen=datetime.utcnow()
-    )
+    """Register a new agent, or mark a known or provisioned one active"""
+    # The address the agent connects from places it in a site for wave scheduling
+    ip_address = request.client.host if request.client else None
+    return AgentProvisioningService(db).register(x_agent_id, agent.model_dump(), ip_address)
+
+
+def _provision(db: Session, current_user: CurrentUser, identities: List[dict], company_id: Optional[str]) -> dict:
+    """Provision for the user's company, or for any as a superuser"""
+    company_id = company_scope(current_user, company_id)
+    for identity in identities:
+        company_scope(current_user, identity.get("company_id"))
+    try:
+        return AgentProvisioningService(db).provision(
+            identities, company_id, own_company_only=not current_user.is_superuser
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/provision", response_model=dict)
+async def provision_agents(
+    provision: AgentProvision,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Pre-register machines in bulk before their agents first report
+
+    Users other than superusers provision into their own company only.
+    """
+    identities = [identity.model_dump() for identity in provision.agents]
+    return _provision(db, current_user, identities, provision.company_id)
+
+
+@router.post("/provision/csv", response_model=dict)
+async def provision_agents_csv(
+    file: UploadFile = File(...),
+    company_id: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Pre-register machines from a CSV file
+
+    The header names the columns: agent_id, and optionally computer_name,
+    user_name, os_version, company_id and site.
+    """
+    reader = csv.DictReader(io.StringIO((await file.read()).decode("utf-8-sig")))
+    if "agent_id" not in (reader.fieldnames or []):
+        raise HTTPException(status_code=400, detail="The CSV needs an agent_id column")
     
-    db.add(db_agent)
-    db.commit()
-    db.refresh(db_agent)
-    return db_agent
+    identities = []
+    for line, row in enumerate(reader, start=2):
+        try:
+            identity = AgentIdentity(**{
+                key: value.strip() or None
+                for key, value in row.items()
+                if key in AgentIdentity.model_fields and value is not None
+            })
+        except ValidationError as e:
+            raise HTTPException(status_code=400, detail=f"Line {line}: {e.errors()[0]['msg']}")
+        identities.append(identity.model_dump())
+    
+    return _provision(db, current_user, identities, company_id)
 
 
 @router.post("/inventory")
 async def receive_inventory(
     inventory: InventoryCreate,
+    background_tasks: BackgroundTasks,
     x_agent_id: str = Header(...),
     db: Session = Depends(get_db)
 ):
@@ -87,9 +183,16 @@ async def receive_inventory(
     # Update agent last seen
     agent.last_seen = datetime.utcnow()
     
+    # The new inventory replaces the previous one in the managed data total
+    previous = db.query(Inventory.total_data_size_mb).filter(
+        Inventory.company_id == tenant_key(agent.company_id),
+        Inventory.agent_id == agent.id
+    ).order_by(Inventory.timestamp.desc()).first()
+    
     # Create inventory record
     db_inventory = Inventory(
         agent_id=agent.id,
+        company_id=tenant_key(agent.company_id),
         system_info=inventory.system_info,
         installed_applications=inventory.installed_applications,
         registry_settings=inventory.registry_settings,
@@ -104,11 +207,45 @@ async def receive_inventory(
     )
     
     db.add(db_inventory)
+    db.flush()
+    PlanReuseService(db).index_inventory(db_inventory)
+    adjust_counters(db.connection(), {
+        (db_inventory.company_id, MANAGED_DATA_MB): db_inventory.total_data_size_mb - ((previous and previous[0]) or 0)
+    })
     db.commit()
+    cache.invalidate("agent", agent.id)
+    cache.invalidate("inventory", agent.id)
+    
+    # Re-check migrations to this machine against its new state, after the agent has its response
+    background_tasks.add_task(verify_migrations_to, agent.id)
     
     return {"message": "Inventory received successfully"}
 
 
+def verify_migrations_to(target_agent_id: str):
+    """Background task re-verifying the completed migrations to a machine"""
+    db = SessionLocal()
+    try:
+        MigrationVerifier(db).verify_target(target_agent_id)
+    finally:
+        db.close()
+
+
+@router.post("/files")
+async def receive_file_manifest(
+    manifest: FileManifest,
+    x_agent_id: str = Header(...),
+    db: Session = Depends(get_db)
+):
+    """Receive the content hashes of an agent's user data files"""
+    agent = db.query(Agent).filter(Agent.agent_id == x_agent_id).first()
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    
+    stats = DedupIndex(db).index_files(agent.id, [entry.model_dump() for entry in manifest.files])
+    return {"message": "File manifest received successfully", **stats}
+
+
 @router.post("/metrics")
 async def receive_metrics(
     metrics: MetricsCreate,
@@ -123,10 +260,22 @@ async def receive_metrics(
     
     # Update agent last seen
     agent.last_seen = datetime.utcnow()
+    
+    # Keep the performance and usage history for sizing and usage analytics
+    performance = metrics.system_performance or {}
+    db.add(MetricsSample(
+        agent_id=agent.id,
+        company_id=tenant_key(agent.company_id),
+        cpu_usage_percent=performance.get("cpu_usage_percent"),
+        memory_usage_percent=performance.get("memory_usage_percent"),
+        disk_usage_percent=performance.get("disk_usage_percent"),
+        application_usage=metrics.application_usage
+    ))
     db.commit()
     
     # Find latest inventory and update with metrics
     latest_inventory = db.query(Inventory).filter(
+        Inventory.company_id == tenant_key(agent.company_id),
         Inventory.agent_id == agent.id
     ).order_by(Inventory.timestamp.desc()).first()
     
@@ -135,6 +284,8 @@ async def receive_metrics(
         latest_inventory.file_access = metrics.file_access
         latest_inventory.system_performance = metrics.system_performance
         db.commit()
+    cache.invalidate("agent", agent.id)
+    cache.invalidate("inventory", agent.id)
     
     return {"message": "Metrics received successfully"}
 
@@ -153,36 +304,37 @@ async def get_commands(
 @router.get("/{agent_id}/inventory", response_model=dict)
 async def get_agent_inventory(
     agent_id: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Get the latest inventory for an agent"""
-    agent = db.query(Agent).filter(Agent.id == agent_id).first()
-    if not agent:
-        raise HTTPException(status_code=404, detail="Agent not found")
+    agent = await owned_agent(db, agent_id, current_user)
     
-    inventory = db.query(Inventory).filter(
-        Inventory.agent_id == agent_id
-    ).order_by(Inventory.timestamp.desc()).first()
+    def load():
+        inventory = db.query(Inventory).filter(
+            Inventory.company_id == tenant_key(agent["company_id"]),
+            Inventory.agent_id == agent_id
+        ).order_by(Inventory.timestamp.desc()).first()
+        
+        if not inventory:
+            raise HTTPException(status_code=404, detail="No inventory found")
+        
+        return jsonable_encoder({
+            "id": inventory.id,
+            "timestamp": inventory.timestamp,
+            "system_info": inventory.system_info,
+            "installed_applications": inventory.installed_applications,
+            "registry_settings": inventory.registry_settings,
+            "certificates": inventory.certificates,
+            "vpn_connections": inventory.vpn_connections,
+            "user_data_locations": inventory.user_data_locations,
+            "application_usage": inventory.application_usage,
+            "file_access": inventory.file_access,
+            "system_performance": inventory.system_performance,
+            "stats": {
+                "total_applications": inventory.total_applications,
+                "total_data_size_mb": inventory.total_data_size_mb
+            }
+        })
     
-    if not inventory:
-        raise HTTPException(status_code=404, detail="No inventory found")
-    
-    return {
-        "id": inventory.id,
-        "timestamp": inventory.timestamp,
-        "system_info": inventory.system_info,
-        "installed_applications": inventory.installed_applications,
-        "registry_settings": inventory.registry_settings,
-        "certificates": inventory.certificates,
-        "vpn_connections": inventory.vpn_connections,
-        "user_data_locations": inventory.user_data_locations,
-        "application_usage": inventory.application_usage,
-        "file_access": inventory.file_access,
-        "system_performance": inventory.system_performance,
-        "stats": {
-            "total_applications": inventory.total_applications,
-            "total_data_size_mb": inventory.total_data_size_mb
-        }
-    }
-
-
+    return await cache.get_or_load("inventory", agent_id, load, settings.CACHE_INVENTORY_TTL_SECONDS)
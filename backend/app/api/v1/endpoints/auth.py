@@ -1,16 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
 
 from app.db.session import get_db
 from app.models.user import User
-from app.core.security import create_access_token, verify_password
+from app.core.security import create_access_token, password_hasher, PasswordHasherBusy
 from app.core.config import settings
 from app.schemas.auth import Token
 
 router = APIRouter()
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
 
 @router.post("/login", response_model=Token)
@@ -20,7 +19,17 @@ async def login(
 ):
     """OAuth2 compatible token login"""
     user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    try:
+        valid, new_hash = await password_hasher.verify(
+            form_data.password, user.hashed_password if user else None
+        )
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many logins in progress, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -33,6 +42,11 @@ async def login(
             detail="Inactive user"
         )
     
+    # The stored hash was made at a different BCRYPT_ROUNDS; upgrade it
+    if new_hash:
+        user.hashed_password = new_hash
+        db.commit()
+    
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         subject=user.id, expires_delta=access_token_expires
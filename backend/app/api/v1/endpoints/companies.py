@@ -2,9 +2,15 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
 
+from app.api.deps import (
+    CurrentUser, check_company_access, company_scope, get_current_superuser, get_current_user, invalidate_user
+)
+from app.core.cache import cache
+from app.core.config import settings
 from app.db.session import get_db
 from app.models.company import Company
 from app.schemas.company import CompanyCreate, CompanyResponse
+from app.services.tenant_service import TenantService
 
 router = APIRouter()
 
@@ -38,19 +44,51 @@ async def create_company(
 async def list_companies(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    """List all companies"""
-    companies = db.query(Company).offset(skip).limit(limit).all()
+    """List all companies for superusers, or the user's own"""
+    query = db.query(Company)
+    if not current_user.is_superuser:
+        query = query.filter(Company.id == company_scope(current_user))
+    companies = query.offset(skip).limit(limit).all()
     return companies
 
 
 @router.get("/{company_id}", response_model=CompanyResponse)
-async def get_company(company_id: str, db: Session = Depends(get_db)):
+async def get_company(
+    company_id: str,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
     """Get company details"""
-    company = db.query(Company).filter(Company.id == company_id).first()
+    check_company_access(current_user, company_id)
+    def load():
+        company = db.query(Company).filter(Company.id == company_id).first()
+        return CompanyResponse.model_validate(company).model_dump(mode="json") if company else None
+    
+    company = await cache.get_or_load("company", company_id, load, settings.CACHE_COMPANY_TTL_SECONDS)
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
     return company
 
 
+@router.delete("/{company_id}")
+async def offboard_company(
+    company_id: str,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_superuser)
+):
+    """Offboard a company, deleting its agents, inventories, metrics, migrations and users"""
+    company = db.query(Company).filter(Company.id == company_id).first()
+    if not company:
+        raise HTTPException(status_code=404, detail="Company not found")
+    
+    result = TenantService(db).offboard(company)
+    for user_id in result["users"]:
+        invalidate_user(user_id)
+    cache.invalidate("company", company_id)
+    cache.invalidate("agent", *result["agents"])
+    cache.invalidate("inventory", *result["agents"])
+    
+    return {"message": "Company offboarded", "users_removed": len(result["users"])}
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from app.api.deps import CurrentUser, company_scope, get_current_superuser, get_current_user
+from app.db.session import get_db, get_read_db
+from app.services.dashboard_service import DashboardService
+
+router = APIRouter()
+
+
+@router.get("/summary", response_model=dict)
+async def get_dashboard_summary(
+    company_id: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Agent and migration totals, stale agents and managed data, for a company
+
+    Superusers get the whole fleet unless they name a company.
+    """
+    return DashboardService(db).summary(company_scope(current_user, company_id))
+
+
+@router.post("/rebuild", response_model=dict)
+async def rebuild_dashboard_counters(
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_superuser)
+):
+    """Recount the dashboard counters from the agents, migrations and inventories"""
+    return DashboardService(db).rebuild()
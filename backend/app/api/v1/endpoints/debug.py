@@ -0,0 +1,20 @@
+from fastapi import APIRouter, HTTPException
+
+from app.core.sql_profiler import get_report, recent_reports
+
+router = APIRouter()
+
+
+@router.get("/sql", response_model=list)
+async def list_sql_profiles(limit: int = 50):
+    """Query counts of the latest profiled requests"""
+    return recent_reports(limit)
+
+
+@router.get("/sql/{profile_id}", response_model=dict)
+async def get_sql_profile(profile_id: str):
+    """Every statement a profiled request ran, with repeated shapes flagged"""
+    report = get_report(profile_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return report
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from app.api.deps import CurrentUser, company_scope, get_current_user
+from app.db.session import get_read_db
+from app.services.sizing_service import FleetSizingService
+
+router = APIRouter()
+
+
+@router.get("/sizing", response_model=dict)
+async def get_fleet_sizing(
+    company_id: Optional[str] = None,
+    days: Optional[int] = None,
+    include_machines: bool = False,
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Get hardware sizing tiers for the user's company, or the fleet for superusers, from usage metrics"""
+    return FleetSizingService(db).fleet_report(
+        company_id=company_scope(current_user, company_id),
+        days=days,
+        include_machines=include_machines
+    )
@@ -1,36 +1,76 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
 from typing import List, Optional
 
-from app.db.session import get_db
+from app.api.deps import CurrentUser, check_company_access, company_scope, get_current_user
+from app.core.cache import cache
+from app.db.session import get_db, get_read_db
 from app.models.migration import Migration, MigrationStatus
 from app.models.agent import Agent
 from app.schemas.migration import (
-    MigrationCreate, MigrationResponse, MigrationUpdate
+    MigrationCreate, MigrationResponse, MigrationUpdate, WaveCreate
 )
+from app.core.config import settings
 from app.services.ai_service import AIService
+from app.services.dedup_service import DedupIndex
+from app.services.fast_planner import FastPlanner
+from app.services.inventory_diff import MigrationVerifier
+from app.services.migration_lease import run_token
+from app.services.migration_recovery import run_in_background
+from app.services.plan_reuse import PlanReuseService
+from app.services.task_events import TaskEventLog
+from app.services.task_graph import TaskGraph
 from app.services.migration_service import MigrationService
+from app.services.wave_scheduler import WaveScheduler
 
 router = APIRouter()
 
 
+def with_task_progress(migrations: List[Migration], db: Session) -> List[MigrationResponse]:
+    """Build responses, deriving progress of running migrations from their task events"""
+    running = [m for m in migrations if m.status == MigrationStatus.IN_PROGRESS]
+    progress = TaskEventLog(db).progress(running) if running else {}
+    return [
+        MigrationResponse.model_validate(m).model_copy(update=progress.get(m.id, {}))
+        for m in migrations
+    ]
+
+
+def owned_migration(db: Session, migration_id: str, current_user: CurrentUser) -> Migration:
+    """The migration, if the user may act on its company"""
+    migration = db.query(Migration).filter(Migration.id == migration_id).first()
+    if not migration:
+        raise HTTPException(status_code=404, detail="Migration not found")
+    check_company_access(current_user, migration.company_id)
+    return migration
+
+
 @router.post("/", response_model=MigrationResponse)
 async def create_migration(
     migration: MigrationCreate,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Create a new migration plan"""
     # Validate source agent exists
     source_agent = db.query(Agent).filter(Agent.id == migration.source_agent_id).first()
     if not source_agent:
         raise HTTPException(status_code=404, detail="Source agent not found")
+    check_company_access(current_user, source_agent.company_id)
+    if migration.target_agent_id:
+        target_agent = db.query(Agent).filter(Agent.id == migration.target_agent_id).first()
+        if not target_agent:
+            raise HTTPException(status_code=404, detail="Target agent not found")
+        check_company_access(current_user, target_agent.company_id)
     
     # Create migration
     db_migration = Migration(
         name=migration.name,
         source_agent_id=migration.source_agent_id,
         target_agent_id=migration.target_agent_id,
+        company_id=source_agent.company_id,
         status=MigrationStatus.PLANNING
     )
     
@@ -52,37 +92,137 @@ async def create_migration(
 async def list_migrations(
     company_id: Optional[str] = None,
     status: Optional[MigrationStatus] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    """List all migrations"""
+    """List the migrations of the user's company, or of any company for superusers"""
     query = db.query(Migration)
     
+    company_id = company_scope(current_user, company_id)
+    if company_id or not current_user.is_superuser:
+        query = query.filter(Migration.company_id == company_id)
     if status:
         query = query.filter(Migration.status == status)
     
     migrations = query.all()
-    return migrations
+    return with_task_progress(migrations, db)
+
+
+@router.post("/waves", response_model=dict)
+async def queue_wave(
+    wave: WaveCreate,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Queue READY migrations as a wave; they start as the wave limits allow"""
+    companies = db.query(Migration.company_id).filter(Migration.id.in_(wave.migration_ids)).distinct()
+    for (company_id,) in companies:
+        check_company_access(current_user, company_id)
+    
+    scheduler = WaveScheduler(db)
+    try:
+        scheduler.enqueue(wave.name, wave.migration_ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    scheduler.admit()
+    return scheduler.queue_report(wave=wave.name, company_id=company_scope(current_user))
+
+
+@router.get("/queue", response_model=dict)
+async def get_queue(
+    wave: Optional[str] = None,
+    company_id: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Get queued migrations in expected start order with ETAs"""
+    return WaveScheduler(db).queue_report(wave=wave, company_id=company_scope(current_user, company_id))
 
 
 @router.get("/{migration_id}", response_model=MigrationResponse)
-async def get_migration(migration_id: str, db: Session = Depends(get_db)):
+async def get_migration(
+    migration_id: str,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
     """Get migration details"""
-    migration = db.query(Migration).filter(Migration.id == migration_id).first()
+    def load():
+        migration = db.query(Migration).filter(Migration.id == migration_id).first()
+        return with_task_progress([migration], db)[0].model_dump(mode="json") if migration else None
+    
+    migration = await cache.get_or_load("migration", migration_id, load, settings.CACHE_MIGRATION_TTL_SECONDS)
     if not migration:
         raise HTTPException(status_code=404, detail="Migration not found")
+    check_company_access(current_user, migration["company_id"])
     return migration
 
 
+@router.get("/{migration_id}/transfer-plan", response_model=dict)
+async def get_transfer_plan(
+    migration_id: str,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Get the deduplicated data transfer computed when the migration was planned"""
+    migration = owned_migration(db, migration_id, current_user)
+    if migration.transfer_report is None:
+        raise HTTPException(status_code=404, detail="No transfer plan computed yet")
+    return migration.transfer_report
+
+
+@router.post("/{migration_id}/transfer-plan", response_model=dict)
+async def recompute_transfer_plan(
+    migration_id: str,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Recompute the deduplicated data transfer of a migration"""
+    migration = owned_migration(db, migration_id, current_user)
+    
+    migration.transfer_report = DedupIndex(db).transfer_plan(migration)
+    db.commit()
+    cache.invalidate("migration", migration_id)
+    return migration.transfer_report
+
+
+@router.get("/{migration_id}/verification", response_model=dict)
+async def get_verification(
+    migration_id: str,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Get the last diff of the source and target inventories of a migration"""
+    migration = owned_migration(db, migration_id, current_user)
+    if migration.verification_report is None:
+        raise HTTPException(status_code=404, detail="Migration not verified yet")
+    return migration.verification_report
+
+
+@router.post("/{migration_id}/verification", response_model=dict)
+async def verify_migration(
+    migration_id: str,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Diff the source and target inventories of a migration again"""
+    migration = owned_migration(db, migration_id, current_user)
+    
+    report = MigrationVerifier(db).verify(migration)
+    if report is None:
+        raise HTTPException(status_code=400, detail="Both machines need an inventory to verify the migration")
+    return report
+
+
 @router.patch("/{migration_id}", response_model=MigrationResponse)
 async def update_migration(
     migration_id: str,
     migration_update: MigrationUpdate,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Update migration status"""
-    migration = db.query(Migration).filter(Migration.id == migration_id).first()
-    if not migration:
-        raise HTTPException(status_code=404, detail="Migration not found")
+    migration = owned_migration(db, migration_id, current_user)
     
     if migration_update.status:
         migration.status = migration_update.status
@@ -93,19 +233,18 @@ async def update_migration(
     
     db.commit()
     db.refresh(migration)
+    cache.invalidate("migration", migration_id)
     return migration
 
 
 @router.post("/{migration_id}/start")
 async def start_migration(
     migration_id: str,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Start executing the migration"""
-    migration = db.query(Migration).filter(Migration.id == migration_id).first()
-    if not migration:
-        raise HTTPException(status_code=404, detail="Migration not found")
+    migration = owned_migration(db, migration_id, current_user)
     
     if migration.status != MigrationStatus.READY:
         raise HTTPException(
@@ -113,12 +252,20 @@ async def start_migration(
             detail="Migration must be in READY status to start"
         )
     
-    # Update status
+    # Update status and hand the lease to the run started below so the
+    # recovery sweep of any worker doesn't pick it up first. A new attempt
+    # runs every task again, whatever an earlier start left behind.
+    lease_owner = run_token()
     migration.status = MigrationStatus.IN_PROGRESS
+    migration.attempt = (migration.attempt or 0) + 1
+    migration.lease_owner = lease_owner
+    migration.lease_expires_at = datetime.utcnow() + timedelta(seconds=settings.MIGRATION_LEASE_SECONDS)
     db.commit()
+    cache.invalidate("migration", migration_id)
     
-    # Execute migration in background
-    background_tasks.add_task(execute_migration, migration_id)
+    # Execute migration in background; tracked like recovered runs, so this
+    # worker's recovery sweep never starts it a second time
+    run_in_background(migration_id, lease_owner)
     
     return {"message": "Migration started"}
 
@@ -129,22 +276,49 @@ async def generate_migration_plan(migration_id: str, source_agent_id: str):
     db = SessionLocal()
     
     try:
-        ai_service = AIService()
         migration_service = MigrationService(db)
         
+        migration = db.query(Migration).filter(Migration.id == migration_id).first()
+        
+        async def persist_task(task: dict):
+            # Make the partial plan visible while the rest is still streaming.
+            # Reassign the list so SQLAlchemy detects the JSON column change.
+            if migration:
+                migration.tasks = (migration.tasks or []) + [task]
+                db.commit()
+                cache.invalidate("migration", migration_id)
+        
+        # Reuse the plan of a near-identical machine if there is one
+        plan = None
+        if settings.PLAN_REUSE_ENABLED and migration:
+            plan = await PlanReuseService(db).find_reusable_plan(migration)
+        
         # Generate plan
-        plan = await ai_service.generate_migration_plan(source_agent_id, db)
+        if plan is None:
+            planner = FastPlanner() if settings.FAST_PLANNER_ENABLED else AIService()
+            plan = await planner.generate_migration_plan(
+                source_agent_id, db, on_task=persist_task
+            )
+        
+        # Reject plans whose dependencies can never be satisfied
+        graph = TaskGraph(plan["tasks"])
         
         # Update migration
-        migration = db.query(Migration).filter(Migration.id == migration_id).first()
         if migration:
             migration.migration_plan = plan["plan"]
             migration.tasks = plan["tasks"]
             migration.ai_recommendations = plan["recommendations"]
             migration.hardware_recommendation = plan["hardware_spec"]
+            migration.manual_steps = [
+                step if isinstance(step, dict) else {"step": str(step)}
+                for step in plan.get("manual_steps") or []
+            ]
             migration.estimated_duration_minutes = plan["estimated_minutes"]
+            migration.critical_path_minutes = graph.critical_path_minutes()
+            migration.transfer_report = DedupIndex(db).transfer_plan(migration)
             migration.status = MigrationStatus.READY
             db.commit()
+            cache.invalidate("migration", migration_id)
     except Exception as e:
         # Handle error
         migration = db.query(Migration).filter(Migration.id == migration_id).first()
@@ -152,19 +326,6 @@ async def generate_migration_plan(migration_id: str, source_agent_id: str):
             migration.status = MigrationStatus.FAILED
             migration.error_message = str(e)
             db.commit()
+            cache.invalidate("migration", migration_id)
     finally:
         db.close()
-
-
-async def execute_migration(migration_id: str):
-    """Background task to execute migration"""
-    from app.db.session import SessionLocal
-    db = SessionLocal()
-    
-    try:
-        migration_service = MigrationService(db)
-        await migration_service.execute_migration(migration_id)
-    finally:
-        db.close()
-
-
@@ -2,10 +2,13 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
 
+from app.api.deps import (
+    CurrentUser, check_company_access, company_scope, get_current_user, get_current_superuser, invalidate_user
+)
 from app.db.session import get_db
 from app.models.user import User
-from app.schemas.user import UserCreate, UserResponse
-from app.core.security import get_password_hash
+from app.schemas.user import UserCreate, UserResponse, UserUpdate
+from app.core.security import password_hasher, PasswordHasherBusy
 
 router = APIRouter()
 
@@ -13,9 +16,12 @@ router = APIRouter()
 @router.post("/", response_model=UserResponse)
 async def create_user(
     user: UserCreate,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    """Create a new user"""
+    """Create a new user; only superusers can create users of other companies"""
+    check_company_access(current_user, user.company_id)
+    
     # Check if user already exists
     existing = db.query(User).filter(User.email == user.email).first()
     if existing:
@@ -24,9 +30,18 @@ async def create_user(
             detail="User with this email already exists"
         )
     
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many passwords being hashed, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    
     db_user = User(
         email=user.email,
-        hashed_password=get_password_hash(user.password),
+        hashed_password=hashed_password,
         full_name=user.full_name,
         company_id=user.company_id
     )
@@ -42,22 +57,64 @@ async def list_users(
     skip: int = 0,
     limit: int = 100,
     company_id: str = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    """List users"""
+    """List users of the user's company, or of any company for superusers"""
     query = db.query(User)
-    if company_id:
+    company_id = company_scope(current_user, company_id)
+    if company_id or not current_user.is_superuser:
         query = query.filter(User.company_id == company_id)
     users = query.offset(skip).limit(limit).all()
     return users
 
 
+@router.get("/me", response_model=UserResponse)
+async def get_me(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the logged in user"""
+    return db.query(User).filter(User.id == current_user.id).first()
+
+
 @router.get("/{user_id}", response_model=UserResponse)
-async def get_user(user_id: str, db: Session = Depends(get_db)):
+async def get_user(
+    user_id: str,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
     """Get user details"""
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    if user.id != current_user.id:
+        check_company_access(current_user, user.company_id)
     return user
 
 
+@router.patch("/{user_id}", response_model=UserResponse)
+async def update_user(
+    user_id: str,
+    user_update: UserUpdate,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_superuser)
+):
+    """Update a user; deactivated users are locked out immediately"""
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    if user_update.full_name is not None:
+        user.full_name = user_update.full_name
+    if user_update.company_id is not None:
+        user.company_id = user_update.company_id
+    if user_update.is_active is not None:
+        user.is_active = user_update.is_active
+    if user_update.is_superuser is not None:
+        user.is_superuser = user_update.is_superuser
+    
+    db.commit()
+    db.refresh(user)
+    invalidate_user(user.id)
+    return user
@@ -0,0 +1,261 @@
+"""Redis read-through cache for hot dashboard reads
+
+Endpoints that the dashboard polls load their response through
+``cache.get_or_load``. Writers call ``cache.invalidate`` after committing,
+which drops the entry and bumps the key's generation, so a load that read
+the old rows before the write can't store them afterwards. Concurrent
+misses of one key, in any worker, wait for a single load instead of all
+querying the database.
+
+Redis is called from worker threads, never on the event loop, so a slow or
+failing Redis delays the requests using it but not every other request.
+Invalidations from async handlers are handed to a single sender thread and
+not waited for.
+
+Redis is an optimisation only: when it is unreachable, reads go straight to
+the database and Redis is retried after CACHE_RETRY_SECONDS. Invalidations
+are still attempted meanwhile, and those that fail are applied once Redis
+is reachable again, so entries written before an outage aren't served stale
+after it.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+
+import redis
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "pcs:cache"
+# Polling interval of requests waiting for another one to load a key
+WAIT_INTERVAL_SECONDS = 0.02
+# Generations outlive any entry, so a stale load can't match a reset counter
+GENERATION_TTL_SECONDS = 24 * 3600
+# Failed invalidations remembered per worker; past this, every entry is dropped on recovery
+MAX_PENDING_INVALIDATIONS = 10000
+
+# Store the value only if no invalidation happened since the load started
+SET_IF_GENERATION = """
+if (redis.call('GET', KEYS[2]) or '0') == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class ReadThroughCache:
+    """JSON values in Redis with per-key TTLs, write invalidation and stampede protection"""
+
+    def __init__(self, url: str, enabled: bool = True):
+        self.enabled = enabled
+        self._redis = redis.Redis.from_url(
+            url,
+            socket_timeout=settings.CACHE_SOCKET_TIMEOUT_SECONDS,
+            socket_connect_timeout=settings.CACHE_SOCKET_TIMEOUT_SECONDS
+        )
+        self._set_if_generation = self._redis.register_script(SET_IF_GENERATION)
+        self._release_lock = self._redis.register_script(RELEASE_LOCK)
+        self._retry_at = 0.0
+        self._stats: Dict[str, Dict[str, int]] = {}
+        # (namespace, key) of invalidations Redis didn't receive
+        self._pending: Set[Tuple[str, str]] = set()
+        self._pending_overflow = False
+        self._pending_lock = threading.Lock()
+        # Sends invalidations made on the event loop, in order
+        self._invalidator = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-invalidate")
+
+    def _keys(self, namespace: str, key: str):
+        return (
+            f"{PREFIX}:{namespace}:{key}",
+            f"{PREFIX}:gen:{namespace}:{key}",
+            f"{PREFIX}:lock:{namespace}:{key}",
+        )
+
+    @property
+    def available(self) -> bool:
+        return self.enabled and time.monotonic() >= self._retry_at
+
+    def _failed(self, e: Exception):
+        if self._retry_at == 0.0:
+            logger.warning(f"Cache unavailable, reading from the database: {e}")
+        self._retry_at = time.monotonic() + settings.CACHE_RETRY_SECONDS
+
+    def _apply_missed(self):
+        """Apply invalidations missed while Redis failed, before it is read from again"""
+        with self._pending_lock:
+            if not self._pending and not self._pending_overflow:
+                return
+            pending, overflow = self._pending, self._pending_overflow
+            self._pending, self._pending_overflow = set(), False
+        try:
+            if overflow:
+                self._drop_all()
+            else:
+                self._drop(pending)
+        except RedisError:
+            self._missed(pending, overflow)
+            raise
+
+    def _missed(self, keys: Iterable[Tuple[str, str]], overflow: bool = False):
+        with self._pending_lock:
+            self._pending.update(keys)
+            if overflow or self._pending_overflow or len(self._pending) > MAX_PENDING_INVALIDATIONS:
+                self._pending, self._pending_overflow = set(), True
+
+    def _drop(self, keys: Iterable[Tuple[str, str]]):
+        with self._redis.pipeline(transaction=False) as pipe:
+            for namespace, key in keys:
+                value_key, generation_key, _ = self._keys(namespace, key)
+                pipe.delete(value_key)
+                pipe.incr(generation_key)
+                pipe.expire(generation_key, GENERATION_TTL_SECONDS)
+            pipe.execute()
+
+    def _drop_all(self):
+        # Too many missed invalidations to replay; generations are kept so in-flight loads still can't store
+        internal = (f"{PREFIX}:gen:", f"{PREFIX}:lock:")
+        for value_key in self._redis.scan_iter(match=f"{PREFIX}:*", count=1000):
+            if not value_key.decode().startswith(internal):
+                self._redis.delete(value_key)
+
+    def _count(self, namespace: str, result: str):
+        stats = self._stats.setdefault(namespace, {"hit": 0, "miss": 0, "wait": 0, "error": 0})
+        stats[result] += 1
+        CACHE_REQUESTS.labels(namespace, result).inc()
+
+    async def get_or_load(
+        self,
+        namespace: str,
+        key: str,
+        loader: Callable[[], Optional[Any]],
+        ttl: int
+    ) -> Optional[Any]:
+        """The cached value, or the loader's result, cached for ``ttl`` seconds
+
+        ``loader`` must return something JSON-serialisable. None (e.g. not
+        found) is returned as is and never cached.
+        """
+        if not self.available:
+            return loader()
+        value_key, generation_key, lock_key = self._keys(namespace, key)
+        token = uuid.uuid4().hex
+        lock_seconds = settings.CACHE_LOCK_SECONDS
+
+        def lookup():
+            # The cached value, or None with the generation to store under once this request holds the lock
+            self._apply_missed()
+            cached = self._redis.get(value_key)
+            self._retry_at = 0.0
+            if cached is not None:
+                return cached, None
+            if not self._redis.set(lock_key, token, nx=True, px=int(lock_seconds * 1000)):
+                return None, None
+            return None, (self._redis.get(generation_key) or b"0").decode()
+
+        def poll():
+            # The value another request stored, or whether it is still loading
+            return self._redis.get(value_key), bool(self._redis.exists(lock_key))
+
+        try:
+            cached, generation = await asyncio.to_thread(lookup)
+            if cached is not None:
+                self._count(namespace, "hit")
+                return json.loads(cached)
+
+            if generation is None:
+                # Another request is loading this key; use its result once stored
+                deadline = time.monotonic() + lock_seconds
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(WAIT_INTERVAL_SECONDS)
+                    cached, loading = await asyncio.to_thread(poll)
+                    if cached is not None:
+                        self._count(namespace, "wait")
+                        return json.loads(cached)
+                    if not loading:
+                        break
+                self._count(namespace, "miss")
+                return loader()
+        except RedisError as e:
+            self._failed(e)
+            self._count(namespace, "error")
+            return loader()
+
+        def store(value):
+            if value is not None:
+                self._set_if_generation(
+                    keys=[value_key, generation_key],
+                    args=[generation, json.dumps(value), ttl]
+                )
+            self._release_lock(keys=[lock_key], args=[token])
+
+        self._count(namespace, "miss")
+        value = None
+        try:
+            value = loader()
+        finally:
+            try:
+                await asyncio.to_thread(store, value)
+            except RedisError as e:
+                self._failed(e)
+        return value
+
+    def invalidate(self, namespace: str, *keys: Optional[str]):
+        """Drop cached entries after their rows changed; call once the change is committed
+
+        Attempted even while reads bypass Redis, since the entries may
+        outlive the outage. Called on the event loop, the entries are
+        dropped by the sender thread shortly after this returns; elsewhere,
+        before it returns.
+        """
+        keys = [(namespace, key) for key in keys if key]
+        if not keys or not self.enabled:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._invalidate(keys)
+        else:
+            self._invalidator.submit(self._invalidate, keys)
+
+    def _invalidate(self, keys: List[Tuple[str, str]]):
+        try:
+            self._apply_missed()
+            self._drop(keys)
+            self._retry_at = 0.0
+        except RedisError as e:
+            self._missed(keys)
+            self._failed(e)
+
+    def stats(self) -> Dict[str, Any]:
+        namespaces = {}
+        for namespace, counts in self._stats.items():
+            lookups = counts["hit"] + counts["miss"] + counts["wait"]
+            namespaces[namespace] = {
+                **counts,
+                "hit_ratio": round((counts["hit"] + counts["wait"]) / lookups, 3) if lookups else 0.0,
+            }
+        return {
+            "enabled": self.enabled,
+            "available": self.available,
+            "pending_invalidations": "all" if self._pending_overflow else len(self._pending),
+            "namespaces": namespaces,
+        }
+
+
+cache = ReadThroughCache(settings.REDIS_URL, settings.CACHE_ENABLED)
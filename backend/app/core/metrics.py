@@ -0,0 +1,283 @@
+"""Prometheus metrics for the API
+
+MetricsMiddleware times each request per route and counts its payload
+bytes and the SQL it ran; engines are instrumented with instrument_engine.
+Everything is exposed in the Prometheus text format at /metrics.
+
+Under `python main.py --production` every worker writes its samples to
+PROMETHEUS_MULTIPROC_DIR and a scrape of any worker reports all of them,
+so gauges are set explicitly rather than computed when scraped.
+"""
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Tuple
+import asyncio
+import logging
+import os
+import time
+
+from app.core.sql_profiler import record_query
+
+logger = logging.getLogger(__name__)
+
+# Latencies from a cached auth check (~1ms) to a full plan stream (minutes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+# How often each worker refreshes its background_tasks gauges
+BACKGROUND_REFRESH_SECONDS = 5
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time until the response was sent",
+    ["method", "route"], buckets=LATENCY_BUCKETS
+)
+REQUESTS = Counter("http_requests_total", "Requests handled", ["method", "route", "status"])
+REQUEST_BYTES = Histogram(
+    "http_request_size_bytes", "Request body size", ["method", "route"], buckets=SIZE_BUCKETS
+)
+RESPONSE_BYTES = Histogram(
+    "http_response_size_bytes", "Response body size", ["method", "route"], buckets=SIZE_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements run by a request", ["method", "route"],
+    buckets=QUERY_COUNT_BUCKETS
+)
+REQUEST_QUERY_SECONDS = Histogram(
+    "http_request_db_seconds", "Time a request spent in SQL", ["method", "route"],
+    buckets=LATENCY_BUCKETS
+)
+QUERIES = Counter("db_queries_total", "SQL statements run", ["database"])
+POOL_WAIT_SECONDS = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ["database"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections currently checked out", ["database"], multiprocess_mode="livesum"
+)
+AI_REQUEST_SECONDS = Histogram(
+    "ai_request_duration_seconds", "Duration of streamed AI completions", ["outcome"],
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+)
+AI_FIRST_CHUNK_SECONDS = Histogram(
+    "ai_time_to_first_chunk_seconds", "Time until an AI completion starts streaming",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+AI_TOKENS = Counter("ai_tokens_total", "Tokens used by AI completions", ["direction"])
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Read-through cache lookups; hit, wait (served by a concurrent load), miss or error",
+    ["namespace", "result"]
+)
+STARTUP_SECONDS = Gauge(
+    "app_startup_seconds", "Time this worker took to start, by phase", ["phase"], multiprocess_mode="liveall"
+)
+BACKGROUND_TASKS = Gauge(
+    "background_tasks", "Work running or waiting in the background", ["kind"], multiprocess_mode="livesum"
+)
+
+
+class RequestStats:
+    __slots__ = ("queries", "query_seconds", "done")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.done = False
+
+
+# Stats of the request being handled; queries of background tasks started
+# by a request still see it, but only count until its response is sent
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def _route(scope) -> str:
+    # The route template, not the path, so ids don't explode the label set
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+# labels() takes a lock and hashes the label values; the children are
+# looked up once per route instead of on every request
+_route_metrics: Dict[Tuple[str, str], Tuple] = {}
+_request_counters: Dict[Tuple[str, str, int], Counter] = {}
+
+
+def _observe(method: str, route: str, status: int, seconds: float, request_bytes: int,
+             response_bytes: int, stats: RequestStats):
+    children = _route_metrics.get((method, route))
+    if children is None:
+        children = _route_metrics[(method, route)] = tuple(
+            metric.labels(method, route)
+            for metric in (REQUEST_SECONDS, REQUEST_BYTES, RESPONSE_BYTES, REQUEST_QUERIES, REQUEST_QUERY_SECONDS)
+        )
+    counter = _request_counters.get((method, route, status))
+    if counter is None:
+        counter = _request_counters[(method, route, status)] = REQUESTS.labels(method, route, str(status))
+
+    seconds_metric, request_metric, response_metric, queries_metric, query_seconds_metric = children
+    seconds_metric.observe(seconds)
+    request_metric.observe(request_bytes)
+    response_metric.observe(response_bytes)
+    queries_metric.observe(stats.queries)
+    query_seconds_metric.observe(stats.query_seconds)
+    counter.inc()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, payload sizes and SQL per route
+
+    Plain ASGI rather than BaseHTTPMiddleware, so the agent ingest path pays
+    for a few histogram observations and nothing else. Latency is taken
+    when the last body chunk is sent, so background tasks aren't counted.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status = 500
+        response_bytes = 0
+
+        def finish():
+            if stats.done:
+                return
+            stats.done = True
+            _observe(
+                scope["method"], _route(scope), status, time.perf_counter() - start,
+                _content_length(scope), response_bytes, stats
+            )
+
+        async def send_wrapper(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    await send(message)
+                    finish()
+                    return
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish()
+            _request_stats.reset(token)
+
+
+def _content_length(scope) -> int:
+    for name, value in scope["headers"]:
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return 0
+    return 0
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait for a connection"""
+
+    metrics_label = "primary"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_WAIT_SECONDS.labels(self.metrics_label).observe(time.perf_counter() - start)
+
+
+def instrument_engine(engine: Engine, label: str):
+    """Count an engine's statements and their time against the current request"""
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.metrics_label = label
+    queries = QUERIES.labels(label)
+    checked_out = POOL_CHECKED_OUT.labels(label)
+
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_out.inc()
+
+    @event.listens_for(engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        checked_out.dec()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        queries.inc()
+        stats = _request_stats.get()
+        if stats is not None and not stats.done:
+            stats.queries += 1
+            stats.query_seconds += elapsed
+        record_query(statement, elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+# Gauge child and the function measuring it, for each kind of background work
+_background: Dict[str, Tuple[Gauge, Callable[[], float]]] = {}
+
+
+def track_background(kind: str, depth: Callable[[], float]):
+    """Report the size of a background queue or worker set in background_tasks"""
+    _background[kind] = (BACKGROUND_TASKS.labels(kind), depth)
+
+
+def refresh_background():
+    for kind, (gauge, depth) in _background.items():
+        try:
+            gauge.set(depth())
+        except Exception as e:
+            logger.debug(f"Could not measure background {kind}: {e}")
+
+
+async def run_background_refresh():
+    """Set this worker's background_tasks gauges periodically
+
+    Other workers serve most scrapes, so the values can't be read at scrape time.
+    """
+    while True:
+        refresh_background()
+        await asyncio.sleep(BACKGROUND_REFRESH_SECONDS)
+
+
+def multiprocess_enabled() -> bool:
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """The Prometheus text exposition of this worker, or of every worker when multiprocess"""
+    refresh_background()
+    if not multiprocess_enabled():
+        return generate_latest(), CONTENT_TYPE_LATEST
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def worker_exited(pid: Optional[int] = None):
+    """Drop a stopped worker's live gauges from the multiprocess samples"""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid or os.getpid())
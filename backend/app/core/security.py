@@ -1,10 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Any
+from typing import Optional, Any, Dict, Tuple
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
+import asyncio
+import time
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 
 
 def create_access_token(subject: str, expires_delta: Optional[timedelta] = None) -> str:
@@ -20,6 +23,11 @@ def create_access_token(subject: str, expires_delta: Optional[timedelta] = None)
     return encoded_jwt
 
 
+def decode_access_token(token: str) -> dict:
+    """Verify a token's signature and expiry; raises JWTError when invalid"""
+    return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -28,3 +36,76 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hashes are already waiting for a worker"""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded thread pool instead of the event loop
+
+    A bcrypt hash takes hundreds of milliseconds of CPU; run inline it
+    stalls every other request on the loop. bcrypt releases the GIL, so
+    worker threads hash in parallel. Once PASSWORD_HASH_MAX_QUEUE hashes
+    are waiting, further ones are rejected rather than queued without
+    bound.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._seconds = 0.0
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """Check a password; also returns a new hash when the stored one uses an outdated cost
+
+        Without a stored hash (unknown user) a dummy hash is checked, so the
+        response takes as long as for a real user.
+        """
+        if not hashed_password:
+            await self._run(pwd_context.dummy_verify)
+            return False, None
+        return await self._run(pwd_context.verify_and_update, password, hashed_password)
+
+    async def _run(self, func, *args) -> Any:
+        if self._pending >= self.workers + self.max_queue:
+            self._rejected += 1
+            raise PasswordHasherBusy(f"{self._pending} password hashes already pending")
+
+        self._pending += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self._pending -= 1
+            self._completed += 1
+            self._seconds += time.perf_counter() - start
+
+    def warm_up(self):
+        # passlib picks and loads its bcrypt backend on first use
+        pwd_context.handler().get_backend()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "pending": self._pending,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "average_ms": round(self._seconds / self._completed * 1000, 1) if self._completed else 0.0,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_QUEUE)
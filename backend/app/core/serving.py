@@ -0,0 +1,76 @@
+"""Process sizing and startup timing for production serving
+
+`python main.py --production` starts WEB_CONCURRENCY uvicorn workers, one
+per available CPU core by default. Every worker is a separate process with
+its own connection pools, so the pools are sized from the worker's share of
+DATABASE_MAX_CONNECTIONS rather than SQLAlchemy's per-process defaults.
+"""
+from typing import Dict
+import glob
+import os
+import tempfile
+import time
+
+from app.core.config import settings
+
+_imported = time.monotonic()
+# Duration of each startup phase of this worker, in seconds
+startup_seconds: Dict[str, float] = {}
+
+
+def available_cpus() -> int:
+    """CPU cores this process may run on, which can be fewer than the machine has"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def web_workers() -> int:
+    return settings.WEB_CONCURRENCY or available_cpus()
+
+
+def pool_options() -> Dict[str, float]:
+    """create_engine pool arguments for this worker's share of the connection budget
+
+    A quarter of the share is overflow, opened under load and closed again
+    when returned, so idle workers hold fewer connections.
+    """
+    share = max(1, settings.DATABASE_MAX_CONNECTIONS // web_workers())
+    overflow = share // 4
+    return {
+        "pool_size": share - overflow,
+        "max_overflow": overflow,
+        "pool_timeout": settings.DATABASE_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DATABASE_POOL_RECYCLE_SECONDS,
+    }
+
+
+def process_age() -> float:
+    """Seconds since this process started
+
+    Read from /proc, so it covers interpreter startup and every import.
+    Elsewhere it is measured from when this module was imported.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22 is the start time in clock ticks since boot; the command name may contain spaces
+            started = int(f.read().rsplit(")", 1)[1].split()[19]) / os.sysconf("SC_CLK_TCK")
+        with open("/proc/uptime") as f:
+            return float(f.read().split()[0]) - started
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.monotonic() - _imported
+
+
+def prepare_metrics_dir() -> str:
+    """Directory the workers write their Prometheus samples to, emptied of a previous run's
+
+    PROMETHEUS_MULTIPROC_DIR if set, otherwise a new temporary directory.
+    Must be set before the workers import prometheus_client.
+    """
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR") or tempfile.mkdtemp(prefix="pcs-metrics-")
+    os.makedirs(path, exist_ok=True)
+    for stale in glob.glob(os.path.join(path, "*.db")):
+        os.remove(stale)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    return path
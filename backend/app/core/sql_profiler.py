@@ -0,0 +1,211 @@
+"""Opt-in per-request SQL profiling and N+1 detection
+
+With SQL_PROFILING_ENABLED, every request records the statements it runs.
+Statements that differ only in their parameters share a shape; a shape
+repeated SQL_PROFILE_REPEAT_THRESHOLD times or more within one request is
+reported as a likely N+1, usually a lazy-loaded relationship read in a
+loop or by a response model. Each response carries X-SQL-* summary headers
+and the full report is kept for GET /api/v1/debug/sql/{profile_id}.
+
+Tests can profile a block of code regardless of the setting:
+
+    with profile_queries(max_queries=5):
+        client.get("/api/v1/migrations/")
+"""
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+
+from app.core.config import settings
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Instrumentation and session plumbing never explain where a query came from
+_SKIPPED_DIRS = (os.path.join(_APP_DIR, "core"), os.path.join(_APP_DIR, "db"))
+_IN_LIST = re.compile(r"\(\s*(?:\?|%\([^)]+\)s|:\w+)(?:\s*,\s*(?:\?|%\([^)]+\)s|:\w+))*\s*\)")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class TooManyQueries(AssertionError):
+    """Raised by profile_queries when a block runs more statements than allowed"""
+
+
+def statement_shape(statement: str) -> str:
+    """The statement without its literal values, so repeats of one query match"""
+    shape = _LITERAL.sub("?", statement)
+    shape = _IN_LIST.sub("(?)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+def _caller() -> Optional[str]:
+    """The innermost application frame that led to a statement"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_DIR) and not filename.startswith(_SKIPPED_DIRS):
+            return f"{os.path.relpath(filename, os.path.dirname(_APP_DIR))}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+class QueryProfile:
+    """The statements run while the profile was active"""
+
+    def __init__(self, name: str = ""):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.started_at = time.time()
+        self.statements: List[Dict[str, Any]] = []
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float, caller: Optional[str]):
+        if self.closed:
+            return
+        with self._lock:
+            self.statements.append({"statement": statement, "seconds": seconds, "caller": caller})
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def seconds(self) -> float:
+        return sum(entry["seconds"] for entry in self.statements)
+
+    def repeated(self, threshold: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Statement shapes run at least ``threshold`` times, most frequent first"""
+        threshold = threshold or settings.SQL_PROFILE_REPEAT_THRESHOLD
+        shapes = Counter(statement_shape(entry["statement"]) for entry in self.statements)
+        repeated = []
+        for shape, count in shapes.most_common():
+            if count < threshold:
+                break
+            entries = [entry for entry in self.statements if statement_shape(entry["statement"]) == shape]
+            repeated.append({
+                "statement": shape,
+                "count": count,
+                "total_ms": round(sum(entry["seconds"] for entry in entries) * 1000, 2),
+                "callers": sorted({entry["caller"] for entry in entries if entry["caller"]}),
+            })
+        return repeated
+
+    def report(self) -> Dict[str, Any]:
+        repeated = self.repeated()
+        return {
+            "id": self.id,
+            "name": self.name,
+            "queries": self.count,
+            "total_ms": round(self.seconds * 1000, 2),
+            "n_plus_one": bool(repeated),
+            "repeated": repeated,
+            "statements": [
+                {
+                    "statement": entry["statement"],
+                    "ms": round(entry["seconds"] * 1000, 3),
+                    "caller": entry["caller"],
+                }
+                for entry in self.statements
+            ],
+        }
+
+
+# Profile of the request being handled
+_current: ContextVar[Optional[QueryProfile]] = ContextVar("sql_profile", default=None)
+# Profiles opened by profile_queries; they see statements from every thread
+_open_profiles: List[QueryProfile] = []
+# Recent request reports, by profile id
+_reports: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+
+def record_query(statement: str, seconds: float):
+    """Called for every executed statement; free unless something is profiling"""
+    profile = _current.get()
+    if profile is None and not _open_profiles:
+        return
+    caller = _caller()
+    if profile is not None:
+        profile.record(statement, seconds, caller)
+    for open_profile in list(_open_profiles):
+        open_profile.record(statement, seconds, caller)
+
+
+@contextmanager
+def profile_queries(max_queries: Optional[int] = None, name: str = ""):
+    """Profile the statements run inside the block, in any thread
+
+    Raises TooManyQueries when more than ``max_queries`` ran.
+    """
+    profile = QueryProfile(name)
+    _open_profiles.append(profile)
+    try:
+        yield profile
+    finally:
+        _open_profiles.remove(profile)
+    if max_queries is not None and profile.count > max_queries:
+        lines = "\n".join(
+            f"  {entry['count']}x {entry['statement'][:200]}" for entry in profile.repeated(2)
+        )
+        raise TooManyQueries(f"{profile.count} queries run, at most {max_queries} expected\n{lines}")
+
+
+def get_report(profile_id: str) -> Optional[Dict[str, Any]]:
+    return _reports.get(profile_id)
+
+
+def recent_reports(limit: int = 50) -> List[Dict[str, Any]]:
+    """Summaries of the latest profiled requests, newest first"""
+    summaries = []
+    for report in reversed(_reports.values()):
+        summaries.append({key: report[key] for key in ("id", "name", "queries", "total_ms", "n_plus_one")})
+        if len(summaries) >= limit:
+            break
+    return summaries
+
+
+class SQLProfilerMiddleware:
+    """Profiles each request and adds X-SQL-* headers to its response"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(f"{settings.API_V1_STR}/debug"):
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile(f"{scope['method']} {scope['path']}")
+        token = _current.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                repeated = profile.repeated()
+                headers = list(message.get("headers") or [])
+                headers += [
+                    (b"x-sql-queries", str(profile.count).encode()),
+                    (b"x-sql-time-ms", f"{profile.seconds * 1000:.2f}".encode()),
+                    (b"x-sql-profile-id", profile.id.encode()),
+                ]
+                if repeated:
+                    worst = repeated[0]
+                    headers.append((b"x-sql-n-plus-one", f"{worst['count']}x {worst['statement'][:200]}".encode("latin-1", "replace")))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                # Background tasks run after this; their queries aren't the request's
+                profile.closed = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            _reports[profile.id] = profile.report()
+            while len(_reports) > settings.SQL_PROFILE_HISTORY:
+                _reports.popitem(last=False)
@@ -0,0 +1,90 @@
+"""Per-tenant LIST partitions of the high-volume tables (PostgreSQL only)
+
+inventories and metrics_samples are declared PARTITION BY LIST (company_id).
+Every company gets its own partition of each, created in the same
+transaction as the company row; rows of agents without a company go to the
+default partition. Queries filtered on company_id only touch that
+company's partition, and offboarding a company drops its partitions
+instead of deleting row by row.
+
+On other databases the tables are ordinary tables and these helpers fall
+back to plain deletes.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from typing import Iterable, Optional
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ("inventories", "metrics_samples")
+# Partition key of rows whose agent belongs to no company; partition keys can't be NULL
+UNASSIGNED_COMPANY = "unassigned"
+
+
+def tenant_key(company_id: Optional[str]) -> str:
+    return company_id or UNASSIGNED_COMPANY
+
+
+def partition_name(table: str, company_id: str) -> str:
+    # Company ids aren't guaranteed to be valid identifiers
+    return f"{table}_t{hashlib.md5(company_id.encode()).hexdigest()[:16]}"
+
+
+def is_partition(table: str) -> bool:
+    """Whether a table name is one of the partitions managed here"""
+    return any(
+        table == f"{parent}_default" or (table.startswith(f"{parent}_t") and len(table) == len(parent) + 18)
+        for parent in PARTITIONED_TABLES
+    )
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _partitioned_tables(connection: Connection) -> list:
+    if connection.dialect.name != "postgresql":
+        return []
+    rows = connection.execute(text(
+        "SELECT c.relname FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = ANY(:tables)"
+    ), {"tables": list(PARTITIONED_TABLES)}).all()
+    return [row.relname for row in rows]
+
+
+def create_company_partitions(connection: Connection, company_id: str):
+    for table in _partitioned_tables(connection):
+        connection.execute(text(
+            f'CREATE TABLE IF NOT EXISTS "{partition_name(table, company_id)}" '
+            f'PARTITION OF "{table}" FOR VALUES IN ({_quote(company_id)})'
+        ))
+
+
+def ensure_partitions(connection: Connection, company_ids: Iterable[str]):
+    """Create the default partitions and any missing company partitions
+
+    A company whose rows already landed in the default partition keeps
+    them there; its partition is skipped with a warning.
+    """
+    for table in _partitioned_tables(connection):
+        connection.execute(text(f'CREATE TABLE IF NOT EXISTS "{table}_default" PARTITION OF "{table}" DEFAULT'))
+    for company_id in company_ids:
+        savepoint = connection.begin_nested()
+        try:
+            create_company_partitions(connection, company_id)
+            savepoint.commit()
+        except Exception as e:
+            savepoint.rollback()
+            logger.warning(f"Could not create partitions for company {company_id}: {e}")
+
+
+def drop_company_partitions(connection: Connection, company_id: str):
+    """Remove all of a company's rows from the partitioned tables"""
+    partitioned = _partitioned_tables(connection)
+    for table in PARTITIONED_TABLES:
+        if table in partitioned:
+            connection.execute(text(f'DROP TABLE IF EXISTS "{partition_name(table, company_id)}"'))
+        else:
+            connection.execute(text(f'DELETE FROM "{table}" WHERE company_id = :company_id'), {"company_id": company_id})
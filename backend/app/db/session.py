@@ -1,10 +1,43 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from fastapi import Request
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session, sessionmaker
+from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import itertools
+import logging
+import time
+
+import redis
+from redis.exceptions import RedisError
+
 from app.core.config import settings
+from app.core.metrics import InstrumentedQueuePool, instrument_engine
+from app.core.serving import pool_options
+from app.core.ttl_cache import TTLCache
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+logger = logging.getLogger(__name__)
+
+engine = create_engine(
+    settings.DATABASE_URL, pool_pre_ping=True, poolclass=InstrumentedQueuePool, **pool_options()
+)
+instrument_engine(engine, "primary")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Clients remembered as having written recently, per worker
+MAX_RECENT_WRITERS = 10000
+# Redis keys marking recent writers for every worker; the client key is hashed, as it may be a token
+RECENT_WRITER_PREFIX = "pcs:writer"
+
+# Seconds since the replica last replayed a transaction; 0 when fully caught up
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
 
 def get_db():
     db = SessionLocal()
@@ -14,3 +47,156 @@ def get_db():
         db.close()
 
 
+def client_key(request: Request) -> str:
+    """Identifies the dashboard user or agent making a request"""
+    return (
+        request.headers.get("authorization")
+        or request.headers.get("x-agent-id")
+        or (request.client.host if request.client else "")
+    )
+
+
+class ReplicaRouter:
+    """Sends read-only sessions to replicas that are keeping up with the primary
+
+    Each replica's lag is measured every REPLICA_LAG_CHECK_SECONDS. Reads
+    are spread over the replicas within REPLICA_MAX_LAG_SECONDS and fall
+    back to the primary when none is. A client that wrote in the last
+    READ_YOUR_WRITES_SECONDS reads from the primary, so it sees its own
+    changes. Writers are marked in Redis, as the client's next read may go
+    to another worker; while Redis is unreachable only the worker that
+    handled the write knows about it.
+    """
+
+    def __init__(self, urls: List[str]):
+        self.replicas: List[Dict[str, Any]] = []
+        for i, url in enumerate(urls):
+            replica_engine = create_engine(
+                url, pool_pre_ping=True, poolclass=InstrumentedQueuePool, **pool_options()
+            )
+            instrument_engine(replica_engine, f"replica{i + 1}")
+            self.replicas.append({
+                # repr() of an engine URL masks the password
+                "name": repr(replica_engine.url),
+                "engine": replica_engine,
+                "sessions": sessionmaker(autocommit=False, autoflush=False, bind=replica_engine),
+                "lag": None,
+                "error": None,
+            })
+        self._turn = itertools.count()
+        self._recent_writers = TTLCache(MAX_RECENT_WRITERS)
+        self._redis = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=settings.CACHE_SOCKET_TIMEOUT_SECONDS,
+            socket_connect_timeout=settings.CACHE_SOCKET_TIMEOUT_SECONDS
+        )
+        self._redis_retry_at = 0.0
+
+    def _writer_key(self, client: str) -> str:
+        return f"{RECENT_WRITER_PREFIX}:{hashlib.sha256(client.encode()).hexdigest()}"
+
+    def _redis_failed(self, e: Exception):
+        if self._redis_retry_at == 0.0:
+            logger.warning(f"Recent writers can't be shared between workers: {e}")
+        self._redis_retry_at = time.monotonic() + settings.CACHE_RETRY_SECONDS
+
+    def record_write(self, client: str):
+        if not self.replicas:
+            return
+        self._recent_writers.set(client, True, time.time() + settings.READ_YOUR_WRITES_SECONDS)
+        if time.monotonic() < self._redis_retry_at:
+            return
+        try:
+            self._redis.set(self._writer_key(client), 1, px=int(settings.READ_YOUR_WRITES_SECONDS * 1000))
+            self._redis_retry_at = 0.0
+        except RedisError as e:
+            self._redis_failed(e)
+
+    def wrote_recently(self, client: str) -> bool:
+        if self._recent_writers.get(client):
+            return True
+        if time.monotonic() < self._redis_retry_at:
+            return False
+        try:
+            wrote = bool(self._redis.exists(self._writer_key(client)))
+            self._redis_retry_at = 0.0
+            return wrote
+        except RedisError as e:
+            self._redis_failed(e)
+            return False
+
+    def session(self, client: Optional[str] = None) -> Session:
+        if not self.replicas or (client and self.wrote_recently(client)):
+            return SessionLocal()
+        current = [
+            replica for replica in self.replicas
+            if replica["lag"] is not None and replica["lag"] <= settings.REPLICA_MAX_LAG_SECONDS
+        ]
+        if not current:
+            return SessionLocal()
+        return current[next(self._turn) % len(current)]["sessions"]()
+
+    def measure_lag(self):
+        """Query each replica's lag; unreachable replicas are taken out of rotation"""
+        for replica in self.replicas:
+            try:
+                with replica["sessions"]() as db:
+                    if db.bind.dialect.name == "postgresql":
+                        replica["lag"] = float(db.execute(REPLICA_LAG_SQL).scalar() or 0)
+                    else:
+                        db.execute(text("SELECT 1"))
+                        replica["lag"] = 0.0
+                replica["error"] = None
+            except Exception as e:
+                if replica["error"] is None:
+                    logger.warning(f"Replica {replica['name']} unavailable: {e}")
+                replica["lag"] = None
+                replica["error"] = str(e)
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "replica": replica["name"],
+                "lag_seconds": replica["lag"],
+                "in_rotation": replica["lag"] is not None and replica["lag"] <= settings.REPLICA_MAX_LAG_SECONDS,
+                "error": replica["error"],
+            }
+            for replica in self.replicas
+        ]
+
+
+replica_router = ReplicaRouter(settings.DATABASE_REPLICA_URLS)
+
+
+def prime_pools():
+    """Open the persistent connections of every pool before the first request needs them"""
+    for pool_engine in [engine, *(replica["engine"] for replica in replica_router.replicas)]:
+        try:
+            connections = [pool_engine.connect() for _ in range(pool_engine.pool.size())]
+        except Exception as e:
+            logger.error(f"Could not open connections to {pool_engine.url!r}: {e}")
+            continue
+        for connection in connections:
+            connection.close()
+    replica_router.measure_lag()
+
+
+async def get_read_db(request: Request):
+    """Session for read-only endpoints, on a replica when one is current enough"""
+    db = replica_router.session(client_key(request))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def run_replica_lag_checks():
+    """Measure replica lag periodically"""
+    if not replica_router.replicas:
+        return
+    while True:
+        try:
+            await asyncio.to_thread(replica_router.measure_lag)
+        except Exception as e:
+            logger.error(f"Replica lag check failed: {e}")
+        await asyncio.sleep(settings.REPLICA_LAG_CHECK_SECONDS)
@@ -0,0 +1,28 @@
+"""INSERT ... ON CONFLICT on the databases the API runs on
+
+PostgreSQL in production and SQLite in development and benchmarks both
+support it, through their own dialect's insert construct.
+"""
+from sqlalchemy import JSON, cast, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+
+
+def upsert(connection: Connection, table):
+    """An insert of ``table`` with on_conflict_do_update/on_conflict_do_nothing"""
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table)
+    if dialect == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"INSERT ... ON CONFLICT is not supported on {dialect}")
+
+
+def json_merge(connection: Connection, current, update):
+    """``current`` JSON object with the keys of ``update`` set, for an on-conflict SET"""
+    if connection.dialect.name == "postgresql":
+        merged = func.coalesce(cast(current, postgresql.JSONB), cast("{}", postgresql.JSONB)).op("||")(
+            cast(update, postgresql.JSONB)
+        )
+        return cast(merged, JSON)
+    return func.json_patch(func.coalesce(current, "{}"), update)
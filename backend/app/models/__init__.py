@@ -6,6 +6,12 @@ from app.models.user import User
 from app.models.agent import Agent
 from app.models.inventory import Inventory
 from app.models.migration import Migration
+from app.models.app_signature import AppSignatureBand
+from app.models.metrics import MetricsSample
+from app.models.task_event import MigrationTaskEvent
+from app.models.file_index import AgentFile, AgentFileChunk
+from app.models.dashboard import DashboardCounter
 
-__all__ = ["Company", "User", "Agent", "Inventory", "Migration"]
+__all__ = ["Company", "User", "Agent", "Inventory", "Migration", "AppSignatureBand",
+           "MetricsSample", "MigrationTaskEvent", "AgentFile", "AgentFileChunk", "DashboardCounter"]
 
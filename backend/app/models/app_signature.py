@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, Integer, ForeignKey, Index
+from app.db.base import Base
+import uuid
+
+
+class AppSignatureBand(Base):
+    # One row per LSH band of an inventory's application MinHash signature
+    __tablename__ = "app_signature_bands"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    agent_id = Column(String, ForeignKey("agents.id"), nullable=False, index=True)
+    # No foreign key: inventories is partitioned, so its ids alone aren't unique keys
+    inventory_id = Column(String, nullable=False)
+    band = Column(Integer, nullable=False)
+    bucket = Column(String, nullable=False)
+
+    __table_args__ = (
+        Index("ix_app_signature_bands_band_bucket", "band", "bucket"),
+    )
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, String, Boolean, DateTime, Integer
+from sqlalchemy import Column, String, Boolean, DateTime, Integer, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base import Base
+from app.db.partitioning import create_company_partitions
 import uuid
 
 
@@ -20,3 +21,7 @@ class Company(Base):
     agents = relationship("Agent", back_populates="company")
 
 
+@event.listens_for(Company, "after_insert")
+def create_tenant_partitions(mapper, connection, company):
+    # In the same transaction, so no row of the company can reach the default partition
+    create_company_partitions(connection, company.id)
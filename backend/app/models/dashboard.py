@@ -0,0 +1,146 @@
+"""Counters behind GET /dashboard/summary
+
+Every write that changes an agent's status, company or last_seen, or a
+migration's status or progress, adjusts these counters in the same
+transaction, so the summary never scans the agents or migrations tables.
+ORM changes are counted by the mapper events below; bulk UPDATEs bypass
+them and call ``adjust_counters`` themselves.
+
+Stale agents depend on the time of the read, so agents are counted per
+hour of their last_seen and the summary adds up the hours before its
+cutoff.
+"""
+from sqlalchemy import Column, String, Float, delete, event, inspect, tuple_
+from sqlalchemy.engine import Connection
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from app.db.base import Base
+from app.db.partitioning import tenant_key
+from app.db.upsert import upsert
+from app.models.agent import Agent
+from app.models.migration import Migration, MigrationStatus
+
+LAST_SEEN_PREFIX = "agents.last_seen."  # Followed by the hour, e.g. agents.last_seen.2024-05-01T13
+LAST_SEEN_FORMAT = "%Y-%m-%dT%H"
+NEVER_SEEN = "agents.never_seen"
+ACTIVE_PROGRESS = "migrations.active_progress"  # Sum of progress_percent of in-progress migrations
+MANAGED_DATA_MB = "data.managed_mb"  # User data in each agent's latest inventory
+
+# (tenant key, counter name) -> change
+Deltas = Dict[Tuple[str, str], float]
+
+
+class DashboardCounter(Base):
+    __tablename__ = "dashboard_counters"
+
+    company_id = Column(String, primary_key=True)  # tenant_key of the counted rows
+    name = Column(String, primary_key=True)
+    value = Column(Float, nullable=False, default=0.0)
+
+
+def last_seen_counter(last_seen: Optional[datetime]) -> str:
+    if last_seen is None:
+        return NEVER_SEEN
+    if last_seen.tzinfo:
+        last_seen = last_seen.astimezone(timezone.utc).replace(tzinfo=None)
+    return LAST_SEEN_PREFIX + last_seen.strftime(LAST_SEEN_FORMAT)
+
+
+def agent_counters(company_id: Optional[str], status, last_seen: Optional[datetime]) -> Deltas:
+    """What one agent in this state adds to the counters"""
+    company = tenant_key(company_id)
+    return {
+        (company, f"agents.{getattr(status, 'value', status)}"): 1,
+        (company, last_seen_counter(last_seen)): 1,
+    }
+
+
+def migration_counters(company_id: Optional[str], status, progress_percent: Optional[float]) -> Deltas:
+    """What one migration in this state adds to the counters"""
+    company = tenant_key(company_id)
+    counters = {(company, f"migrations.{getattr(status, 'value', status)}"): 1}
+    if status == MigrationStatus.IN_PROGRESS:
+        counters[(company, ACTIVE_PROGRESS)] = progress_percent or 0.0
+    return counters
+
+
+def counter_changes(before: Deltas, after: Deltas) -> Deltas:
+    changes: Dict[Tuple[str, str], float] = defaultdict(float)
+    for key, value in after.items():
+        changes[key] += value
+    for key, value in before.items():
+        changes[key] -= value
+    return {key: value for key, value in changes.items() if value}
+
+
+def adjust_counters(connection: Connection, deltas: Deltas):
+    """Add ``deltas`` to the counters in one statement of the caller's transaction"""
+    if not deltas:
+        return
+    # Sorted, so concurrent transactions lock the counter rows in the same order
+    rows = [
+        {"company_id": company, "name": name, "value": value}
+        for (company, name), value in sorted(deltas.items())
+    ]
+    statement = upsert(connection, DashboardCounter.__table__).values(rows)
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=["company_id", "name"],
+        set_={"value": DashboardCounter.value + statement.excluded.value}
+    ))
+
+    # Agents move to a new hour every time they report; drop the hours they left empty
+    emptied = [key for key, value in deltas.items() if value < 0 and key[1].startswith(LAST_SEEN_PREFIX)]
+    if emptied:
+        connection.execute(delete(DashboardCounter.__table__).where(
+            tuple_(DashboardCounter.company_id, DashboardCounter.name).in_(emptied),
+            DashboardCounter.value <= 0
+        ))
+
+
+COUNTED_ATTRIBUTES = {
+    Agent: (agent_counters, ("company_id", "status", "last_seen")),
+    Migration: (migration_counters, ("company_id", "status", "progress_percent")),
+}
+
+
+def _counters(target, previous: bool) -> Deltas:
+    counters, keys = COUNTED_ATTRIBUTES[type(target)]
+    state = inspect(target)
+    values = []
+    for key in keys:
+        history = state.attrs[key].history
+        values.append(history.deleted[0] if previous and history.deleted else state.dict.get(key))
+    return counters(*values)
+
+
+def _load_replaced_value(target, value, oldvalue, initiator):
+    pass
+
+
+for model, (_, keys) in COUNTED_ATTRIBUTES.items():
+    for key in keys:
+        # Loads the value being replaced even when the row was expired by a commit, so updates know what to subtract
+        event.listen(getattr(model, key), "set", _load_replaced_value, active_history=True)
+
+
+@event.listens_for(Agent, "after_insert")
+@event.listens_for(Migration, "after_insert")
+def count_inserted(mapper, connection, target):
+    adjust_counters(connection, _counters(target, previous=False))
+
+
+@event.listens_for(Agent, "after_update")
+@event.listens_for(Migration, "after_update")
+def count_updated(mapper, connection, target):
+    _, keys = COUNTED_ATTRIBUTES[type(target)]
+    state = inspect(target)
+    if any(state.attrs[key].history.has_changes() for key in keys):
+        adjust_counters(connection, counter_changes(_counters(target, previous=True), _counters(target, previous=False)))
+
+
+@event.listens_for(Agent, "after_delete")
+@event.listens_for(Migration, "after_delete")
+def count_deleted(mapper, connection, target):
+    adjust_counters(connection, counter_changes(_counters(target, previous=True), {}))
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, BigInteger, JSON, Index
+from sqlalchemy.sql import func
+from app.db.base import Base
+import uuid
+
+
+class AgentFile(Base):
+    # A file an agent reported in its content manifest
+    __tablename__ = "agent_files"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    agent_id = Column(String, ForeignKey("agents.id"), nullable=False, index=True)
+    path = Column(String, nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    content_hash = Column(String, nullable=False, index=True)  # SHA-256 of the whole file
+    chunk_hashes = Column(JSON)  # SHA-256 of each DEDUP_CHUNK_BYTES chunk, in order
+    reported_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class AgentFileChunk(Base):
+    # Distinct content chunks held by each agent, for finding shared content
+    __tablename__ = "agent_file_chunks"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    agent_id = Column(String, ForeignKey("agents.id"), nullable=False, index=True)
+    chunk_hash = Column(String, nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        Index("ix_agent_file_chunks_chunk_hash_agent_id", "chunk_hash", "agent_id", unique=True),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Integer
+from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Integer, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base import Base
@@ -9,6 +9,8 @@ class Inventory(Base):
     __tablename__ = "inventories"
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    # Partition key, copied from the agent (see app.db.partitioning)
+    company_id = Column(String, primary_key=True)
     agent_id = Column(String, ForeignKey("agents.id"), nullable=False)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     
@@ -31,7 +33,16 @@ class Inventory(Base):
     total_applications = Column(Integer, default=0)
     total_data_size_mb = Column(Integer, default=0)
     
+    # MinHash signature of the installed application set (see PlanReuseService)
+    app_signature = Column(JSON)
+    
     # Relationships
     agent = relationship("Agent", back_populates="inventories")
 
+    __table_args__ = (
+        Index("ix_inventories_agent_id_timestamp", "agent_id", "timestamp"),
+        Index("ix_inventories_company_id_timestamp", "company_id", "timestamp"),
+        {"postgresql_partition_by": "LIST (company_id)"},
+    )
+
 
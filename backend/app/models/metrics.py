@@ -0,0 +1,32 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey, Float, Index, JSON
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.db.base import Base
+import uuid
+
+
+class MetricsSample(Base):
+    __tablename__ = "metrics_samples"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    # Partition key, copied from the agent (see app.db.partitioning)
+    company_id = Column(String, primary_key=True)
+    agent_id = Column(String, ForeignKey("agents.id"), nullable=False)
+    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # System performance at the time of the sample
+    cpu_usage_percent = Column(Float)
+    memory_usage_percent = Column(Float)
+    disk_usage_percent = Column(Float)
+    
+    # Per-application running totals reported by the agent
+    application_usage = Column(JSON)
+    
+    # Relationships
+    agent = relationship("Agent")
+
+    __table_args__ = (
+        Index("ix_metrics_samples_agent_id_timestamp", "agent_id", "timestamp"),
+        Index("ix_metrics_samples_company_id_timestamp", "company_id", "timestamp"),
+        {"postgresql_partition_by": "LIST (company_id)"},
+    )
@@ -9,6 +9,7 @@ import enum
 class MigrationStatus(str, enum.Enum):
     PLANNING = "planning"
     READY = "ready"
+    QUEUED = "queued"
     IN_PROGRESS = "in_progress"
     COMPLETED = "completed"
     FAILED = "failed"
@@ -22,6 +23,7 @@ class Migration(Base):
     name = Column(String, nullable=False)
     source_agent_id = Column(String, ForeignKey("agents.id"), nullable=False)
     target_agent_id = Column(String, ForeignKey("agents.id"), nullable=True)
+    company_id = Column(String, index=True)  # Copied from the source agent
     status = Column(Enum(MigrationStatus), default=MigrationStatus.PLANNING)
     
     # Plan
@@ -36,15 +38,29 @@ class Migration(Base):
     
     # Timing
     estimated_duration_minutes = Column(Integer)
+    critical_path_minutes = Column(Integer)  # Duration when independent tasks run in parallel
+    transfer_report = Column(JSON)  # Deduplicated user data transfer (see DedupIndex)
     started_at = Column(DateTime(timezone=True))
     completed_at = Column(DateTime(timezone=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    # Wave scheduling
+    wave = Column(String, index=True)
+    site = Column(String)  # Network site of the source machine when queued
+    total_data_size_mb = Column(Integer)  # User data to transfer, from the source inventory
+    queued_at = Column(DateTime(timezone=True))
+    
+    # Execution ownership
+    lease_owner = Column(String)  # Worker currently executing the migration
+    lease_expires_at = Column(DateTime(timezone=True))
+    attempt = Column(Integer, default=0)  # Incremented by every start; task events belong to one attempt
+    
     # Results
     success_message = Column(Text)
     error_message = Column(Text)
     manual_steps = Column(JSON)  # Steps that require manual intervention
+    verification_report = Column(JSON)  # Source/target inventory diff (see MigrationVerifier)
     
     # AI Analysis
     ai_recommendations = Column(JSON)
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Text, Enum
+from sqlalchemy.sql import func
+from app.db.base import Base
+import enum
+
+
+class TaskEventStatus(str, enum.Enum):
+    STARTED = "started"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+
+
+class MigrationTaskEvent(Base):
+    __tablename__ = "migration_task_events"
+
+    # Sequential so events replay in the order they were recorded
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    migration_id = Column(String, ForeignKey("migrations.id"), nullable=False, index=True)
+    attempt = Column(Integer, nullable=False, default=0)  # Migration.attempt the event was recorded in
+    task_index = Column(Integer, nullable=False)  # Position in Migration.tasks
+    task_name = Column(String)
+    status = Column(Enum(TaskEventStatus), nullable=False)
+    error = Column(Text)
+    timestamp = Column(DateTime(timezone=True), server_default=func.now())
@@ -30,6 +30,16 @@ class AgentResponse(AgentBase):
         from_attributes = True
 
 
+class AgentIdentity(AgentBase):
+    agent_id: str  # The X-Agent-Id the machine's agent will report with
+    site: Optional[str] = None  # Network site for wave scheduling
+
+
+class AgentProvision(BaseModel):
+    company_id: Optional[str] = None  # For agents that don't name their own
+    agents: List[AgentIdentity]
+
+
 class InventoryCreate(BaseModel):
     system_info: Optional[Dict[str, Any]] = None
     installed_applications: Optional[List[Dict[str, Any]]] = None
@@ -39,6 +49,17 @@ class InventoryCreate(BaseModel):
     user_data_locations: Optional[List[Dict[str, Any]]] = None
 
 
+class FileManifestEntry(BaseModel):
+    path: str
+    size_bytes: int
+    sha256: str
+    chunks: Optional[List[str]] = None  # SHA-256 of each DEDUP_CHUNK_BYTES chunk
+
+
+class FileManifest(BaseModel):
+    files: List[FileManifestEntry]
+
+
 class MetricsCreate(BaseModel):
     application_usage: Optional[List[Dict[str, Any]]] = None
     file_access: Optional[List[Dict[str, Any]]] = None
@@ -20,8 +20,14 @@ class MigrationUpdate(BaseModel):
     current_task: Optional[str] = None
 
 
+class WaveCreate(BaseModel):
+    name: str
+    migration_ids: List[str]
+
+
 class MigrationResponse(MigrationBase):
     id: str
+    company_id: Optional[str] = None
     status: MigrationStatus
     migration_plan: Optional[Dict[str, Any]] = None
     tasks: Optional[List[Dict[str, Any]]] = None
@@ -30,6 +36,12 @@ class MigrationResponse(MigrationBase):
     current_task: Optional[str] = None
     progress_percent: float
     estimated_duration_minutes: Optional[int] = None
+    critical_path_minutes: Optional[int] = None
+    transfer_report: Optional[Dict[str, Any]] = None
+    wave: Optional[str] = None
+    site: Optional[str] = None
+    total_data_size_mb: Optional[int] = None
+    queued_at: Optional[datetime] = None
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
     created_at: datetime
@@ -37,6 +49,7 @@ class MigrationResponse(MigrationBase):
     hardware_recommendation: Optional[Dict[str, Any]] = None
     optimization_suggestions: Optional[Dict[str, Any]] = None
     manual_steps: Optional[List[Dict[str, Any]]] = None
+    verification_report: Optional[Dict[str, Any]] = None
 
     class Config:
         from_attributes = True
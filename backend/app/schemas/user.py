@@ -13,6 +13,13 @@ class UserCreate(UserBase):
     password: str
 
 
+class UserUpdate(BaseModel):
+    full_name: Optional[str] = None
+    company_id: Optional[str] = None
+    is_active: Optional[bool] = None
+    is_superuser: Optional[bool] = None
+
+
 class UserResponse(UserBase):
     id: str
     is_active: bool
@@ -1,26 +1,41 @@
-from anthropic import Anthropic
 from sqlalchemy.orm import Session
-from typing import Dict, Any
+from typing import Dict, Any, List, Callable, Awaitable, Optional
 import json
+import math
+import time
 
 from app.core.config import settings
+from app.core.metrics import AI_FIRST_CHUNK_SECONDS, AI_REQUEST_SECONDS, AI_TOKENS
+from app.db.partitioning import tenant_key
 from app.models.inventory import Inventory
 from app.models.agent import Agent
+from app.services.ai_transport import get_transport
+from app.services.plan_parser import PlanStreamParser, PlanStreamError
+
+TaskCallback = Callable[[Dict[str, Any]], Awaitable[None]]
 
 
 class AIService:
-    def __init__(self):
-        self.client = Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+    def __init__(self, transport=None):
+        # Live API by default; record/replay transports are selected via AI_TRANSPORT
+        self.transport = transport or get_transport()
     
     async def generate_migration_plan(
         self, 
         source_agent_id: str,
-        db: Session
+        db: Session,
+        on_task: Optional[TaskCallback] = None
     ) -> Dict[str, Any]:
-        """Generate a comprehensive migration plan using Claude AI"""
+        """Generate a comprehensive migration plan using Claude AI
+
+        The response is streamed and parsed incrementally; ``on_task`` is
+        awaited with each task as soon as it has been fully received.
+        """
         
         # Get latest inventory
-        inventory = db.query(Inventory).filter(
+        agent = db.query(Agent).filter(Agent.id == source_agent_id).first()
+        inventory = agent and db.query(Inventory).filter(
+            Inventory.company_id == tenant_key(agent.company_id),
             Inventory.agent_id == source_agent_id
         ).order_by(Inventory.timestamp.desc()).first()
         
@@ -30,14 +45,9 @@ class AIService:
         # Prepare context for Claude
         context = self._prepare_inventory_context(inventory)
         
-        # Call Claude API
-        message = self.client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=8000,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"""You are an expert IT migration specialist. Analyze this PC inventory and create a comprehensive migration plan.
+        # Stream the response from Claude API
+        parser = await self._stream_plan(
+            f"""You are an expert IT migration specialist. Analyze this PC inventory and create a comprehensive migration plan.
 
 INVENTORY DATA:
 {json.dumps(context, indent=2)}
@@ -60,21 +70,16 @@ Return your response as a JSON object with these keys:
 - manual_steps: array of manual intervention items
 - estimated_minutes: total estimated duration
 - risks: potential issues and mitigations
-"""
-                }
-            ]
+""",
+            on_task
         )
         
         # Parse response
-        response_text = message.content[0].text
+        response_text = parser.text
         
         try:
-            # Try to extract JSON from response
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                result = json.loads(response_text[json_start:json_end])
-            else:
+            result = parser.close()
+            if result is None:
                 # Fallback if no JSON found
                 result = {
                     "plan": response_text,
@@ -85,7 +90,7 @@ Return your response as a JSON object with these keys:
                     "estimated_minutes": 0,
                     "risks": []
                 }
-        except json.JSONDecodeError:
+        except PlanStreamError:
             # Fallback parsing
             result = {
                 "plan": response_text,
@@ -99,6 +104,81 @@ Return your response as a JSON object with these keys:
         
         return result
     
+    async def generate_application_tasks(
+        self,
+        inventory: Inventory,
+        applications: List[Dict[str, Any]],
+        on_task: Optional[TaskCallback] = None
+    ) -> Dict[str, Any]:
+        """Generate installation tasks for specific applications using Claude AI
+
+        Used by the fast planner for applications it has no recipe for, so the
+        prompt only carries those applications rather than the whole inventory.
+        """
+        
+        context = {
+            "system_info": inventory.system_info,
+            "applications": applications
+        }
+        
+        parser = await self._stream_plan(
+            f"""You are an expert IT migration specialist. The applications below were found on a PC being migrated and need to be reinstalled on its replacement.
+
+SYSTEM AND APPLICATIONS:
+{json.dumps(context, indent=2)}
+
+Return your response as a JSON object with these keys:
+- tasks: array of task objects with name, order, estimated_minutes, instructions, dependencies
+- manual_steps: array of manual intervention items (licensing, sign-in, activation)
+- recommendations: optimization suggestions for these applications
+""",
+            on_task
+        )
+        
+        try:
+            result = parser.close() or {}
+        except PlanStreamError:
+            result = {"tasks": self._extract_tasks_from_text(parser.text)}
+        
+        return {
+            "tasks": result.get("tasks") or [],
+            "manual_steps": result.get("manual_steps") or [],
+            "recommendations": result.get("recommendations") or {}
+        }
+    
+    async def _stream_plan(
+        self,
+        prompt: str,
+        on_task: Optional[TaskCallback] = None
+    ) -> PlanStreamParser:
+        """Stream a completion through the incremental plan parser"""
+        
+        parser = PlanStreamParser()
+        start = time.perf_counter()
+        first_chunk = True
+        outcome = "error"
+        try:
+            async with self.transport.stream(
+                model="claude-sonnet-4-20250514",
+                max_tokens=8000,
+                messages=[{"role": "user", "content": prompt}]
+            ) as stream:
+                async for text in stream.text_stream:
+                    if first_chunk:
+                        AI_FIRST_CHUNK_SECONDS.observe(time.perf_counter() - start)
+                        first_chunk = False
+                    # Structural errors raise here, aborting the stream early
+                    for task in parser.feed(text):
+                        if on_task:
+                            await on_task(task)
+            outcome = "success"
+            for direction in ("input", "output"):
+                AI_TOKENS.labels(direction).inc(stream.usage.get(f"{direction}_tokens") or 0)
+        finally:
+            AI_REQUEST_SECONDS.labels(outcome).observe(time.perf_counter() - start)
+        
+        return parser
+    
     def _prepare_inventory_context(self, inventory: Inventory) -> Dict[str, Any]:
         """Prepare inventory data for AI analysis"""
         
@@ -136,12 +216,15 @@ Return your response as a JSON object with these keys:
                 })
         return tasks
     
-    def _generate_default_hardware_spec(self, inventory: Inventory) -> Dict[str, Any]:
+    @staticmethod
+    def _generate_default_hardware_spec(inventory: Inventory) -> Dict[str, Any]:
         """Generate default hardware recommendations based on inventory"""
         
         current_ram = 8  # Default
         if inventory.system_info and 'total_memory_mb' in inventory.system_info:
             current_ram = inventory.system_info['total_memory_mb'] / 1024
+        # Room for twice the user data, which inventories report in MB
+        data_gb = math.ceil((inventory.total_data_size_mb or 0) * 2 / 1024)
         
         return {
             "cpu": {
@@ -153,7 +236,7 @@ Return your response as a JSON object with these keys:
                 "justification": f"Current system has {current_ram:.0f}GB, recommended 50% increase"
             },
             "storage": {
-                "recommendation_gb": max(512, inventory.total_data_size_mb * 2),
+                "recommendation_gb": max(512, data_gb),
                 "type": "NVMe SSD",
                 "justification": "Fast storage for better performance"
             },
@@ -0,0 +1,202 @@
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, AsyncIterator
+import asyncio
+import hashlib
+import json
+import logging
+import random
+
+import httpx
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from anthropic import AsyncAnthropic
+
+logger = logging.getLogger(__name__)
+
+
+def cassette_key(model: str, max_tokens: int, messages: List[Dict[str, Any]]) -> str:
+    """Stable hash identifying a completion request"""
+    canonical = json.dumps(
+        {"model": model, "max_tokens": max_tokens, "messages": messages},
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class TransportStream:
+    """Text chunks of a streamed completion, with token usage once it has finished"""
+
+    def __init__(self, text_stream: Optional[AsyncIterator[str]] = None):
+        self.text_stream = text_stream
+        self.usage: Dict[str, int] = {}
+
+
+class AnthropicTransport:
+    """Streams completions from the Anthropic API"""
+
+    def __init__(self, client: Optional["AsyncAnthropic"] = None):
+        # The SDK is a large share of the API's import time; only load it once a plan is generated
+        from anthropic import AsyncAnthropic
+
+        self.client = client or AsyncAnthropic(
+            api_key=settings.ANTHROPIC_API_KEY,
+            base_url=settings.ANTHROPIC_BASE_URL
+        )
+
+    @asynccontextmanager
+    async def stream(self, **request) -> AsyncIterator[TransportStream]:
+        async with self.client.messages.stream(**request) as sdk_stream:
+            result = TransportStream()
+
+            async def text():
+                async for chunk in sdk_stream.text_stream:
+                    yield chunk
+                message = await sdk_stream.get_final_message()
+                result.usage = {
+                    "input_tokens": message.usage.input_tokens,
+                    "output_tokens": message.usage.output_tokens
+                }
+
+            result.text_stream = text()
+            yield result
+
+
+class CassetteStore:
+    """Recorded completions on disk, one JSON file per request hash"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = Path(directory or settings.AI_CASSETTE_DIR)
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self.path(key)
+        if not path.exists():
+            return None
+        return json.loads(path.read_text())
+
+    def save(self, key: str, cassette: Dict[str, Any]):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Write then rename so concurrent readers never see a partial file
+        tmp = self.path(key).with_suffix(".tmp")
+        tmp.write_text(json.dumps(cassette, indent=2))
+        tmp.replace(self.path(key))
+
+    def keys(self) -> List[str]:
+        if not self.directory.exists():
+            return []
+        return sorted(path.stem for path in self.directory.glob("*.json"))
+
+    def find(self, key: str, fallback: str = "error") -> Optional[Dict[str, Any]]:
+        """Load the cassette for a key
+
+        With ``fallback="any"`` a request without a recording is served a
+        recorded cassette picked deterministically from its key, so load
+        tests with generated inventories still get realistic responses.
+        """
+        cassette = self.load(key)
+        if cassette is None and fallback == "any":
+            keys = self.keys()
+            if keys:
+                cassette = self.load(keys[int(key, 16) % len(keys)])
+        return cassette
+
+
+class RecordingTransport:
+    """Passes requests through to another transport and saves the responses"""
+
+    def __init__(self, inner=None, store: Optional[CassetteStore] = None):
+        self.inner = inner or AnthropicTransport()
+        self.store = store or CassetteStore()
+
+    @asynccontextmanager
+    async def stream(self, **request) -> AsyncIterator[TransportStream]:
+        key = cassette_key(request["model"], request["max_tokens"], request["messages"])
+
+        async with self.inner.stream(**request) as inner_stream:
+            result = TransportStream()
+
+            async def text():
+                chunks = []
+                async for chunk in inner_stream.text_stream:
+                    chunks.append(chunk)
+                    yield chunk
+                result.usage = inner_stream.usage
+                self.store.save(key, {
+                    "key": key,
+                    "request": request,
+                    "chunks": chunks,
+                    "usage": inner_stream.usage,
+                    "recorded_at": datetime.utcnow().isoformat()
+                })
+                logger.info(f"Recorded cassette {key}")
+
+            result.text_stream = text()
+            yield result
+
+
+def replay_error() -> Exception:
+    """Error injected by the replay transport, as the SDK raises for an overloaded API"""
+    from anthropic import InternalServerError
+
+    return InternalServerError(
+        "Injected replay error",
+        response=httpx.Response(529, request=httpx.Request("POST", "http://replay/v1/messages")),
+        body=None
+    )
+
+
+class ReplayTransport:
+    """Serves recorded completions locally with configurable latency and errors"""
+
+    def __init__(
+        self,
+        store: Optional[CassetteStore] = None,
+        latency_ms: Optional[int] = None,
+        chunk_delay_ms: Optional[int] = None,
+        error_rate: Optional[float] = None,
+        fallback: Optional[str] = None
+    ):
+        self.store = store or CassetteStore()
+        self.latency_ms = settings.AI_REPLAY_LATENCY_MS if latency_ms is None else latency_ms
+        self.chunk_delay_ms = settings.AI_REPLAY_CHUNK_DELAY_MS if chunk_delay_ms is None else chunk_delay_ms
+        self.error_rate = settings.AI_REPLAY_ERROR_RATE if error_rate is None else error_rate
+        self.fallback = fallback or settings.AI_REPLAY_FALLBACK
+
+    @asynccontextmanager
+    async def stream(self, **request) -> AsyncIterator[TransportStream]:
+        key = cassette_key(request["model"], request["max_tokens"], request["messages"])
+        cassette = self.store.find(key, self.fallback)
+        if cassette is None:
+            raise ValueError(f"No cassette recorded for request {key}")
+
+        await asyncio.sleep(self.latency_ms / 1000)
+        if random.random() < self.error_rate:
+            raise replay_error()
+
+        result = TransportStream()
+
+        async def text():
+            for chunk in cassette["chunks"]:
+                if self.chunk_delay_ms:
+                    await asyncio.sleep(self.chunk_delay_ms / 1000)
+                yield chunk
+            result.usage = cassette.get("usage") or {}
+
+        result.text_stream = text()
+        yield result
+
+
+def get_transport():
+    """Create the completion transport selected by AI_TRANSPORT"""
+    if settings.AI_TRANSPORT == "record":
+        return RecordingTransport()
+    if settings.AI_TRANSPORT == "replay":
+        return ReplayTransport()
+    return AnthropicTransport()
@@ -0,0 +1,334 @@
+# Curated installation recipes for common applications, used by the fast planner.
+#
+# Each recipe is matched against installed application names (case-insensitive
+# regular expressions). ``requires`` lists recipe keys that must be installed
+# first, ``stage`` controls the coarse install order, and the hardware fields
+# feed into the generated hardware recommendation.
+#
+# ``command`` is an unattended PowerShell command line that installs the
+# application and is run on the target machine as administrator. Recipes
+# that need site-specific media or values instead give ``install``
+# instructions, and their tasks are left to the technician.
+
+RECIPE_STAGES = ["runtime", "security", "system", "productivity", "communication",
+                 "browser", "development", "creative", "utility"]
+
+APP_RECIPES = [
+    # Runtimes
+    {
+        "key": "vcredist",
+        "name": "Microsoft Visual C++ Redistributables",
+        "match": [r"^microsoft visual c\+\+ \d{4}.*redistributable"],
+        "stage": "runtime",
+        "command": "winget install --id Microsoft.VCRedist.2015+.x64 --silent --accept-package-agreements",
+        "estimated_minutes": 3,
+    },
+    {
+        "key": "dotnet",
+        "name": "Microsoft .NET Runtime",
+        "match": [r"^microsoft \.net( core)? (desktop )?runtime", r"^microsoft windows desktop runtime",
+                  r"^microsoft asp\.net core"],
+        "stage": "runtime",
+        "command": "winget install --id Microsoft.DotNet.DesktopRuntime.8 --silent --accept-package-agreements",
+        "estimated_minutes": 4,
+    },
+    {
+        "key": "java",
+        "name": "Java Runtime",
+        "match": [r"^java( \d+)?( update \d+)?( \(64-bit\))?$", r"^java\(tm\)", r"^(eclipse )?temurin",
+                  r"^microsoft build of openjdk"],
+        "stage": "runtime",
+        "command": "winget install --id EclipseAdoptium.Temurin.21.JRE --silent --accept-package-agreements",
+        "estimated_minutes": 4,
+    },
+    {
+        "key": "python",
+        "name": "Python",
+        "match": [r"^python \d+\.\d+"],
+        "stage": "runtime",
+        "command": "winget install --id Python.Python.3.12 --silent --accept-package-agreements",
+        "estimated_minutes": 4,
+    },
+    # Security and system
+    {
+        "key": "forticlient",
+        "name": "FortiClient VPN",
+        "match": [r"^forticlient"],
+        "stage": "security",
+        "command": "winget install --id Fortinet.FortiClientVPN --silent --accept-package-agreements",
+        "estimated_minutes": 6,
+        "manual_steps": ["Re-enter VPN credentials in FortiClient"],
+    },
+    {
+        "key": "globalprotect",
+        "name": "GlobalProtect VPN",
+        "match": [r"^globalprotect"],
+        "stage": "security",
+        "install": "Run msiexec /i GlobalProtect64.msi /quiet PORTAL=<portal> with the company's portal address",
+        "estimated_minutes": 6,
+        "manual_steps": ["Confirm GlobalProtect portal address and sign in"],
+    },
+    {
+        "key": "cisco_anyconnect",
+        "name": "Cisco Secure Client",
+        "match": [r"^cisco (anyconnect|secure client)"],
+        "stage": "security",
+        "install": "Run msiexec /i cisco-secure-client-core-vpn.msi /quiet /norestart from the VPN deployment share",
+        "estimated_minutes": 6,
+        "manual_steps": ["Sign in to Cisco Secure Client"],
+    },
+    {
+        "key": "7zip",
+        "name": "7-Zip",
+        "match": [r"^7-zip"],
+        "stage": "system",
+        "command": "winget install --id 7zip.7zip --silent --accept-package-agreements",
+        "estimated_minutes": 1,
+    },
+    {
+        "key": "notepadpp",
+        "name": "Notepad++",
+        "match": [r"^notepad\+\+"],
+        "stage": "utility",
+        "command": "winget install --id Notepad++.Notepad++ --silent --accept-package-agreements",
+        "estimated_minutes": 1,
+    },
+    # Productivity
+    {
+        "key": "office",
+        "name": "Microsoft 365 Apps",
+        "match": [r"^microsoft (office|365)", r"^microsoft 365 apps"],
+        "stage": "productivity",
+        "install": "Run setup.exe /configure office-configuration.xml from the Office deployment share",
+        "estimated_minutes": 25,
+        "requires": ["vcredist"],
+        "min_ram_gb": 8,
+        "disk_gb": 10,
+        "manual_steps": ["Sign in to Microsoft 365 to activate the Office license",
+                         "Reconnect Outlook profile and verify mailbox sync"],
+    },
+    {
+        "key": "acrobat_reader",
+        "name": "Adobe Acrobat Reader",
+        "match": [r"^adobe acrobat reader", r"^adobe acrobat( \(64-bit\))?$"],
+        "stage": "productivity",
+        "command": "winget install --id Adobe.Acrobat.Reader.64-bit --silent --accept-package-agreements",
+        "estimated_minutes": 5,
+    },
+    {
+        "key": "acrobat_pro",
+        "name": "Adobe Acrobat Pro",
+        "match": [r"^adobe acrobat (pro|dc|standard)"],
+        "stage": "productivity",
+        "install": "Install from Adobe Admin Console package",
+        "estimated_minutes": 10,
+        "manual_steps": ["Sign in with the user's Adobe ID to activate Acrobat"],
+    },
+    {
+        "key": "libreoffice",
+        "name": "LibreOffice",
+        "match": [r"^libreoffice"],
+        "stage": "productivity",
+        "command": "winget install --id TheDocumentFoundation.LibreOffice --silent --accept-package-agreements",
+        "estimated_minutes": 8,
+    },
+    # Communication
+    {
+        "key": "teams",
+        "name": "Microsoft Teams",
+        "match": [r"^microsoft teams", r"^teams machine-wide installer"],
+        "stage": "communication",
+        "command": "winget install --id Microsoft.Teams --silent --accept-package-agreements",
+        "estimated_minutes": 5,
+        "manual_steps": ["Sign in to Microsoft Teams"],
+    },
+    {
+        "key": "zoom",
+        "name": "Zoom Workplace",
+        "match": [r"^zoom( workplace)?( \(64-bit\))?$", r"^zoom outlook plugin"],
+        "stage": "communication",
+        "command": "winget install --id Zoom.Zoom --silent --accept-package-agreements",
+        "estimated_minutes": 3,
+    },
+    {
+        "key": "slack",
+        "name": "Slack",
+        "match": [r"^slack"],
+        "stage": "communication",
+        "command": "winget install --id SlackTechnologies.Slack --silent --accept-package-agreements",
+        "estimated_minutes": 3,
+        "manual_steps": ["Sign in to Slack workspaces"],
+    },
+    {
+        "key": "webex",
+        "name": "Cisco Webex",
+        "match": [r"^(cisco )?webex"],
+        "stage": "communication",
+        "command": "winget install --id Cisco.Webex --silent --accept-package-agreements",
+        "estimated_minutes": 4,
+    },
+    # Browsers
+    {
+        "key": "chrome",
+        "name": "Google Chrome",
+        "match": [r"^google chrome"],
+        "stage": "browser",
+        "command": "winget install --id Google.Chrome --silent --accept-package-agreements",
+        "estimated_minutes": 3,
+        "manual_steps": ["Sign in to Chrome to restore bookmarks and extensions"],
+    },
+    {
+        "key": "firefox",
+        "name": "Mozilla Firefox",
+        "match": [r"^mozilla firefox"],
+        "stage": "browser",
+        "command": "winget install --id Mozilla.Firefox --silent --accept-package-agreements",
+        "estimated_minutes": 3,
+    },
+    {
+        "key": "edge",
+        "name": "Microsoft Edge",
+        "match": [r"^microsoft edge$"],
+        "stage": "browser",
+        "install": "Preinstalled with Windows; verify version with winget upgrade Microsoft.Edge",
+        "estimated_minutes": 1,
+    },
+    # Development
+    {
+        "key": "git",
+        "name": "Git",
+        "match": [r"^git( version [\d.]+)?$", r"^git for windows"],
+        "stage": "development",
+        "command": "winget install --id Git.Git --silent --accept-package-agreements",
+        "estimated_minutes": 2,
+    },
+    {
+        "key": "vscode",
+        "name": "Visual Studio Code",
+        "match": [r"^microsoft visual studio code"],
+        "stage": "development",
+        "command": "winget install --id Microsoft.VisualStudioCode --silent --accept-package-agreements",
+        "estimated_minutes": 3,
+    },
+    {
+        "key": "visual_studio",
+        "name": "Visual Studio",
+        "match": [r"^visual studio (community|professional|enterprise)"],
+        "stage": "development",
+        "install": "Run vs_installer.exe --quiet --config .vsconfig with the team's .vsconfig",
+        "estimated_minutes": 45,
+        "requires": ["dotnet"],
+        "min_ram_gb": 16,
+        "disk_gb": 40,
+        "cpu_intensive": True,
+        "manual_steps": ["Sign in to Visual Studio to apply the license"],
+    },
+    {
+        "key": "docker_desktop",
+        "name": "Docker Desktop",
+        "match": [r"^docker desktop"],
+        "stage": "development",
+        "command": "winget install --id Docker.DockerDesktop --silent --accept-package-agreements",
+        "estimated_minutes": 10,
+        "min_ram_gb": 16,
+        "disk_gb": 30,
+        "cpu_intensive": True,
+        "manual_steps": ["Enable WSL 2 and reboot before first Docker start"],
+    },
+    {
+        "key": "nodejs",
+        "name": "Node.js",
+        "match": [r"^node\.js"],
+        "stage": "development",
+        "command": "winget install --id OpenJS.NodeJS.LTS --silent --accept-package-agreements",
+        "estimated_minutes": 2,
+    },
+    {
+        "key": "putty",
+        "name": "PuTTY",
+        "match": [r"^putty"],
+        "stage": "utility",
+        "command": "winget install --id PuTTY.PuTTY --silent --accept-package-agreements",
+        "estimated_minutes": 1,
+    },
+    # Creative
+    {
+        "key": "adobe_creative_cloud",
+        "name": "Adobe Creative Cloud",
+        "match": [r"^adobe creative cloud", r"^adobe (photoshop|illustrator|premiere pro|after effects|indesign)"],
+        "stage": "creative",
+        "install": "Install from Adobe Admin Console package",
+        "estimated_minutes": 30,
+        "min_ram_gb": 32,
+        "disk_gb": 50,
+        "gpu": True,
+        "cpu_intensive": True,
+        "manual_steps": ["Sign in with the user's Adobe ID and reinstall Creative Cloud apps"],
+    },
+    {
+        "key": "autocad",
+        "name": "Autodesk AutoCAD",
+        "match": [r"^autocad", r"^autodesk autocad"],
+        "stage": "creative",
+        "install": "Deploy from Autodesk Account deployment image",
+        "estimated_minutes": 40,
+        "requires": ["dotnet", "vcredist"],
+        "min_ram_gb": 32,
+        "disk_gb": 40,
+        "gpu": True,
+        "cpu_intensive": True,
+        "manual_steps": ["Sign in to Autodesk account to activate license"],
+    },
+    {
+        "key": "vlc",
+        "name": "VLC media player",
+        "match": [r"^vlc media player"],
+        "stage": "utility",
+        "command": "winget install --id VideoLAN.VLC --silent --accept-package-agreements",
+        "estimated_minutes": 2,
+    },
+    # Utilities
+    {
+        "key": "onedrive",
+        "name": "Microsoft OneDrive",
+        "match": [r"^microsoft onedrive"],
+        "stage": "utility",
+        "install": "Preinstalled with Windows; update with winget upgrade Microsoft.OneDrive",
+        "estimated_minutes": 2,
+        "manual_steps": ["Sign in to OneDrive and confirm Known Folder Move"],
+    },
+    {
+        "key": "dropbox",
+        "name": "Dropbox",
+        "match": [r"^dropbox"],
+        "stage": "utility",
+        "command": "winget install --id Dropbox.Dropbox --silent --accept-package-agreements",
+        "estimated_minutes": 3,
+        "manual_steps": ["Sign in to Dropbox"],
+    },
+    {
+        "key": "teamviewer",
+        "name": "TeamViewer",
+        "match": [r"^teamviewer"],
+        "stage": "utility",
+        "command": "winget install --id TeamViewer.TeamViewer --silent --accept-package-agreements",
+        "estimated_minutes": 2,
+    },
+]
+
+# Installed entries that are not migrated as applications (updates, drivers,
+# components that ship with Windows or come along with another install)
+IGNORED_APPLICATIONS = [
+    r"^(security )?update for",
+    r"\(kb\d+\)",
+    r"^hotfix for",
+    r"^microsoft update health tools",
+    r"^microsoft edge (update|webview2)",
+    r"^windows (sdk|software development kit|driver package)",
+    r"^intel\(r\)",
+    r"^realtek",
+    r"^nvidia .*driver",
+    r"^amd (software|chipset)",
+    r"^microsoft office .*(proofing|mui|shared)",
+    r"^office 16 click-to-run",
+]
@@ -0,0 +1,107 @@
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.models.agent import Agent, AgentStatus
+from app.models.dashboard import (
+    DashboardCounter, LAST_SEEN_PREFIX, LAST_SEEN_FORMAT, NEVER_SEEN, ACTIVE_PROGRESS, MANAGED_DATA_MB,
+    adjust_counters, agent_counters, migration_counters
+)
+from app.models.inventory import Inventory
+from app.models.migration import Migration, MigrationStatus
+
+
+class DashboardService:
+    """Fleet-wide or per-company totals for the dashboard home page
+
+    Read from the counters in app.models.dashboard, a few rows per company,
+    however many agents and migrations there are.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def summary(self, company_id: Optional[str] = None) -> Dict[str, Any]:
+        query = self.db.query(DashboardCounter.name, func.sum(DashboardCounter.value))
+        if company_id:
+            query = query.filter(DashboardCounter.company_id == company_id)
+        counters = dict(query.group_by(DashboardCounter.name).all())
+
+        def count(name: str) -> int:
+            return int(round(counters.get(name) or 0))
+
+        # Hours that ended before the cutoff; an agent last seen in the hour spanning it isn't stale yet
+        now = datetime.utcnow()
+        cutoff = now - timedelta(hours=settings.DASHBOARD_STALE_AGENT_HOURS)
+        stale = sum(
+            count(name) for name in counters
+            if name.startswith(LAST_SEEN_PREFIX)
+            and datetime.strptime(name[len(LAST_SEEN_PREFIX):], LAST_SEEN_FORMAT) + timedelta(hours=1) <= cutoff
+        )
+
+        agents = {status.value: count(f"agents.{status.value}") for status in AgentStatus}
+        migrations = {status.value: count(f"migrations.{status.value}") for status in MigrationStatus}
+        running = migrations[MigrationStatus.IN_PROGRESS.value]
+        return {
+            "company_id": company_id,
+            "generated_at": now,
+            "agents": {
+                "total": sum(agents.values()),
+                "by_status": agents,
+                "stale": stale,
+                "never_seen": count(NEVER_SEEN),
+                "stale_after_hours": settings.DASHBOARD_STALE_AGENT_HOURS,
+            },
+            "migrations": {
+                "total": sum(migrations.values()),
+                "by_status": migrations,
+                "active": {
+                    "count": running,
+                    "average_progress_percent": round((counters.get(ACTIVE_PROGRESS) or 0) / running, 1) if running else 0.0,
+                },
+            },
+            "managed_data_mb": count(MANAGED_DATA_MB),
+        }
+
+    def rebuild(self) -> Dict[str, int]:
+        """Recount every counter from the tables
+
+        Needed once when upgrading to a version with counters, and to repair
+        them after changes made outside the API. Scans the agents, migrations
+        and latest inventories.
+        """
+        connection = self.db.connection()
+        if connection.dialect.name == "postgresql":
+            # Writers' counter updates wait for the recount, so none is lost or counted twice
+            connection.execute(text("LOCK TABLE dashboard_counters IN EXCLUSIVE MODE"))
+
+        totals: Dict[tuple, float] = defaultdict(float)
+        for row in self.db.query(Agent.company_id, Agent.status, Agent.last_seen).yield_per(1000):
+            for key, value in agent_counters(*row).items():
+                totals[key] += value
+        for row in self.db.query(Migration.company_id, Migration.status, Migration.progress_percent).yield_per(1000):
+            for key, value in migration_counters(*row).items():
+                totals[key] += value
+
+        # One latest inventory per agent, even when two share a timestamp
+        ranked = self.db.query(
+            Inventory.company_id,
+            Inventory.total_data_size_mb,
+            func.row_number().over(
+                partition_by=Inventory.agent_id, order_by=Inventory.timestamp.desc()
+            ).label("rank")
+        ).subquery()
+        data = self.db.query(ranked.c.company_id, func.sum(ranked.c.total_data_size_mb)).filter(
+            ranked.c.rank == 1
+        ).group_by(ranked.c.company_id)
+        for company, total_mb in data:
+            totals[(company, MANAGED_DATA_MB)] += total_mb or 0
+
+        counters = {key: value for key, value in totals.items() if value}
+        self.db.query(DashboardCounter).delete(synchronize_session=False)
+        adjust_counters(connection, counters)
+        self.db.commit()
+        return {"counters": len(counters)}
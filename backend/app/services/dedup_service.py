@@ -0,0 +1,136 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.core.config import settings
+from app.models.agent import Agent
+from app.models.file_index import AgentFile, AgentFileChunk
+from app.models.migration import Migration
+from app.services.wave_scheduler import agent_site
+
+# Peer machines per chunk count query, which keeps its parameters well under PostgreSQL's limit of 65535
+DEDUP_PEER_BATCH = 10000
+
+
+def file_chunks(size_bytes: int, content_hash: str, chunk_hashes: Optional[List[str]]) -> List[Tuple[str, int]]:
+    """(hash, size) of each chunk of a file; unchunked files are one chunk"""
+    if not chunk_hashes:
+        return [(content_hash, size_bytes)]
+    chunk = settings.DEDUP_CHUNK_BYTES
+    return [
+        (chunk_hash, max(0, min(chunk, size_bytes - i * chunk)))
+        for i, chunk_hash in enumerate(chunk_hashes)
+    ]
+
+
+class DedupIndex:
+    """Content-hash index of the files agents report
+
+    Agents report a manifest of their user data files with a hash of each
+    fixed-size chunk. A migration then only needs to move the chunks that
+    are unique to its source machine; content that several machines at the
+    same site share is staged once on the site's cache host.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def index_files(self, agent_id: str, files: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Replace an agent's file manifest"""
+        self.db.query(AgentFile).filter(AgentFile.agent_id == agent_id).delete(synchronize_session=False)
+        self.db.query(AgentFileChunk).filter(AgentFileChunk.agent_id == agent_id).delete(synchronize_session=False)
+
+        chunks: Dict[str, int] = {}
+        rows = []
+        for entry in files:
+            rows.append({
+                "agent_id": agent_id,
+                "path": entry["path"],
+                "size_bytes": entry["size_bytes"],
+                "content_hash": entry["sha256"],
+                "chunk_hashes": entry.get("chunks"),
+            })
+            for chunk_hash, size in file_chunks(entry["size_bytes"], entry["sha256"], entry.get("chunks")):
+                chunks[chunk_hash] = size
+
+        self.db.bulk_insert_mappings(AgentFile, rows)
+        self.db.bulk_insert_mappings(AgentFileChunk, [
+            {"agent_id": agent_id, "chunk_hash": chunk_hash, "size_bytes": size}
+            for chunk_hash, size in chunks.items()
+        ])
+        self.db.commit()
+        return {"files": len(rows), "chunks": len(chunks), "bytes": sum(chunks.values())}
+
+    def transfer_plan(self, migration: Migration) -> Dict[str, Any]:
+        """Bytes a migration transfers from its source machine and from the site cache"""
+        source = migration.source_agent
+        site = agent_site(source)
+
+        files = self.db.query(
+            AgentFile.size_bytes, AgentFile.content_hash
+        ).filter(AgentFile.agent_id == source.id).all()
+        chunks = dict(self.db.query(
+            AgentFileChunk.chunk_hash, AgentFileChunk.size_bytes
+        ).filter(AgentFileChunk.agent_id == source.id).all())
+
+        # Shared content only saves a transfer when there is a cache host to stage it on
+        cache_host = settings.DEDUP_CACHE_HOST.format(site=site) or None
+        shared = self._shared_chunks(source, site) if cache_host else set()
+        raw_bytes = sum(size for size, _ in files)
+        unique_bytes = sum(chunks.values())
+        cached_bytes = sum(size for chunk_hash, size in chunks.items() if chunk_hash in shared)
+        source_bytes = unique_bytes - cached_bytes
+
+        return {
+            "generated_at": datetime.utcnow().isoformat(),
+            "site": site,
+            "cache_host": cache_host,
+            "files": len(files),
+            "duplicate_files": len(files) - len({content_hash for _, content_hash in files}),
+            "chunks": len(chunks),
+            "shared_chunks": len(shared),
+            "raw_bytes": raw_bytes,
+            "unique_bytes": unique_bytes,
+            "cached_bytes": cached_bytes,
+            "source_bytes": source_bytes,
+            "bytes_saved": raw_bytes - source_bytes,
+        }
+
+    def _shared_chunks(self, source: Agent, site: str) -> set:
+        """Chunks of the source machine that enough other machines at its site also hold
+
+        Sites come from metadata or the IP address (see agent_site), which
+        SQL can't compare, so peers are picked in Python and their chunks
+        counted DEDUP_PEER_BATCH machines at a time.
+        """
+        source_chunks = self.db.query(AgentFileChunk.chunk_hash).filter(
+            AgentFileChunk.agent_id == source.id
+        ).scalar_subquery()
+        # Only machines holding some of the source's content can share it
+        holding = self.db.query(AgentFileChunk.agent_id).filter(
+            AgentFileChunk.chunk_hash.in_(source_chunks)
+        ).distinct().scalar_subquery()
+
+        peers = self.db.query(Agent.id, Agent.agent_metadata).filter(Agent.id.in_(holding))
+        if source.company_id:
+            peers = peers.filter(Agent.company_id == source.company_id)
+        peer_ids = [
+            peer.id for peer in peers.yield_per(DEDUP_PEER_BATCH)
+            if agent_site(peer) == site
+        ]
+
+        holders: Dict[str, int] = {}
+        for start in range(0, len(peer_ids), DEDUP_PEER_BATCH):
+            rows = self.db.query(
+                AgentFileChunk.chunk_hash, func.count(AgentFileChunk.agent_id)
+            ).filter(
+                AgentFileChunk.chunk_hash.in_(source_chunks),
+                AgentFileChunk.agent_id.in_(peer_ids[start:start + DEDUP_PEER_BATCH])
+            ).group_by(AgentFileChunk.chunk_hash)
+            for chunk_hash, machines in rows:
+                holders[chunk_hash] = holders.get(chunk_hash, 0) + machines
+        return {
+            chunk_hash for chunk_hash, machines in holders.items()
+            if machines >= settings.DEDUP_MIN_SHARED_MACHINES
+        }
@@ -0,0 +1,485 @@
+from sqlalchemy.orm import Session
+from typing import Dict, Any, List, Optional, Tuple
+import math
+import re
+import logging
+
+from app.core.config import settings
+from app.db.partitioning import tenant_key
+from app.models.agent import Agent
+from app.models.inventory import Inventory
+from app.services.ai_service import AIService, TaskCallback
+from app.services.app_recipes import APP_RECIPES, IGNORED_APPLICATIONS, RECIPE_STAGES
+from app.services.sizing_service import FleetSizingService
+from app.services.usage_analytics import DEAD, UsageAnalytics
+
+logger = logging.getLogger(__name__)
+
+PREPARE_TASK = "Prepare target machine"
+VERIFY_TASK = "Verify migration"
+
+# Sustained copy rate assumed for user data transfers over a wired LAN
+TRANSFER_MB_PER_MINUTE = 3000
+
+# Install time assumed for AI-planned tasks that come without an estimate
+DEFAULT_AI_TASK_MINUTES = 30
+
+# Recipes other applications silently depend on; never pruned for lack of use
+UNPRUNABLE_STAGES = {"runtime", "security", "system"}
+
+
+class FastPlanner:
+    """Deterministic migration planner backed by the application recipe catalog
+
+    Applications with a recipe are planned locally. Only the remaining
+    applications are sent to Claude, and the tasks it returns are merged
+    into the plan.
+    """
+
+    def __init__(self, ai_service: Optional[AIService] = None):
+        self._ai_service = ai_service
+        self._recipes = {recipe["key"]: recipe for recipe in APP_RECIPES}
+        self._patterns = [
+            (re.compile(pattern, re.IGNORECASE), recipe["key"])
+            for recipe in APP_RECIPES
+            for pattern in recipe["match"]
+        ]
+        self._ignored = [re.compile(pattern, re.IGNORECASE) for pattern in IGNORED_APPLICATIONS]
+
+    @property
+    def ai_service(self) -> AIService:
+        # Created on demand so fully recognised inventories never need an API key
+        if self._ai_service is None:
+            self._ai_service = AIService()
+        return self._ai_service
+
+    async def generate_migration_plan(
+        self,
+        source_agent_id: str,
+        db: Session,
+        on_task: Optional[TaskCallback] = None
+    ) -> Dict[str, Any]:
+        """Generate a migration plan, calling Claude only for unknown applications"""
+
+        agent = db.query(Agent).filter(Agent.id == source_agent_id).first()
+        inventory = agent and db.query(Inventory).filter(
+            Inventory.company_id == tenant_key(agent.company_id),
+            Inventory.agent_id == source_agent_id
+        ).order_by(Inventory.timestamp.desc()).first()
+
+        if not inventory:
+            raise ValueError("No inventory found for agent")
+
+        # Size from the agent's usage history when it has one
+        hardware_spec = FleetSizingService(db).hardware_spec(
+            source_agent_id, AIService._generate_default_hardware_spec(inventory), inventory.company_id
+        )
+        usage = None
+        if settings.USAGE_DEAD_APP_ACTION != "keep":
+            usage = UsageAnalytics(db).classify(inventory)
+        plan, unknown = self.build_plan(inventory, hardware_spec, usage)
+
+        if unknown:
+            # Publish the local part of the plan before waiting on Claude
+            if on_task:
+                for task in plan["tasks"]:
+                    await on_task(task)
+
+            logger.info(f"Requesting AI tasks for {len(unknown)} unrecognised applications")
+            ai_plan = await self.ai_service.generate_application_tasks(
+                inventory, unknown, on_task
+            )
+            self.merge_ai_tasks(plan, ai_plan)
+
+        return plan
+
+    def classify(
+        self,
+        applications: List[Dict[str, Any]]
+    ) -> Tuple[Dict[str, List[str]], List[Dict[str, Any]], int]:
+        """Split installed applications into recipe matches, unknown and ignored"""
+
+        matched: Dict[str, List[str]] = {}
+        unknown = []
+        ignored = 0
+
+        for app in applications:
+            name = (app.get("name") or "").strip()
+            if not name:
+                continue
+            if any(pattern.search(name) for pattern in self._ignored):
+                ignored += 1
+                continue
+            key = self.match(name)
+            if key:
+                matched.setdefault(key, []).append(name)
+            else:
+                unknown.append(app)
+
+        return matched, unknown, ignored
+
+    def match(self, name: str) -> Optional[str]:
+        """Return the recipe key for an application name, if any"""
+        for pattern, key in self._patterns:
+            if pattern.search(name):
+                return key
+        return None
+
+    def build_plan(
+        self,
+        inventory: Inventory,
+        hardware_spec: Optional[Dict[str, Any]] = None,
+        usage: Optional[Dict[str, Any]] = None
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Build the recipe-based part of the plan
+
+        ``hardware_spec`` is the baseline that recipe requirements are applied
+        on top of; it defaults to the inventory snapshot heuristic. ``usage``
+        is the UsageAnalytics classification; dead applications in it are left
+        out according to USAGE_DEAD_APP_ACTION. Returns the plan and the
+        applications that still need AI planning.
+        """
+
+        matched, unknown, ignored = self.classify(inventory.installed_applications or [])
+        pruned_recipes, pruned_unknown = self.prune_unused(matched, unknown, usage)
+        recipe_keys = self.install_order(matched.keys())
+        # A pruned recipe that a kept one requires is installed anyway
+        pruned_recipes = {key: names for key, names in pruned_recipes.items() if key not in recipe_keys}
+
+        tasks = [self._task(
+            PREPARE_TASK,
+            "Apply Windows updates, join the domain and create the user profile on the target machine",
+            20,
+            [],
+            category="prepare"
+        )]
+        install_tasks, manual_steps = self.recipe_install_tasks(recipe_keys)
+        tasks.extend(install_tasks)
+        pruning = self.pruning_report(usage, pruned_recipes, pruned_unknown, manual_steps)
+        tasks.extend(self.configuration_tasks(inventory))
+        tasks.append(self._task(
+            VERIFY_TASK,
+            "Verify applications launch, data is present and network resources are reachable",
+            15,
+            [task["name"] for task in tasks],
+            category="verify"
+        ))
+        self._renumber(tasks)
+
+        plan = {
+            "plan": {
+                "summary": (
+                    f"Rule-based plan covering {len(recipe_keys)} catalog applications"
+                    + (f"; {len(unknown)} applications planned by AI" if unknown else "")
+                ),
+                "planner": "recipe",
+                "recipe_applications": {
+                    self._recipes[key]["name"]: matched.get(key, []) for key in recipe_keys
+                },
+                "ai_applications": [app.get("name") for app in unknown],
+                "ignored_applications": ignored,
+                "usage_pruning": pruning
+            },
+            "tasks": tasks,
+            "hardware_spec": self.hardware_spec(inventory, recipe_keys, hardware_spec),
+            "recommendations": {},
+            "manual_steps": manual_steps,
+            "estimated_minutes": sum(task["estimated_minutes"] for task in tasks),
+            "risks": []
+        }
+        return plan, unknown
+
+    def prune_unused(
+        self,
+        matched: Dict[str, List[str]],
+        unknown: List[Dict[str, Any]],
+        usage: Optional[Dict[str, Any]]
+    ) -> Tuple[Dict[str, List[str]], List[Dict[str, Any]]]:
+        """Remove dead applications from the classified ones, in place
+
+        A recipe is only pruned when every application it matched is dead,
+        and never for runtime, security or system recipes.
+        """
+        if not usage or settings.USAGE_DEAD_APP_ACTION == "keep":
+            return {}, []
+        apps = usage["applications"]
+
+        def dead(name: str) -> bool:
+            return apps.get(name, {}).get("status") == DEAD
+
+        pruned_recipes = {
+            key: names for key, names in matched.items()
+            if self._recipes[key]["stage"] not in UNPRUNABLE_STAGES and all(dead(name) for name in names)
+        }
+        for key in pruned_recipes:
+            del matched[key]
+
+        pruned_unknown = [app for app in unknown if dead((app.get("name") or "").strip())]
+        unknown[:] = [app for app in unknown if not dead((app.get("name") or "").strip())]
+        return pruned_recipes, pruned_unknown
+
+    def recipe_install_tasks(
+        self,
+        recipe_keys: List[str]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Build install tasks and manual steps for already ordered recipes"""
+
+        tasks = []
+        manual_steps = []
+
+        for key in recipe_keys:
+            recipe = self._recipes[key]
+            tasks.append(self._task(
+                self._install_task_name(recipe),
+                recipe.get("install") or recipe["command"],
+                recipe["estimated_minutes"],
+                [PREPARE_TASK] + [
+                    self._install_task_name(self._recipes[dep])
+                    for dep in recipe.get("requires", [])
+                ],
+                category="install",
+                recipe=key,
+                command=recipe.get("command")
+            ))
+            for step in recipe.get("manual_steps", []):
+                manual_steps.append({"application": recipe["name"], "step": step})
+
+        return tasks, manual_steps
+
+    def merge_ai_tasks(self, plan: Dict[str, Any], ai_plan: Dict[str, Any]):
+        """Merge AI-generated application tasks into a recipe-based plan"""
+
+        ai_tasks = [
+            dict(task) for task in ai_plan.get("tasks", [])
+            if isinstance(task, dict) and task.get("name")
+        ]
+        # Merging renumbers the tasks, so references by Claude's numbering must become names first
+        self.name_dependencies(ai_tasks, {task.get("name") for task in plan["tasks"]})
+        for task in ai_tasks:
+            task.update({
+                "estimated_minutes": task.get("estimated_minutes") or DEFAULT_AI_TASK_MINUTES,
+                "dependencies": task["dependencies"] or [PREPARE_TASK],
+                "category": "install",
+                "source": "ai"
+            })
+        self.insert_install_tasks(plan, ai_tasks)
+
+        plan["manual_steps"].extend(
+            step if isinstance(step, dict) else {"step": str(step)}
+            for step in ai_plan.get("manual_steps", [])
+        )
+        if isinstance(ai_plan.get("recommendations"), dict):
+            plan["recommendations"].update(ai_plan["recommendations"])
+
+    def insert_install_tasks(self, plan: Dict[str, Any], new_tasks: List[Dict[str, Any]]):
+        """Insert install tasks ahead of the configuration, data and verify tasks"""
+
+        tasks = plan["tasks"]
+        known_names = {task.get("name") for task in tasks}
+        insert_at = next(
+            (i for i, task in enumerate(tasks) if task.get("category") in ("configure", "data", "verify")),
+            len(tasks)
+        )
+
+        added = []
+        for task in new_tasks:
+            if task["name"] in known_names:
+                continue
+            known_names.add(task["name"])
+            added.append(task)
+
+        tasks[insert_at:insert_at] = added
+        if tasks and tasks[-1].get("category") == "verify":
+            tasks[-1]["dependencies"] = [task["name"] for task in tasks[:-1]]
+        self._renumber(tasks)
+        plan["estimated_minutes"] = sum(task.get("estimated_minutes") or 0 for task in tasks)
+
+    def install_order(self, keys) -> List[str]:
+        """Order recipes by stage, pulling in their prerequisites first"""
+
+        required = set()
+        pending = list(keys)
+        while pending:
+            key = pending.pop()
+            if key not in required:
+                required.add(key)
+                pending.extend(self._recipes[key].get("requires", []))
+
+        ordered: List[str] = []
+
+        def visit(key: str, path: Tuple[str, ...] = ()):
+            if key in ordered or key in path:
+                return
+            for dep in self._recipes[key].get("requires", []):
+                visit(dep, path + (key,))
+            ordered.append(key)
+
+        for key in sorted(required, key=lambda k: (RECIPE_STAGES.index(self._recipes[k]["stage"]), k)):
+            visit(key)
+        return ordered
+
+    def configuration_tasks(self, inventory: Inventory) -> List[Dict[str, Any]]:
+        tasks = []
+
+        if inventory.certificates:
+            tasks.append(self._task(
+                "Import certificates",
+                f"Export and import {len(inventory.certificates)} certificates into the matching stores",
+                5 + len(inventory.certificates) // 10,
+                [PREPARE_TASK],
+                category="configure"
+            ))
+        if inventory.vpn_connections:
+            tasks.append(self._task(
+                "Configure VPN connections",
+                f"Recreate {len(inventory.vpn_connections)} VPN connection profiles",
+                5 * len(inventory.vpn_connections),
+                [PREPARE_TASK],
+                category="configure"
+            ))
+        if inventory.registry_settings:
+            tasks.append(self._task(
+                "Apply registry settings",
+                f"Import {len(inventory.registry_settings)} user registry settings",
+                10,
+                [PREPARE_TASK],
+                category="configure"
+            ))
+        if inventory.user_data_locations:
+            size_mb = inventory.total_data_size_mb or 0
+            tasks.append(self._task(
+                "Transfer user data",
+                f"Copy {len(inventory.user_data_locations)} user data locations ({size_mb} MB)",
+                10 + math.ceil(size_mb / TRANSFER_MB_PER_MINUTE),
+                [PREPARE_TASK],
+                category="data"
+            ))
+
+        return tasks
+
+    def hardware_spec(
+        self,
+        inventory: Inventory,
+        recipe_keys: List[str],
+        spec: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Raise ``spec``, the inventory snapshot heuristic by default, to the recipes' requirements"""
+        spec = spec or AIService._generate_default_hardware_spec(inventory)
+        recipes = [self._recipes[key] for key in recipe_keys]
+
+        ram_recipes = [r for r in recipes if r.get("min_ram_gb", 0) > spec["ram"]["recommendation_gb"]]
+        if ram_recipes:
+            spec["ram"]["recommendation_gb"] = max(r["min_ram_gb"] for r in ram_recipes)
+            spec["ram"]["justification"] = "Required by " + ", ".join(r["name"] for r in ram_recipes)
+
+        disk_gb = sum(r.get("disk_gb", 0) for r in recipes)
+        if disk_gb:
+            spec["storage"]["recommendation_gb"] += disk_gb
+            spec["storage"]["justification"] += f"; includes {disk_gb}GB for application installs"
+
+        cpu_recipes = [r["name"] for r in recipes if r.get("cpu_intensive")]
+        if cpu_recipes:
+            spec["cpu"] = {
+                "recommendation": "High-performance processor (Intel i7/i9 or AMD Ryzen 7/9)",
+                "justification": "CPU-intensive applications: " + ", ".join(cpu_recipes)
+            }
+
+        gpu_recipes = [r["name"] for r in recipes if r.get("gpu")]
+        if gpu_recipes:
+            spec["gpu"] = {
+                "recommendation": "Dedicated GPU with 8GB+ VRAM (NVIDIA RTX or AMD Radeon Pro)",
+                "justification": "Graphics-intensive applications: " + ", ".join(gpu_recipes)
+            }
+
+        return spec
+
+    def pruning_report(
+        self,
+        usage: Optional[Dict[str, Any]],
+        pruned_recipes: Dict[str, List[str]],
+        pruned_unknown: List[Dict[str, Any]],
+        manual_steps: List[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """Summarize what usage pruning left out and add deferred installs as manual steps"""
+        if not usage:
+            return None
+
+        pruned = [
+            {
+                "application": self._recipes[key]["name"],
+                "installed": names,
+                "estimated_minutes": self._recipes[key]["estimated_minutes"]
+            }
+            for key, names in pruned_recipes.items()
+        ] + [
+            {
+                "application": app.get("name"),
+                "installed": [app.get("name")],
+                "estimated_minutes": DEFAULT_AI_TASK_MINUTES
+            }
+            for app in pruned_unknown
+        ]
+        if settings.USAGE_DEAD_APP_ACTION == "defer":
+            days = min(usage["window_days"], int(usage["observed_days"]))
+            for entry in pruned:
+                manual_steps.append({
+                    "application": entry["application"],
+                    "step": f"Not used in the last {days} days; install on request"
+                })
+
+        return {
+            "action": settings.USAGE_DEAD_APP_ACTION,
+            "window_days": usage["window_days"],
+            "observed_days": usage["observed_days"],
+            "counts": usage["counts"],
+            "pruned_applications": pruned,
+            "minutes_saved": sum(entry["estimated_minutes"] for entry in pruned)
+        }
+
+    @staticmethod
+    def _install_task_name(recipe: Dict[str, Any]) -> str:
+        return f"Install {recipe['name']}"
+
+    @staticmethod
+    def _task(
+        name: str,
+        instructions: str,
+        estimated_minutes: int,
+        dependencies: List[str],
+        **extra
+    ) -> Dict[str, Any]:
+        return {
+            "name": name,
+            "order": 0,
+            "estimated_minutes": estimated_minutes,
+            "instructions": instructions,
+            "dependencies": dependencies,
+            "source": "recipe",
+            **extra
+        }
+
+    @staticmethod
+    def name_dependencies(tasks: List[Dict[str, Any]], known_names=()):
+        """Replace dependencies given by ``order`` number with task names, in place
+
+        Names in ``tasks`` or ``known_names`` are kept as they are; references
+        to no task are dropped.
+        """
+        names = {task["name"] for task in tasks} | set(known_names)
+        by_order = {}
+        for task in tasks:
+            if task.get("order") is not None:
+                by_order.setdefault(str(task["order"]), task["name"])
+
+        for task in tasks:
+            dependencies = []
+            for dep in task.get("dependencies") or []:
+                name = dep if isinstance(dep, str) and dep in names else by_order.get(str(dep))
+                if name and name != task["name"] and name not in dependencies:
+                    dependencies.append(name)
+            task["dependencies"] = dependencies
+
+    @staticmethod
+    def _renumber(tasks: List[Dict[str, Any]]):
+        for i, task in enumerate(tasks):
+            task["order"] = i + 1
@@ -0,0 +1,183 @@
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional, Tuple
+import logging
+import re
+
+from app.core.cache import cache
+from app.db.partitioning import tenant_key
+from app.models.agent import Agent
+from app.models.inventory import Inventory
+from app.models.migration import Migration, MigrationStatus
+from app.services.app_recipes import IGNORED_APPLICATIONS
+from app.services.plan_reuse import normalize_app_name
+
+logger = logging.getLogger(__name__)
+
+# Longest missing/extra/changed list kept per category; counts are always complete
+MAX_REPORTED_ITEMS = 500
+
+_ignored = [re.compile(pattern, re.IGNORECASE) for pattern in IGNORED_APPLICATIONS]
+
+
+def _application(app: Dict[str, Any]) -> Optional[Tuple[str, Tuple]]:
+    name = (app.get("name") or "").strip()
+    if not name or any(pattern.search(name) for pattern in _ignored):
+        return None
+    return normalize_app_name(name), (app.get("version"),)
+
+
+def _certificate(cert: Dict[str, Any]) -> Optional[Tuple[str, Tuple]]:
+    key = (cert.get("thumbprint") or "").upper() or f"{cert.get('subject')}|{cert.get('store_location')}|{cert.get('store_name')}"
+    return key, (cert.get("store_location"), cert.get("store_name"), cert.get("has_private_key"))
+
+
+def _vpn_connection(vpn: Dict[str, Any]) -> Optional[Tuple[str, Tuple]]:
+    if not vpn.get("name"):
+        return None
+    return vpn["name"].lower(), (vpn.get("type"), vpn.get("server_address"), vpn.get("settings"))
+
+
+def _registry_setting(item: Dict[str, Any]) -> Optional[Tuple[str, Tuple]]:
+    if not item.get("path"):
+        return None
+    return f"{item['path'].lower()}\\{(item.get('value_name') or '').lower()}", (item.get("value"), item.get("type"))
+
+
+KeyFunc = Callable[[Dict[str, Any]], Optional[Tuple[str, Tuple]]]
+
+# Inventory column -> how to key an item and whether a changed item fails
+# verification. Applications are reinstalled at their latest version, so a
+# different version is reported but expected.
+CATEGORIES: Dict[str, Tuple[KeyFunc, bool]] = {
+    "installed_applications": (_application, False),
+    "certificates": (_certificate, True),
+    "vpn_connections": (_vpn_connection, True),
+    "registry_settings": (_registry_setting, True),
+}
+
+
+def index_items(items: List[Dict[str, Any]], key_func: KeyFunc) -> Tuple[Dict[str, Tuple], Dict[str, Dict[str, Any]]]:
+    """Map each item's key to its compared fields, and to the item"""
+    fields: Dict[str, Tuple] = {}
+    by_key: Dict[str, Dict[str, Any]] = {}
+    for item in items or []:
+        keyed = key_func(item)
+        if keyed is None:
+            continue
+        key, values = keyed
+        fields[key] = values
+        by_key[key] = item
+    return fields, by_key
+
+
+def diff_items(source: List[Dict[str, Any]], target: List[Dict[str, Any]], key_func: KeyFunc) -> Dict[str, Any]:
+    """Set-based diff of two item lists in linear time"""
+    source_fields, source_items = index_items(source, key_func)
+    target_fields, target_items = index_items(target, key_func)
+
+    missing = source_fields.keys() - target_fields.keys()
+    extra = target_fields.keys() - source_fields.keys()
+    changed = [
+        key for key in source_fields.keys() & target_fields.keys()
+        if source_fields[key] != target_fields[key]
+    ]
+
+    return {
+        "summary": {
+            "source": len(source_fields),
+            "target": len(target_fields),
+            "matched": len(source_fields) - len(missing) - len(changed),
+            "missing": len(missing),
+            "extra": len(extra),
+            "changed": len(changed),
+        },
+        "missing": [source_items[key] for key in sorted(missing)[:MAX_REPORTED_ITEMS]],
+        "extra": [target_items[key] for key in sorted(extra)[:MAX_REPORTED_ITEMS]],
+        "changed": [
+            {"key": key, "source": source_items[key], "target": target_items[key]}
+            for key in sorted(changed)[:MAX_REPORTED_ITEMS]
+        ],
+    }
+
+
+def diff_inventories(source: Inventory, target: Inventory, excluded_applications: List[str] = ()) -> Dict[str, Any]:
+    """Diff two inventories; ``excluded_applications`` were deliberately not migrated"""
+    excluded = {normalize_app_name(name) for name in excluded_applications}
+    report: Dict[str, Any] = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "source_inventory_id": source.id,
+        "target_inventory_id": target.id,
+        "target_inventory_at": target.timestamp.isoformat() if target.timestamp else None,
+        "summary": {},
+    }
+    passed = True
+    for column, (key_func, changes_fail) in CATEGORIES.items():
+        source_items = getattr(source, column)
+        if column == "installed_applications" and excluded:
+            source_items = [
+                app for app in source_items or []
+                if normalize_app_name((app.get("name") or "").strip()) not in excluded
+            ]
+        result = diff_items(source_items, getattr(target, column), key_func)
+        summary = report["summary"][column] = result.pop("summary")
+        report[column] = result
+        if summary["missing"] or (changes_fail and summary["changed"]):
+            passed = False
+
+    report["passed"] = passed
+    return report
+
+
+class MigrationVerifier:
+    """Checks that a migration's target ended up with the source's configuration"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def verify(self, migration: Migration) -> Optional[Dict[str, Any]]:
+        """Diff the latest source and target inventories and store the report"""
+        if not migration.target_agent_id:
+            return None
+
+        source = self._latest_inventory(migration.source_agent, before=migration.started_at)
+        target = self._latest_inventory(migration.target_agent)
+        if not source or not target:
+            logger.info(f"Migration {migration.id} has no inventory for both machines to verify against")
+            return None
+
+        # Applications left out of the plan for lack of use aren't expected on the target
+        pruning = (migration.migration_plan or {}).get("usage_pruning") or {}
+        excluded = [
+            name for entry in pruning.get("pruned_applications") or []
+            for name in entry.get("installed") or []
+        ]
+        report = diff_inventories(source, target, excluded)
+        migration.verification_report = report
+        self.db.commit()
+        cache.invalidate("migration", migration.id)
+        return report
+
+    def verify_target(self, target_agent_id: str):
+        """Re-verify completed migrations to a machine after it reports a new inventory"""
+        migrations = self.db.query(Migration).filter(
+            Migration.target_agent_id == target_agent_id,
+            Migration.status == MigrationStatus.COMPLETED
+        ).all()
+        for migration in migrations:
+            self.verify(migration)
+
+    def _latest_inventory(self, agent: Optional[Agent], before: Optional[datetime] = None) -> Optional[Inventory]:
+        if agent is None:
+            return None
+        query = self.db.query(Inventory).filter(
+            Inventory.company_id == tenant_key(agent.company_id),
+            Inventory.agent_id == agent.id
+        )
+        if before:
+            # The source may be wiped or reused after the migration starts;
+            # verify against what it looked like when it was migrated
+            snapshot = query.filter(Inventory.timestamp <= before).order_by(Inventory.timestamp.desc()).first()
+            if snapshot:
+                return snapshot
+        return query.order_by(Inventory.timestamp.desc()).first()
@@ -0,0 +1,269 @@
+from typing import Dict, Any, Optional
+import asyncio
+import itertools
+import json
+import logging
+import shlex
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_VERSION = "2024-11-05"
+CLIENT_INFO = {"name": "pc-succession-backend", "version": "1.0.0"}
+# Tool results such as directory listings can be far larger than the
+# default 64KB line limit of asyncio streams
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+
+class MCPError(Exception):
+    """Raised when an MCP session fails or a request returns a JSON-RPC error"""
+
+
+class MCPToolError(MCPError):
+    """Raised when a tool reports that it failed"""
+
+
+def check_server_command(command: str):
+    """Refuse server commands that don't name the target host
+
+    Without {host} every session, admin PowerShell included, would run on
+    the backend's own machine instead of the PC being migrated.
+    """
+    if "{host}" not in command:
+        raise MCPError("MCP_SERVER_COMMAND must start the MCP server on the target machine, with {host} in it")
+
+
+class MCPSession:
+    """A long-lived MCP session with one host over stdio
+
+    Requests are tagged with JSON-RPC ids and a single reader matches the
+    responses to them, so any number of tool calls can be in flight on the
+    same session at once.
+    """
+
+    def __init__(self, host: str, command: str):
+        self.host = host
+        self.command = command
+        self.server_info: Dict[str, Any] = {}
+        self.last_used = time.monotonic()
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._write_lock = asyncio.Lock()
+        self._closed = False
+
+    @property
+    def alive(self) -> bool:
+        return (
+            not self._closed
+            and self._process is not None
+            and self._process.returncode is None
+            and self._reader is not None
+            and not self._reader.done()
+        )
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    async def start(self):
+        self._process = await asyncio.create_subprocess_exec(
+            *shlex.split(self.command),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            limit=MAX_MESSAGE_BYTES
+        )
+        self._reader = asyncio.create_task(self._read_messages())
+
+        try:
+            result = await self.request("initialize", {
+                "protocolVersion": PROTOCOL_VERSION,
+                "capabilities": {},
+                "clientInfo": CLIENT_INFO
+            }, timeout=settings.MCP_CONNECT_TIMEOUT_SECONDS)
+        except Exception:
+            await self.close()
+            raise
+        self.server_info = result.get("serverInfo") or {}
+        await self._send({"jsonrpc": "2.0", "method": "notifications/initialized"})
+        logger.info(f"MCP session to {self.host} started ({self.server_info.get('name', 'unknown server')})")
+
+    async def request(self, method: str, params: Optional[Dict[str, Any]] = None,
+                      timeout: Optional[float] = None) -> Dict[str, Any]:
+        if not self.alive:
+            raise MCPError(f"MCP session to {self.host} is closed")
+
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self.last_used = time.monotonic()
+        try:
+            await self._send({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params or {}})
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise MCPError(f"MCP request {method} to {self.host} timed out after {timeout}s")
+        finally:
+            self._pending.pop(request_id, None)
+            self.last_used = time.monotonic()
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]) -> str:
+        """Call a tool and return its text output"""
+        result = await self.request(
+            "tools/call",
+            {"name": name, "arguments": arguments},
+            timeout=settings.MCP_CALL_TIMEOUT_SECONDS
+        )
+        text = "\n".join(
+            item.get("text", "") for item in result.get("content") or []
+            if item.get("type") == "text"
+        )
+        if result.get("isError"):
+            raise MCPToolError(text or f"Tool {name} failed")
+        return text
+
+    async def ping(self):
+        await self.request("ping", timeout=settings.MCP_CONNECT_TIMEOUT_SECONDS)
+
+    async def close(self):
+        self._closed = True
+        if self._process and self._process.returncode is None:
+            self._process.stdin.close()
+            try:
+                await asyncio.wait_for(self._process.wait(), 5)
+            except asyncio.TimeoutError:
+                self._process.kill()
+                await self._process.wait()
+        if self._reader:
+            self._reader.cancel()
+        self._fail_pending(MCPError(f"MCP session to {self.host} closed"))
+
+    async def _send(self, message: Dict[str, Any]):
+        async with self._write_lock:
+            self._process.stdin.write(json.dumps(message).encode() + b"\n")
+            await self._process.stdin.drain()
+
+    async def _read_messages(self):
+        try:
+            while True:
+                line = await self._process.stdout.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    # Servers may log to stdout; anything that isn't JSON-RPC is skipped
+                    logger.debug(f"MCP {self.host}: {line.decode(errors='replace').rstrip()}")
+                    continue
+                if not isinstance(message, dict):
+                    continue
+                future = self._pending.get(message.get("id"))
+                if future is None or future.done():
+                    continue
+                if "error" in message:
+                    error = message["error"] or {}
+                    future.set_exception(MCPError(f"{error.get('message', 'MCP error')} ({error.get('code')})"))
+                else:
+                    future.set_result(message.get("result") or {})
+        except Exception as e:
+            logger.error(f"MCP session to {self.host} failed: {e}")
+        finally:
+            self._fail_pending(MCPError(f"MCP session to {self.host} ended"))
+
+    def _fail_pending(self, error: MCPError):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+
+class MCPClientPool:
+    """Long-lived MCP sessions per target host
+
+    Each host gets one multiplexed session, started on first use, and at
+    most MCP_MAX_CALLS_PER_HOST concurrent tool calls. A health check pings
+    every session periodically, replacing dead ones and closing idle ones.
+    """
+
+    def __init__(self, command: Optional[str] = None):
+        self.command = command or settings.MCP_SERVER_COMMAND
+        self._sessions: Dict[str, MCPSession] = {}
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def session(self, host: str) -> MCPSession:
+        """Get the session to a host, starting it if needed"""
+        session = self._sessions.get(host)
+        if session and session.alive:
+            return session
+
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            session = self._sessions.get(host)
+            if session and session.alive:
+                return session
+            if session:
+                await session.close()
+
+            check_server_command(self.command)
+            session = MCPSession(host, self.command.format(host=shlex.quote(host)))
+            await session.start()
+            self._sessions[host] = session
+            return session
+
+    @property
+    def in_flight(self) -> int:
+        return sum(session.in_flight for session in self._sessions.values())
+
+    async def call_tool(self, host: str, name: str, arguments: Dict[str, Any]) -> str:
+        slots = self._slots.setdefault(host, asyncio.Semaphore(settings.MCP_MAX_CALLS_PER_HOST))
+        async with slots:
+            session = await self.session(host)
+            return await session.call_tool(name, arguments)
+
+    async def check_health(self):
+        """Ping every session; close dead and idle ones so the next call reconnects"""
+        now = time.monotonic()
+        for host, session in list(self._sessions.items()):
+            idle = not session.in_flight and now - session.last_used > settings.MCP_IDLE_TIMEOUT_SECONDS
+            if idle:
+                logger.info(f"Closing idle MCP session to {host}")
+            else:
+                try:
+                    await session.ping()
+                    continue
+                except Exception as e:
+                    logger.warning(f"MCP session to {host} failed health check: {e}")
+
+            if self._sessions.get(host) is session:
+                del self._sessions[host]
+            await session.close()
+
+    async def close(self):
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        await asyncio.gather(*(session.close() for session in sessions), return_exceptions=True)
+
+
+_pool: Optional[MCPClientPool] = None
+
+
+def get_mcp_pool() -> MCPClientPool:
+    global _pool
+    if _pool is None:
+        _pool = MCPClientPool()
+    return _pool
+
+
+async def run_mcp_health_checks():
+    """Check the pooled MCP sessions periodically"""
+    while True:
+        await asyncio.sleep(settings.MCP_HEALTH_CHECK_SECONDS)
+        if _pool is None:
+            continue
+        try:
+            await _pool.check_health()
+        except Exception as e:
+            logger.error(f"MCP health check failed: {e}")
@@ -0,0 +1,126 @@
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Optional
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.migration import Migration
+
+logger = logging.getLogger(__name__)
+
+_worker_ids = {}
+
+
+def worker_id() -> str:
+    """Identity of this worker process, the prefix of its runs' lease owners"""
+    pid = os.getpid()
+    if pid not in _worker_ids:
+        _worker_ids[pid] = f"{socket.gethostname()}:{pid}:{uuid.uuid4().hex[:8]}"
+    return _worker_ids[pid]
+
+
+def run_token() -> str:
+    """Lease owner for one run of a migration in this worker"""
+    return f"{worker_id()}/{uuid.uuid4().hex[:8]}"
+
+
+class LeaseLost(Exception):
+    """Raised when another worker has taken over a migration"""
+
+
+class MigrationLease:
+    """Renewable ownership of a migration's execution
+
+    Acquisition is a single conditional UPDATE, so with any number of worker
+    processes at most one of them holds an unexpired lease. Each run owns
+    the lease under its own token rather than its worker's id, so a run in
+    the same worker can't acquire a lease another run still holds.
+    """
+
+    def __init__(self, db: Session, migration_id: str, owner: Optional[str] = None):
+        self.db = db
+        self.migration_id = migration_id
+        self.owner = owner or run_token()
+        self.lost = False
+
+    def acquire(self) -> bool:
+        """Take the lease if it is free, expired or was handed to this run"""
+        now = datetime.utcnow()
+        updated = self.db.query(Migration).filter(
+            Migration.id == self.migration_id,
+            or_(
+                Migration.lease_owner.is_(None),
+                Migration.lease_owner == self.owner,
+                Migration.lease_expires_at < now
+            )
+        ).update({
+            Migration.lease_owner: self.owner,
+            Migration.lease_expires_at: now + timedelta(seconds=settings.MIGRATION_LEASE_SECONDS)
+        }, synchronize_session=False)
+        self.db.commit()
+        return updated == 1
+
+    def renew(self, db: Optional[Session] = None) -> bool:
+        """Extend the lease; returns False if it is no longer ours"""
+        db = db or self.db
+        updated = db.query(Migration).filter(
+            Migration.id == self.migration_id,
+            Migration.lease_owner == self.owner
+        ).update({
+            Migration.lease_expires_at: datetime.utcnow() + timedelta(seconds=settings.MIGRATION_LEASE_SECONDS)
+        }, synchronize_session=False)
+        db.commit()
+        if updated != 1:
+            self.lost = True
+        return not self.lost
+
+    def release(self):
+        self.db.query(Migration).filter(
+            Migration.id == self.migration_id,
+            Migration.lease_owner == self.owner
+        ).update({
+            Migration.lease_owner: None,
+            Migration.lease_expires_at: None
+        }, synchronize_session=False)
+        self.db.commit()
+
+    def check(self):
+        if self.lost:
+            raise LeaseLost(f"Lease on migration {self.migration_id} lost by {self.owner}")
+
+    @asynccontextmanager
+    async def keep_alive(self):
+        """Renew the lease in the background while the block runs
+
+        Renewals use their own session, so they never commit or expire the
+        executing session's work in the middle of a task.
+        """
+
+        async def renew_periodically():
+            db = SessionLocal()
+            try:
+                while not self.lost:
+                    await asyncio.sleep(settings.MIGRATION_LEASE_SECONDS / 3)
+                    try:
+                        if not self.renew(db):
+                            logger.warning(f"Lost lease on migration {self.migration_id}")
+                    except Exception as e:
+                        db.rollback()
+                        # Keep trying until the lease expires; another worker
+                        # can only take over once it has
+                        logger.error(f"Lease renewal failed for {self.migration_id}: {e}")
+            finally:
+                db.close()
+
+        renewer = asyncio.create_task(renew_periodically())
+        try:
+            yield self
+        finally:
+            renewer.cancel()
@@ -0,0 +1,86 @@
+from sqlalchemy import or_
+from datetime import datetime
+from typing import Dict, List, Optional
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.migration import Migration, MigrationStatus
+from app.services.migration_service import MigrationService
+
+logger = logging.getLogger(__name__)
+
+# Migrations this worker has started and is still running; the event loop
+# only keeps weak references to tasks, so they are held here until done
+_running: Dict[str, asyncio.Task] = {}
+
+
+def running_migrations() -> int:
+    return len(_running)
+
+
+def find_orphaned_migrations() -> List[str]:
+    """IDs of in-progress migrations whose worker has stopped renewing its lease"""
+    db = SessionLocal()
+    try:
+        rows = db.query(Migration.id).filter(
+            Migration.status == MigrationStatus.IN_PROGRESS,
+            or_(
+                Migration.lease_owner.is_(None),
+                Migration.lease_expires_at < datetime.utcnow()
+            )
+        ).all()
+        return [row.id for row in rows]
+    finally:
+        db.close()
+
+
+async def run_migration(migration_id: str, lease_owner: Optional[str] = None):
+    """Execute a migration in this worker outside of a request"""
+    db = SessionLocal()
+    try:
+        await MigrationService(db).execute_migration(migration_id, lease_owner)
+    except Exception as e:
+        logger.error(f"Migration {migration_id} failed: {e}")
+    finally:
+        db.close()
+        _running.pop(migration_id, None)
+
+
+def run_in_background(migration_id: str, lease_owner: Optional[str] = None) -> bool:
+    """Start executing a migration unless this worker already runs it
+
+    ``lease_owner`` is the run token the caller set as the lease owner when
+    it marked the migration in progress.
+    """
+    if migration_id in _running:
+        return False
+    _running[migration_id] = asyncio.create_task(run_migration(migration_id, lease_owner))
+    return True
+
+
+def recover_orphaned_migrations() -> List[str]:
+    """Start resuming every orphaned migration; returns the IDs picked up
+
+    Every worker runs this sweep. Only the one that wins the lease in
+    execute_migration actually resumes a migration, the others return
+    straight away.
+    """
+    started = [
+        migration_id for migration_id in find_orphaned_migrations()
+        if run_in_background(migration_id)
+    ]
+    if started:
+        logger.info(f"Resuming orphaned migrations: {', '.join(started)}")
+    return started
+
+
+async def run_recovery_loop():
+    """Sweep for orphaned migrations on startup and then periodically"""
+    while True:
+        try:
+            recover_orphaned_migrations()
+        except Exception as e:
+            logger.error(f"Migration recovery sweep failed: {e}")
+        await asyncio.sleep(settings.MIGRATION_RECOVERY_INTERVAL_SECONDS)
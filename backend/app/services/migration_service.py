@@ -1,18 +1,89 @@
 from sqlalchemy.orm import Session
+from contextlib import contextmanager
 from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import asyncio
 import logging
+import re
+import time
 
+from app.core.cache import cache
+from app.core.config import settings
 from app.models.migration import Migration, MigrationStatus
+from app.models.task_event import TaskEventStatus
+from app.services.inventory_diff import MigrationVerifier
+from app.services.mcp_client import get_mcp_pool
+from app.services.migration_lease import LeaseLost, MigrationLease
+from app.services.task_events import TaskEventLog
+from app.services.task_graph import TaskGraph
 
 logger = logging.getLogger(__name__)
 
+# Limits concurrent tasks per target machine across all running migrations:
+# target key -> (semaphore, number of migrations running on that target)
+_target_slots: Dict[str, Tuple[asyncio.Semaphore, int]] = {}
+
+
+@contextmanager
+def _target_semaphore(migration: Migration) -> Iterator[asyncio.Semaphore]:
+    """The target machine's task slots, held while the migration runs
+
+    The entry is removed when the last migration on the target finishes, so
+    the table only holds machines with running migrations.
+    """
+    key = migration.target_agent_id or f"migration:{migration.id}"
+    slots, users = _target_slots.get(key) or (asyncio.Semaphore(settings.MAX_CONCURRENT_TASKS_PER_MACHINE), 0)
+    _target_slots[key] = (slots, users + 1)
+    try:
+        yield slots
+    finally:
+        slots, users = _target_slots[key]
+        if users == 1:
+            del _target_slots[key]
+        else:
+            _target_slots[key] = (slots, users - 1)
+
+
+def task_tool_call(task: dict) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """MCP tool and arguments that carry out a task, if it can be automated"""
+    if task.get("tool"):
+        return task["tool"], task.get("arguments") or {}
+    
+    if task.get("category") == "install":
+        if task.get("recipe"):
+            # Only recipes with an unattended command are run; the rest need a technician
+            if not task.get("command"):
+                return None
+            return "exec_powershell", {"script": task["command"], "as_admin": True}
+        application = task.get("application") or re.sub(r"^install\s+", "", task.get("name", ""), flags=re.I)
+        return "install_application", {"application_name": application}
+    
+    return None
+
 
 class MigrationService:
     def __init__(self, db: Session):
         self.db = db
+        self.events = TaskEventLog(db)
+        self._last_flush = 0.0
     
-    async def execute_migration(self, migration_id: str):
-        """Execute the migration plan"""
+    async def execute_migration(self, migration_id: str, lease_owner: Optional[str] = None):
+        """Execute the migration plan
+        
+        Tasks run as soon as their dependencies have completed, up to
+        MAX_CONCURRENT_TASKS_PER_MACHINE at a time on the target machine. A
+        failed task only causes the tasks that depend on it to be skipped.
+        
+        Each task transition is appended to the task event log; the progress
+        columns on the migration row are only flushed periodically and the
+        full completed/failed lists are written once at the end.
+        
+        Execution is held under a renewable lease. If the migration is already
+        leased by a live worker this returns immediately; if it was orphaned
+        by a dead worker, tasks already finished according to the event log
+        are not run again. ``lease_owner`` is the run token a lease was
+        handed over under when the migration was started.
+        """
         
         migration = self.db.query(Migration).filter(
             Migration.id == migration_id
@@ -21,72 +92,194 @@ class MigrationService:
         if not migration:
             raise ValueError("Migration not found")
         
+        lease = MigrationLease(self.db, migration_id, lease_owner)
+        if not lease.acquire():
+            logger.info(f"Migration {migration_id} is being executed by another worker")
+            return
+        
+        running: Dict[asyncio.Task, int] = {}
         try:
-            migration.started_at = datetime.utcnow()
-            migration.status = MigrationStatus.IN_PROGRESS
-            self.db.commit()
-            
-            tasks = migration.tasks or []
-            completed = []
-            failed = []
-            
-            for i, task in enumerate(tasks):
-                try:
-                    migration.current_task = task.get('name', f'Task {i+1}')
-                    migration.progress_percent = (i / len(tasks)) * 100
-                    self.db.commit()
-                    
-                    # Execute task (this would connect to MCP server)
-                    await self._execute_task(task, migration)
-                    
-                    completed.append(task)
-                    migration.completed_tasks = completed
-                    self.db.commit()
-                    
-                except Exception as task_error:
-                    logger.error(f"Task failed: {task.get('name')}: {task_error}")
-                    failed.append({
-                        "task": task,
-                        "error": str(task_error)
-                    })
-                    migration.failed_tasks = failed
-                    self.db.commit()
-            
-            # Complete migration
-            migration.status = MigrationStatus.COMPLETED if not failed else MigrationStatus.FAILED
-            migration.completed_at = datetime.utcnow()
-            migration.progress_percent = 100
-            
-            if failed:
-                migration.error_message = f"{len(failed)} tasks failed"
-            else:
-                migration.success_message = "Migration completed successfully"
-            
-            self.db.commit()
-            
+            async with lease.keep_alive():
+                with _target_semaphore(migration) as slots:
+                    await self._run_tasks(migration, lease, running, slots)
+        
+        except LeaseLost as e:
+            # Another worker has taken over and resumes from the event log
+            logger.warning(str(e))
+            return
+        
         except Exception as e:
             logger.error(f"Migration failed: {e}")
+            self.db.rollback()
             migration.status = MigrationStatus.FAILED
             migration.error_message = str(e)
             migration.completed_at = datetime.utcnow()
             self.db.commit()
+            cache.invalidate("migration", migration_id)
+            lease.release()
             raise
+        
+        finally:
+            for pending in running:
+                pending.cancel()
+        
+        lease.release()
     
-    async def _execute_task(self, task: dict, migration: Migration):
-        """Execute a single migration task"""
-        # This is where we would integrate with the MCP server
-        # to execute tasks on the target machine
+    async def _run_tasks(
+        self,
+        migration: Migration,
+        lease: MigrationLease,
+        running: Dict[asyncio.Task, int],
+        slots: asyncio.Semaphore
+    ):
+        tasks = migration.tasks or []
+        graph = TaskGraph(tasks)
+        
+        completed: List[dict] = []
+        failed: List[dict] = []
+        state = self._checkpoint(migration, tasks, completed, failed)
+        if state:
+            logger.info(f"Resuming migration {migration.id} with {len(state)} of {len(tasks)} tasks finished")
+        
+        if not migration.started_at:
+            migration.started_at = datetime.utcnow()
+        migration.status = MigrationStatus.IN_PROGRESS
+        migration.critical_path_minutes = graph.critical_path_minutes()
+        self.db.commit()
+        cache.invalidate("migration", migration.id)
+        
+        async def run(i: int):
+            async with slots:
+                await self._execute_task(tasks[i], migration)
+        
+        # Until every task has finished, not just been scheduled
+        while running or len(state) < len(tasks):
+            lease.check()
+            for i in graph.order:
+                if i in state:
+                    continue
+                dep_states = [state.get(j) for j in graph.dependencies[i]]
+                if any(s in ("failed", "skipped") for s in dep_states):
+                    blocker = next(
+                        tasks[j].get("name") for j in graph.dependencies[i]
+                        if state.get(j) in ("failed", "skipped")
+                    )
+                    error = f"Skipped: dependency '{blocker}' did not complete"
+                    state[i] = "skipped"
+                    failed.append({
+                        "task": tasks[i],
+                        "error": error,
+                        "skipped": True
+                    })
+                    self.events.record(migration, i, tasks[i], TaskEventStatus.SKIPPED, error)
+                elif all(s == "completed" for s in dep_states):
+                    state[i] = "running"
+                    running[asyncio.create_task(run(i))] = i
+                    self.events.record(migration, i, tasks[i], TaskEventStatus.STARTED)
+            
+            self._flush_progress(migration, tasks, running, len(completed) + len(failed))
+            if not running:
+                continue
+            
+            done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+            for finished in done:
+                i = running.pop(finished)
+                error = finished.exception()
+                if error is None:
+                    state[i] = "completed"
+                    completed.append(tasks[i])
+                    self.events.record(migration, i, tasks[i], TaskEventStatus.COMPLETED)
+                else:
+                    logger.error(f"Task failed: {tasks[i].get('name')}: {error}")
+                    state[i] = "failed"
+                    failed.append({
+                        "task": tasks[i],
+                        "error": str(error)
+                    })
+                    self.events.record(migration, i, tasks[i], TaskEventStatus.FAILED, str(error))
+        
+        # Complete migration
+        lease.check()
+        migration.completed_tasks = completed
+        migration.failed_tasks = failed
+        migration.current_task = None
+        migration.status = MigrationStatus.COMPLETED if not failed else MigrationStatus.FAILED
+        migration.completed_at = datetime.utcnow()
+        migration.progress_percent = 100
+        
+        if failed:
+            migration.error_message = f"{len(failed)} tasks failed"
+        else:
+            migration.success_message = "Migration completed successfully"
         
-        # For now, just simulate execution
-        import asyncio
-        await asyncio.sleep(1)
+        self.db.commit()
+        cache.invalidate("migration", migration.id)
         
+        # Check the target against the source; repeated when the target
+        # reports its next inventory
+        try:
+            MigrationVerifier(self.db).verify(migration)
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Verification of migration {migration.id} failed: {e}")
+    
+    def _checkpoint(self, migration: Migration, tasks: list, completed: list, failed: list) -> Dict[int, str]:
+        """Restore the state of tasks finished by an earlier run of this attempt
+        
+        Tasks that were started but never finished are left out so they run
+        again. Events of earlier attempts are ignored, so a migration that
+        was started again after failing reruns its failed tasks.
+        """
+        state: Dict[int, str] = {}
+        for event in self.events.events([migration])[migration.id]:
+            if event.task_index >= len(tasks) or event.status == TaskEventStatus.STARTED:
+                continue
+            i = event.task_index
+            if event.status == TaskEventStatus.COMPLETED:
+                state[i] = "completed"
+                completed.append(tasks[i])
+            elif event.status == TaskEventStatus.FAILED:
+                state[i] = "failed"
+                failed.append({"task": tasks[i], "error": event.error})
+            else:
+                state[i] = "skipped"
+                failed.append({"task": tasks[i], "error": event.error, "skipped": True})
+        return state
+    
+    def _flush_progress(self, migration: Migration, tasks: list, running: dict, finished: int):
+        """Copy summary progress onto the migration row, at most every PROGRESS_FLUSH_SECONDS"""
+        now = time.monotonic()
+        if now - self._last_flush < settings.PROGRESS_FLUSH_SECONDS:
+            return
+        self._last_flush = now
+        
+        migration.current_task = ", ".join(
+            tasks[i].get('name', f'Task {i+1}') for i in sorted(running.values())
+        ) or None
+        migration.progress_percent = (finished / len(tasks)) * 100
+        self.db.commit()
+        cache.invalidate("migration", migration.id)
+    
+    async def _execute_task(self, task: dict, migration: Migration):
+        """Execute a single migration task on the target machine through MCP"""
         logger.info(f"Executing task: {task.get('name')}")
         
-        # In production, this would:
-        # 1. Connect to target machine via MCP
-        # 2. Execute installation/configuration commands
-        # 3. Verify success
-        # 4. Handle errors
-
-
+        if not settings.MCP_ENABLED:
+            # Simulate execution
+            await asyncio.sleep(1)
+            return
+        
+        call = task_tool_call(task)
+        if call is None:
+            # Nothing to automate; covered by the plan's instructions and manual steps
+            return
+        
+        tool, arguments = call
+        output = await get_mcp_pool().call_tool(self._target_host(migration), tool, arguments)
+        logger.info(f"Task {task.get('name')} completed via {tool}: {output[:200]}")
+    
+    def _target_host(self, migration: Migration) -> str:
+        agent = migration.target_agent
+        if not agent:
+            raise ValueError("Migration has no target machine")
+        return (agent.agent_metadata or {}).get("mcp_host") or agent.computer_name or agent.agent_id
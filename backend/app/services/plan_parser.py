@@ -0,0 +1,115 @@
+from typing import Dict, Any, List, Optional
+import json
+
+
+class PlanStreamError(ValueError):
+    """Raised when a streamed migration plan is not valid JSON"""
+
+
+class PlanStreamParser:
+    """Incrementally scan a streamed JSON plan and emit tasks as they complete
+
+    Text before the first '{' (e.g. a short preamble from the model) and
+    anything after the matching closing brace is ignored. Bracket nesting is
+    checked as characters arrive, so structurally broken output is rejected
+    as soon as it is seen rather than after the whole completion.
+    """
+
+    _OPENING = {'}': '{', ']': '['}
+
+    def __init__(self, tasks_key: str = "tasks"):
+        self.tasks_key = tasks_key
+        self.text = ""
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._end: Optional[int] = None
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._in_tasks = False
+        self._task_start: Optional[int] = None
+
+    @property
+    def done(self) -> bool:
+        return self._end is not None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume a chunk of text and return any tasks completed by it"""
+        self.text += chunk
+        tasks = []
+        text = self.text
+
+        while self._pos < len(text) and not self.done:
+            pos = self._pos
+            c = text[pos]
+            self._pos += 1
+
+            if self._start is None:
+                if c == '{':
+                    self._start = pos
+                    self._stack.append(c)
+                    self._expect_key = True
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._key_start is not None:
+                        self._key = json.loads(text[self._key_start:pos + 1])
+                        self._key_start = None
+                continue
+
+            depth = len(self._stack)
+            if c == '"':
+                self._in_string = True
+                if depth == 1 and self._expect_key:
+                    self._key_start = pos
+            elif c in '{[':
+                self._stack.append(c)
+                if depth == 1 and c == '[' and self._key == self.tasks_key:
+                    self._in_tasks = True
+                elif depth == 2 and c == '{' and self._in_tasks:
+                    self._task_start = pos
+            elif c in '}]':
+                if not self._stack or self._stack[-1] != self._OPENING[c]:
+                    raise PlanStreamError(
+                        f"Unexpected '{c}' at offset {pos - self._start} of plan JSON"
+                    )
+                self._stack.pop()
+                if self._task_start is not None and len(self._stack) == 2:
+                    tasks.append(self._decode_task(text[self._task_start:pos + 1]))
+                    self._task_start = None
+                elif self._in_tasks and len(self._stack) == 1:
+                    self._in_tasks = False
+                elif not self._stack:
+                    self._end = pos + 1
+            elif depth == 1 and c == ',':
+                self._expect_key = True
+            elif depth == 1 and c == ':':
+                self._expect_key = False
+
+        return tasks
+
+    def close(self) -> Optional[Dict[str, Any]]:
+        """Finish parsing and return the full plan, or None if no JSON was found"""
+        if self._start is None:
+            return None
+        if not self.done:
+            raise PlanStreamError("Plan stream ended before the JSON object was closed")
+        try:
+            return json.loads(self.text[self._start:self._end])
+        except json.JSONDecodeError as e:
+            raise PlanStreamError(f"Invalid plan JSON: {e}") from e
+
+    def _decode_task(self, fragment: str) -> Dict[str, Any]:
+        try:
+            return json.loads(fragment)
+        except json.JSONDecodeError as e:
+            raise PlanStreamError(f"Invalid task in plan JSON: {e}") from e
@@ -0,0 +1,353 @@
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session
+from typing import Dict, Any, List, Optional, Set, Tuple
+import asyncio
+import copy
+import hashlib
+import logging
+import random
+import re
+import time
+
+from app.core.config import settings
+from app.db.partitioning import tenant_key
+from app.models.app_signature import AppSignatureBand
+from app.models.inventory import Inventory
+from app.models.migration import Migration, MigrationStatus
+from app.services.ai_service import AIService
+from app.services.app_recipes import APP_RECIPES
+from app.services.fast_planner import FastPlanner
+from app.services.sizing_service import FleetSizingService
+from app.services.usage_analytics import UsageAnalytics
+
+logger = logging.getLogger(__name__)
+
+# 32 bands of 4 rows: pairs above ~0.42 Jaccard similarity share at least one
+# band with high probability, candidates are then re-scored on the signature
+NUM_PERMUTATIONS = 128
+BAND_ROWS = 4
+
+_PRIME = (1 << 61) - 1
+# Fixed seed so signatures computed by different processes are comparable
+_rng = random.Random(0x5C5C)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+_VERSION_NOISE = re.compile(
+    r"\bv?\d+(\.\d+)+\b|\((x64|x86|64-bit|32-bit)\)|\b(x64|x86|64-bit|32-bit)\b",
+    re.IGNORECASE
+)
+
+REUSABLE_STATUSES = [
+    MigrationStatus.READY,
+    MigrationStatus.IN_PROGRESS,
+    MigrationStatus.COMPLETED,
+]
+PLAN_REUSE_POLL_SECONDS = 2
+
+
+def normalize_app_name(name: str) -> str:
+    """Normalize an application name so minor version bumps compare equal"""
+    name = _VERSION_NOISE.sub(" ", name.lower())
+    return " ".join(name.replace(" - ", " ").split())
+
+
+def app_names(applications: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Map normalized application names to their original names"""
+    names = {}
+    for app in applications or []:
+        name = (app.get("name") or "").strip()
+        if name:
+            names.setdefault(normalize_app_name(name), name)
+    return names
+
+
+def mentions(text: str, name: str) -> bool:
+    """Whether a normalized application name occurs in normalized text as a whole word
+
+    "+" and "#" count as part of a word, so Notepad is not found in Notepad++.
+    """
+    return bool(name) and re.search(rf"(?<![\w+#]){re.escape(name)}(?![\w+#])", text) is not None
+
+
+def minhash_signature(items: Set[str]) -> List[int]:
+    """Compute a MinHash signature for a set of strings"""
+    if not items:
+        return []
+    hashes = [
+        int.from_bytes(hashlib.blake2b(item.encode(), digest_size=8).digest(), "big")
+        for item in items
+    ]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def lsh_buckets(signature: List[int]) -> List[Tuple[int, str]]:
+    """Split a signature into (band, bucket) pairs for the LSH index"""
+    buckets = []
+    for band, start in enumerate(range(0, len(signature), BAND_ROWS)):
+        rows = ",".join(str(value) for value in signature[start:start + BAND_ROWS])
+        buckets.append((band, hashlib.blake2b(rows.encode(), digest_size=8).hexdigest()))
+    return buckets
+
+
+def estimate_similarity(a: List[int], b: List[int]) -> float:
+    """Estimate Jaccard similarity of two sets from their MinHash signatures"""
+    if not a or not b or len(a) != len(b):
+        return 0.0
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+class PlanReuseService:
+    """Reuse migration plans across machines with near-identical application sets"""
+
+    def __init__(self, db: Session, planner: Optional[FastPlanner] = None):
+        self.db = db
+        self._planner = planner
+
+    @property
+    def planner(self) -> FastPlanner:
+        if self._planner is None:
+            self._planner = FastPlanner()
+        return self._planner
+
+    def index_inventory(self, inventory: Inventory):
+        """Compute the inventory's signature and replace its agent's LSH bands"""
+
+        if inventory.id is None:
+            self.db.flush()
+
+        signature = minhash_signature(set(app_names(inventory.installed_applications)))
+        inventory.app_signature = signature
+
+        # Only the latest inventory of each agent is indexed
+        self.db.query(AppSignatureBand).filter(
+            AppSignatureBand.agent_id == inventory.agent_id
+        ).delete(synchronize_session=False)
+        self.db.add_all([
+            AppSignatureBand(
+                agent_id=inventory.agent_id,
+                inventory_id=inventory.id,
+                band=band,
+                bucket=bucket
+            )
+            for band, bucket in lsh_buckets(signature)
+        ])
+
+    def find_similar_inventories(
+        self,
+        inventory: Inventory,
+        limit: int = 10
+    ) -> List[Tuple[Inventory, float]]:
+        """Find indexed inventories of other agents of the same company, most similar first"""
+
+        buckets = lsh_buckets(inventory.app_signature or [])
+        if not buckets:
+            return []
+
+        # Plans describe their machines, so they are never shared across companies
+        company_id = tenant_key(inventory.company_id)
+        hits = func.count(AppSignatureBand.id)
+        rows = self.db.query(AppSignatureBand.inventory_id, hits).join(
+            Inventory,
+            (Inventory.id == AppSignatureBand.inventory_id) & (Inventory.company_id == company_id)
+        ).filter(
+            tuple_(AppSignatureBand.band, AppSignatureBand.bucket).in_(buckets),
+            AppSignatureBand.agent_id != inventory.agent_id
+        ).group_by(AppSignatureBand.inventory_id).order_by(hits.desc()).limit(limit).all()
+        if not rows:
+            return []
+
+        candidates = self.db.query(Inventory).filter(
+            Inventory.company_id == company_id,
+            Inventory.id.in_([row[0] for row in rows])
+        ).all()
+        scored = [
+            (candidate, estimate_similarity(inventory.app_signature, candidate.app_signature))
+            for candidate in candidates
+        ]
+        return sorted(scored, key=lambda item: item[1], reverse=True)
+
+    async def find_reusable_plan(self, migration: Migration) -> Optional[Dict[str, Any]]:
+        """Adapt the plan of a similar machine's migration, if there is one"""
+
+        source = self.db.query(Inventory).filter(
+            Inventory.company_id == tenant_key(migration.company_id),
+            Inventory.agent_id == migration.source_agent_id
+        ).order_by(Inventory.timestamp.desc()).first()
+        if not source:
+            return None
+
+        if source.app_signature is None:
+            self.index_inventory(source)
+            self.db.commit()
+
+        for candidate, similarity in self.find_similar_inventories(source):
+            if similarity < settings.PLAN_REUSE_MIN_SIMILARITY:
+                break
+            donor = await self._donor_migration(candidate.agent_id, migration)
+            if donor:
+                logger.info(
+                    f"Reusing plan of migration {donor.id} for {migration.id} "
+                    f"({similarity:.0%} similar)"
+                )
+                return await self.adapt_plan(donor, candidate, source, similarity)
+
+        return None
+
+    async def adapt_plan(
+        self,
+        donor: Migration,
+        donor_inventory: Inventory,
+        source_inventory: Inventory,
+        similarity: float
+    ) -> Dict[str, Any]:
+        """Adapt a donor migration's plan to the source inventory's application set
+
+        Usage pruning is redone on the source's own usage history: the
+        source's dead applications are removed like uninstalled ones, and
+        applications the donor pruned but the source still has are planned.
+        """
+
+        planner = self.planner
+        usage = None
+        if settings.USAGE_DEAD_APP_ACTION != "keep":
+            usage = UsageAnalytics(self.db).classify(source_inventory)
+
+        donor_plan = donor.migration_plan if isinstance(donor.migration_plan, dict) else {}
+        donor_pruned = (donor_plan.get("usage_pruning") or {}).get("pruned_applications") or []
+        donor_skipped = {normalize_app_name(name) for entry in donor_pruned for name in entry.get("installed") or []}
+        donor_apps = {
+            name: original for name, original in app_names(donor_inventory.installed_applications).items()
+            if name not in donor_skipped
+        }
+
+        source_matched, source_unknown, _ = planner.classify(source_inventory.installed_applications or [])
+        pruned_recipes, pruned_unknown = planner.prune_unused(source_matched, source_unknown, usage)
+        kept_recipes = set(planner.install_order(source_matched.keys()))
+        # A pruned recipe that a kept one requires is installed anyway
+        pruned_recipes = {key: names for key, names in pruned_recipes.items() if key not in kept_recipes}
+        pruned_names = {normalize_app_name(name) for names in pruned_recipes.values() for name in names}
+        pruned_names |= {normalize_app_name(app.get("name") or "") for app in pruned_unknown}
+        source_apps = {
+            name: original for name, original in app_names(source_inventory.installed_applications).items()
+            if name not in pruned_names
+        }
+
+        removed = [donor_apps[name] for name in donor_apps.keys() - source_apps.keys()]
+        added = [
+            app for app in source_inventory.installed_applications or []
+            if normalize_app_name(app.get("name") or "") in source_apps.keys() - donor_apps.keys()
+        ]
+        removed_recipes = {planner.match(name) for name in removed} - kept_recipes - {None}
+        removed_names = [normalize_app_name(name) for name in removed]
+
+        # Recipe plans have typed tasks, so host-specific tasks can be rebuilt
+        donor_tasks = copy.deepcopy(donor.tasks or [])
+        # The kept tasks are renumbered, so dependencies by number must become names
+        planner.name_dependencies(donor_tasks)
+        rebuild_configuration = any(task.get("category") for task in donor_tasks)
+
+        tasks = []
+        dropped = set()
+        for task in donor_tasks:
+            if task.get("recipe"):
+                drop = task["recipe"] in removed_recipes
+            elif rebuild_configuration and task.get("category") in ("configure", "data"):
+                drop = True
+            else:
+                drop = self._mentions_any(task, ("application", "name", "instructions"), removed_names)
+            if drop:
+                dropped.add(task.get("name"))
+            else:
+                tasks.append(task)
+
+        for task in tasks:
+            task["dependencies"] = [
+                dep for dep in task.get("dependencies") or [] if dep not in dropped
+            ]
+
+        # Recipe steps are rebuilt for the recipes kept and deferred installs
+        # for the source's own pruning; other steps follow their applications
+        skipped_steps = {recipe["name"] for recipe in APP_RECIPES} | {entry.get("application") for entry in donor_pruned}
+        _, manual_steps = planner.recipe_install_tasks([task["recipe"] for task in tasks if task.get("recipe")])
+        for step in donor.manual_steps or []:
+            step = step if isinstance(step, dict) else {"step": str(step)}
+            if step.get("application") in skipped_steps:
+                continue
+            if not self._mentions_any(step, ("application", "step"), removed_names):
+                manual_steps.append(step)
+        pruning = planner.pruning_report(usage, pruned_recipes, pruned_unknown, manual_steps)
+
+        plan = {
+            "plan": {
+                **donor_plan,
+                "summary": f"Adapted from migration '{donor.name}' ({similarity:.0%} similar)",
+                "reused_from": donor.id,
+                "similarity": round(similarity, 3),
+                "added_applications": [app.get("name") for app in added],
+                "removed_applications": removed,
+                "usage_pruning": pruning
+            },
+            "tasks": tasks,
+            "recommendations": dict(donor.ai_recommendations or {}),
+            "manual_steps": manual_steps,
+            "estimated_minutes": 0,
+            "risks": []
+        }
+
+        if rebuild_configuration:
+            planner.insert_install_tasks(plan, planner.configuration_tasks(source_inventory))
+
+        matched, unknown, _ = planner.classify(added)
+        existing_recipes = {task.get("recipe") for task in tasks}
+        recipe_keys = [key for key in planner.install_order(matched.keys()) if key not in existing_recipes]
+        recipe_tasks, manual_steps = planner.recipe_install_tasks(recipe_keys)
+        planner.insert_install_tasks(plan, recipe_tasks)
+        plan["manual_steps"].extend(manual_steps)
+
+        if unknown:
+            ai_plan = await planner.ai_service.generate_application_tasks(source_inventory, unknown)
+            planner.merge_ai_tasks(plan, ai_plan)
+
+        # Sized for the source machine, not copied from the donor's
+        plan["hardware_spec"] = planner.hardware_spec(
+            source_inventory,
+            [task["recipe"] for task in plan["tasks"] if task.get("recipe")],
+            FleetSizingService(self.db).hardware_spec(
+                source_inventory.agent_id,
+                AIService._generate_default_hardware_spec(source_inventory),
+                source_inventory.company_id
+            )
+        )
+        return plan
+
+    @staticmethod
+    def _mentions_any(item: Dict[str, Any], fields: Tuple[str, ...], names: List[str]) -> bool:
+        text = normalize_app_name(" ".join(str(item.get(field) or "") for field in fields))
+        return any(mentions(text, name) for name in names)
+
+    async def _donor_migration(self, agent_id: str, migration: Migration) -> Optional[Migration]:
+        """Find the migration whose plan can be reused for an agent
+
+        A donor that is still planning and was created before this migration
+        is waited for, so a cohort created together shares the first plan.
+        """
+
+        deadline = time.monotonic() + settings.PLAN_REUSE_WAIT_SECONDS
+        while True:
+            donor = self.db.query(Migration).filter(
+                Migration.source_agent_id == agent_id,
+                Migration.company_id == migration.company_id,
+                Migration.id != migration.id,
+                Migration.status.in_(REUSABLE_STATUSES + [MigrationStatus.PLANNING])
+            ).order_by(Migration.created_at.desc()).populate_existing().first()
+
+            if donor is None:
+                return None
+            if donor.status != MigrationStatus.PLANNING:
+                return donor if donor.tasks else None
+            if donor.created_at >= migration.created_at or time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(PLAN_REUSE_POLL_SECONDS)
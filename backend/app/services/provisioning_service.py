@@ -0,0 +1,167 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import uuid
+
+from app.core.cache import cache
+from app.db.upsert import json_merge, upsert
+from app.models.agent import Agent, AgentStatus
+from app.models.company import Company
+from app.models.dashboard import adjust_counters, agent_counters, counter_changes
+
+# Rows per INSERT, which keeps its parameters well under PostgreSQL's limit of 65535
+PROVISION_BATCH_ROWS = 1000
+# Filled in from a registration only where provisioning left them empty
+DESCRIPTIVE_COLUMNS = ("computer_name", "user_name", "os_version")
+
+
+class AgentProvisioningService:
+    """Creates and updates agents with INSERT ... ON CONFLICT on agent_id
+
+    Upserts bypass the ORM, so the dashboard counters are adjusted here
+    rather than by their mapper events. An agent was created by the
+    statement when it returns the id the statement proposed.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def register(
+        self,
+        agent_id: str,
+        fields: Dict[str, Any],
+        ip_address: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Create the agent or mark it active and seen now, in one statement
+
+        Existing agents keep their company and any identity provisioned for
+        them. Returns the agent's row.
+        """
+        connection = self.db.connection()
+        agents = Agent.__table__
+        proposed_id = str(uuid.uuid4())
+        metadata = {"ip_address": ip_address} if ip_address else {}
+
+        statement = upsert(connection, agents).values(
+            id=proposed_id,
+            agent_id=agent_id,
+            status=AgentStatus.ACTIVE,
+            last_seen=datetime.utcnow(),
+            agent_metadata=metadata,
+            **{key: fields.get(key) for key in (*DESCRIPTIVE_COLUMNS, "company_id")}
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=["agent_id"],
+            set_={
+                "status": statement.excluded.status,
+                "last_seen": statement.excluded.last_seen,
+                "updated_at": func.now(),
+                "agent_metadata": json_merge(connection, agents.c.agent_metadata, statement.excluded.agent_metadata),
+                **{key: func.coalesce(agents.c[key], statement.excluded[key]) for key in DESCRIPTIVE_COLUMNS},
+            }
+        )
+
+        previous_columns = (agents.c.company_id, agents.c.status, agents.c.last_seen)
+        if connection.dialect.name == "postgresql":
+            # Subqueries of RETURNING read the snapshot the statement started
+            # with, so they return the row as it was before the upsert
+            before = agents.alias("before")
+            statement = statement.returning(agents, *(
+                select(before.c[column.key]).where(before.c.agent_id == agent_id).scalar_subquery()
+                for column in previous_columns
+            ))
+            row = connection.execute(statement).one()
+            agent, previous = row[:len(agents.c)], row[len(agents.c):]
+        else:
+            previous = connection.execute(select(*previous_columns).where(agents.c.agent_id == agent_id)).first()
+            agent = connection.execute(statement.returning(agents)).one()
+
+        agent = dict(zip(agents.c.keys(), agent))
+        after = agent_counters(agent["company_id"], agent["status"], agent["last_seen"])
+        if agent["id"] == proposed_id:
+            before = {}
+        elif previous is None or previous[1] is None:
+            # Created by a concurrent registration, which counted it as it is now
+            before = after
+        else:
+            before = agent_counters(*previous)
+        adjust_counters(connection, counter_changes(before, after))
+        self.db.commit()
+
+        if agent["id"] != proposed_id:
+            cache.invalidate("agent", agent["id"])
+        return agent
+
+    def provision(
+        self,
+        identities: List[Dict[str, Any]],
+        company_id: Optional[str] = None,
+        own_company_only: bool = False
+    ) -> Dict[str, int]:
+        """Pre-register machines before their agents first report
+
+        New agents are created inactive and never seen. Existing agents get
+        the given names and site but keep their company, status and other
+        metadata. With ``own_company_only``, existing agents of companies
+        other than ``company_id`` are left as they are and counted as
+        skipped. All rows are written in one transaction.
+        """
+        # The last row for a machine wins; one statement can't update a row twice
+        rows = {}
+        for identity in identities:
+            rows[identity["agent_id"]] = {**identity, "company_id": identity.get("company_id") or company_id}
+
+        company_ids = {row["company_id"] for row in rows.values() if row["company_id"]}
+        if company_ids:
+            found = {c.id for c in self.db.query(Company.id).filter(Company.id.in_(company_ids))}
+            missing = sorted(company_ids - found)
+            if missing:
+                raise ValueError(f"Companies not found: {', '.join(missing)}")
+
+        connection = self.db.connection()
+        agents = Agent.__table__
+        created, updated_ids, skipped = 0, [], 0
+        counters: Dict[tuple, float] = {}
+        batch = list(rows.values())
+        for start in range(0, len(batch), PROVISION_BATCH_ROWS):
+            values = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "agent_id": row["agent_id"],
+                    "company_id": row["company_id"],
+                    "status": AgentStatus.INACTIVE,
+                    "agent_metadata": {"site": row["site"]} if row.get("site") else {},
+                    **{key: row.get(key) for key in DESCRIPTIVE_COLUMNS},
+                }
+                for row in batch[start:start + PROVISION_BATCH_ROWS]
+            ]
+            statement = upsert(connection, agents).values(values)
+            statement = statement.on_conflict_do_update(
+                index_elements=["agent_id"],
+                set_={
+                    "updated_at": func.now(),
+                    "agent_metadata": json_merge(connection, agents.c.agent_metadata, statement.excluded.agent_metadata),
+                    **{key: func.coalesce(statement.excluded[key], agents.c[key]) for key in DESCRIPTIVE_COLUMNS},
+                },
+                where=(agents.c.company_id == company_id) if own_company_only else None
+            ).returning(agents.c.id, agents.c.agent_id)
+
+            proposed = {value["agent_id"]: value for value in values}
+            # Rows the where clause kept from updating aren't returned
+            returned = connection.execute(statement).all()
+            skipped += len(values) - len(returned)
+            for row_id, agent_id in returned:
+                value = proposed[agent_id]
+                if row_id != value["id"]:
+                    # Updates change nothing the dashboard counts
+                    updated_ids.append(row_id)
+                    continue
+                created += 1
+                for key, delta in agent_counters(value["company_id"], AgentStatus.INACTIVE, None).items():
+                    counters[key] = counters.get(key, 0) + delta
+
+        adjust_counters(connection, counters)
+        self.db.commit()
+        cache.invalidate("agent", *updated_ids)
+        return {"received": len(identities), "created": created, "updated": len(updated_ids), "skipped": skipped}
@@ -0,0 +1,265 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+
+from app.core.config import settings
+from app.models.inventory import Inventory
+from app.models.metrics import MetricsSample
+
+RAM_SIZES_GB = np.array([8, 16, 32, 64, 128])
+CORE_COUNTS = np.array([4, 6, 8, 12, 16, 24, 32])
+SIZING_TIERS = np.array(["basic", "standard", "performance", "workstation"])
+
+# Size new machines so the 95th percentile load sits at this utilisation
+TARGET_UTILIZATION = 0.7
+# A sample counts as a peak when usage is at or above this percentage
+PEAK_THRESHOLD = 85.0
+# Samples fetched per round trip; only their columns are kept, as arrays
+SIZING_FETCH_ROWS = 50000
+# Agents per latest-inventory query, which keeps its parameters well under PostgreSQL's limit of 65535
+SIZING_HARDWARE_BATCH = 10000
+
+DEFAULT_RAM_GB = 8
+DEFAULT_CORES = 4
+
+
+def group_percentiles(groups: np.ndarray, values: np.ndarray, counts: np.ndarray,
+                      percentiles: List[int]) -> Dict[int, np.ndarray]:
+    """Nearest-rank percentiles of percentage ``values`` per group in a single sort
+
+    ``groups`` holds dense group codes (0..n-1) and ``counts`` the number of
+    samples in each group; every group must have at least one sample.
+    """
+    # Offsetting each group past the 0-100 range turns the grouped sort into
+    # one flat float sort, which is much faster than a two-key lexsort
+    offsets = np.repeat(np.arange(len(counts), dtype=np.float64) * 128, counts)
+    ordered = np.sort(groups * 128.0 + np.clip(values, 0, 100)) - offsets
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return {
+        p: ordered[starts + np.floor(p / 100 * (counts - 1)).astype(np.int64)]
+        for p in percentiles
+    }
+
+
+def compute_sizing(groups: np.ndarray, cpu: np.ndarray, memory: np.ndarray,
+                   current_ram_gb: np.ndarray, current_cores: np.ndarray) -> Dict[str, np.ndarray]:
+    """Compute usage statistics and sizing for every group in vectorized passes"""
+
+    counts = np.bincount(groups)
+    stats: Dict[str, np.ndarray] = {"samples": counts}
+
+    for name, values in (("cpu", cpu), ("memory", memory)):
+        results = group_percentiles(groups, values, counts, [50, 95, 100])
+        stats[f"{name}_p50"] = results[50]
+        stats[f"{name}_p95"] = results[95]
+        stats[f"{name}_max"] = results[100]
+
+    cpu_peak = cpu >= PEAK_THRESHOLD
+    memory_peak = memory >= PEAK_THRESHOLD
+    stats["peak_fraction"] = np.bincount(groups, weights=cpu_peak | memory_peak) / counts
+    stats["concurrent_peak_fraction"] = np.bincount(groups, weights=cpu_peak & memory_peak) / counts
+
+    # Capacity needed to keep p95 load at the target utilisation
+    needed_ram = current_ram_gb * stats["memory_p95"] / 100 / TARGET_UTILIZATION
+    needed_cores = current_cores * stats["cpu_p95"] / 100 / TARGET_UTILIZATION
+    ram_index = np.minimum(np.searchsorted(RAM_SIZES_GB, needed_ram), len(RAM_SIZES_GB) - 1)
+    core_index = np.minimum(np.searchsorted(CORE_COUNTS, needed_cores), len(CORE_COUNTS) - 1)
+    stats["ram_gb"] = np.maximum(RAM_SIZES_GB[ram_index], 16)
+    stats["cores"] = CORE_COUNTS[core_index]
+
+    tier = np.select(
+        [
+            (stats["ram_gb"] >= 64) | (stats["cores"] >= 16),
+            (stats["ram_gb"] >= 32) | (stats["cores"] >= 8) | (stats["concurrent_peak_fraction"] > 0.05),
+            stats["ram_gb"] >= 16,
+        ],
+        [3, 2, 1],
+        default=0
+    )
+    stats["tier"] = SIZING_TIERS[tier]
+    return stats
+
+
+class FleetSizingService:
+    """Size replacement hardware from the metrics history of many agents at once"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def size_agents(
+        self,
+        agent_ids: Optional[List[str]] = None,
+        company_id: Optional[str] = None,
+        days: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Return sizing for every agent with metrics in the window"""
+
+        since = datetime.utcnow() - timedelta(days=days or settings.SIZING_WINDOW_DAYS)
+        query = self.db.query(
+            MetricsSample.agent_id,
+            MetricsSample.cpu_usage_percent,
+            MetricsSample.memory_usage_percent
+        ).filter(
+            MetricsSample.timestamp >= since,
+            MetricsSample.cpu_usage_percent.isnot(None),
+            MetricsSample.memory_usage_percent.isnot(None)
+        )
+        if agent_ids is not None:
+            query = query.filter(MetricsSample.agent_id.in_(agent_ids))
+        if company_id:
+            # Reads only the company's partition
+            query = query.filter(MetricsSample.company_id == company_id)
+
+        samples = self._sample_columns(query)
+        if samples is None:
+            return []
+
+        agents, groups, cpu, memory = samples
+        hardware = self._current_hardware(agents.tolist(), company_id)
+        current = np.array(
+            [hardware.get(agent_id, (DEFAULT_RAM_GB, DEFAULT_CORES)) for agent_id in agents],
+            dtype=np.float64
+        )
+
+        stats = compute_sizing(groups, cpu, memory, current[:, 0], current[:, 1])
+
+        columns = {name: values.tolist() for name, values in stats.items()}
+        return [
+            {
+                "agent_id": agent_id,
+                "samples": columns["samples"][i],
+                "cpu": self._summary(columns, "cpu", i),
+                "memory": self._summary(columns, "memory", i),
+                "peak_fraction": round(columns["peak_fraction"][i], 4),
+                "concurrent_peak_fraction": round(columns["concurrent_peak_fraction"][i], 4),
+                "current_ram_gb": current[i, 0].item(),
+                "current_cores": int(current[i, 1]),
+                "recommended_ram_gb": columns["ram_gb"][i],
+                "recommended_cores": columns["cores"][i],
+                "tier": columns["tier"][i]
+            }
+            for i, agent_id in enumerate(agents.tolist())
+        ]
+
+    def fleet_report(
+        self,
+        company_id: Optional[str] = None,
+        days: Optional[int] = None,
+        include_machines: bool = False
+    ) -> Dict[str, Any]:
+        """Summarise recommended hardware across the fleet for procurement"""
+
+        machines = self.size_agents(company_id=company_id, days=days)
+        report = {
+            "company_id": company_id,
+            "window_days": days or settings.SIZING_WINDOW_DAYS,
+            "machines_sized": len(machines),
+            "tiers": self._tally(machines, "tier"),
+            "ram_gb": self._tally(machines, "recommended_ram_gb"),
+            "cores": self._tally(machines, "recommended_cores")
+        }
+        if include_machines:
+            report["machines"] = machines
+        return report
+
+    def hardware_spec(self, agent_id: str, spec: Dict[str, Any], company_id: Optional[str] = None) -> Dict[str, Any]:
+        """Refine a hardware spec with the agent's usage history, if it has any
+
+        ``company_id`` is the agent's tenant_key; with it only the company's
+        partitions are read.
+        """
+
+        sizing = self.size_agents(agent_ids=[agent_id], company_id=company_id)
+        if not sizing:
+            return spec
+
+        sizing = sizing[0]
+        spec["ram"] = {
+            "recommendation_gb": sizing["recommended_ram_gb"],
+            "justification": (
+                f"Memory p95 {sizing['memory']['p95']:.0f}% of {sizing['current_ram_gb']:.0f}GB "
+                f"over {sizing['samples']} samples"
+            )
+        }
+        spec["cpu"]["recommended_cores"] = sizing["recommended_cores"]
+        spec["cpu"]["justification"] = (
+            f"CPU p95 {sizing['cpu']['p95']:.0f}% on {sizing['current_cores']} cores; "
+            f"{sizing['tier']} tier"
+        )
+        spec["usage_sizing"] = sizing
+        return spec
+
+    def _sample_columns(self, query) -> Optional[Tuple[np.ndarray, ...]]:
+        """Stream (agent_id, cpu, memory) samples into one array per column
+
+        Returns the sorted agent ids, each sample's index into them and the
+        CPU and memory columns, or None when there are no samples.
+        """
+        codes: Dict[str, int] = {}
+        chunks = []
+        result = self.db.execute(query.statement.execution_options(yield_per=SIZING_FETCH_ROWS))
+        for rows in result.partitions():
+            chunks.append((
+                np.fromiter((codes.setdefault(row[0], len(codes)) for row in rows), dtype=np.int64, count=len(rows)),
+                np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows)),
+                np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+            ))
+        if not chunks:
+            return None
+
+        groups, cpu, memory = (np.concatenate(column) for column in zip(*chunks))
+        # Renumber agents in sorted order, as np.unique would
+        agents = np.array(list(codes))
+        order = np.argsort(agents)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        return agents[order], rank[groups], cpu, memory
+
+    def _current_hardware(self, agent_ids: List[str], company_id: Optional[str] = None) -> Dict[str, tuple]:
+        """Installed RAM (GB) and core count from each agent's latest inventory
+
+        Looked up SIZING_HARDWARE_BATCH agents at a time, as a fleet report
+        can cover tens of thousands.
+        """
+
+        hardware = {}
+        for start in range(0, len(agent_ids), SIZING_HARDWARE_BATCH):
+            latest = self.db.query(
+                Inventory.agent_id,
+                func.max(Inventory.timestamp).label("timestamp")
+            ).filter(Inventory.agent_id.in_(agent_ids[start:start + SIZING_HARDWARE_BATCH]))
+            if company_id:
+                latest = latest.filter(Inventory.company_id == company_id)
+            latest = latest.group_by(Inventory.agent_id).subquery()
+
+            rows = self.db.query(Inventory.agent_id, Inventory.system_info).join(
+                latest,
+                (Inventory.agent_id == latest.c.agent_id) & (Inventory.timestamp == latest.c.timestamp)
+            )
+            if company_id:
+                rows = rows.filter(Inventory.company_id == company_id)
+
+            for agent_id, system_info in rows:
+                system_info = system_info or {}
+                hardware[agent_id] = (
+                    (system_info.get("total_memory_mb") or DEFAULT_RAM_GB * 1024) / 1024,
+                    system_info.get("processor_count") or DEFAULT_CORES
+                )
+        return hardware
+
+    @staticmethod
+    def _summary(columns: Dict[str, list], name: str, i: int) -> Dict[str, float]:
+        return {
+            "p50": round(columns[f"{name}_p50"][i], 2),
+            "p95": round(columns[f"{name}_p95"][i], 2),
+            "max": round(columns[f"{name}_max"][i], 2)
+        }
+
+    @staticmethod
+    def _tally(machines: List[Dict[str, Any]], key: str) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for machine in machines:
+            counts[str(machine[key])] = counts.get(str(machine[key]), 0) + 1
+        return counts
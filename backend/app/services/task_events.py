@@ -0,0 +1,88 @@
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+from typing import Dict, Any, List, Optional
+
+from app.models.migration import Migration
+from app.models.task_event import MigrationTaskEvent, TaskEventStatus
+
+
+class TaskEventLog:
+    """Append-only log of task state transitions
+
+    Running migrations write one small row per transition instead of
+    rewriting their progress JSON columns; progress is derived from the log.
+    Only the events of a migration's current attempt count, so a restarted
+    migration runs every task again.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def record(
+        self,
+        migration: Migration,
+        task_index: int,
+        task: Dict[str, Any],
+        status: TaskEventStatus,
+        error: Optional[str] = None
+    ):
+        self.db.add(MigrationTaskEvent(
+            migration_id=migration.id,
+            attempt=migration.attempt or 0,
+            task_index=task_index,
+            task_name=task.get("name"),
+            status=status,
+            error=error
+        ))
+        self.db.commit()
+
+    def events(self, migrations: List[Migration]) -> Dict[str, List[MigrationTaskEvent]]:
+        """Events of the current attempt of several migrations in recorded order, in one query"""
+        grouped: Dict[str, List[MigrationTaskEvent]] = {migration.id: [] for migration in migrations}
+        if not migrations:
+            return grouped
+
+        rows = self.db.query(MigrationTaskEvent).filter(
+            tuple_(MigrationTaskEvent.migration_id, MigrationTaskEvent.attempt).in_(
+                [(migration.id, migration.attempt or 0) for migration in migrations]
+            )
+        ).order_by(MigrationTaskEvent.id).all()
+        for event in rows:
+            grouped[event.migration_id].append(event)
+        return grouped
+
+    def progress(self, migrations: List[Migration]) -> Dict[str, Dict[str, Any]]:
+        """Progress fields of each migration as derived from its events"""
+        events = self.events(migrations)
+        return {
+            migration.id: self.summarize(migration.tasks or [], events[migration.id])
+            for migration in migrations
+        }
+
+    @staticmethod
+    def summarize(tasks: List[Dict[str, Any]], events: List[MigrationTaskEvent]) -> Dict[str, Any]:
+        """Build the MigrationResponse progress fields from a migration's events"""
+        completed = []
+        failed = []
+        running: Dict[int, str] = {}
+
+        for event in events:
+            task = tasks[event.task_index] if event.task_index < len(tasks) else {"name": event.task_name}
+            if event.status == TaskEventStatus.STARTED:
+                running[event.task_index] = event.task_name or f"Task {event.task_index + 1}"
+                continue
+
+            running.pop(event.task_index, None)
+            if event.status == TaskEventStatus.COMPLETED:
+                completed.append(task)
+            elif event.status == TaskEventStatus.FAILED:
+                failed.append({"task": task, "error": event.error})
+            else:
+                failed.append({"task": task, "error": event.error, "skipped": True})
+
+        return {
+            "completed_tasks": completed,
+            "failed_tasks": failed,
+            "current_task": ", ".join(running[i] for i in sorted(running)) or None,
+            "progress_percent": (len(completed) + len(failed)) / len(tasks) * 100 if tasks else 0.0
+        }
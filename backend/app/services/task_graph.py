@@ -0,0 +1,94 @@
+from typing import Dict, Any, List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TaskGraphError(ValueError):
+    """Raised when task dependencies cannot be scheduled"""
+
+
+class TaskGraph:
+    """Dependency graph of a migration's tasks
+
+    Dependencies may reference other tasks by name or by their ``order``
+    number, as produced by both the recipe planner and Claude. References to
+    unknown tasks are ignored.
+    """
+
+    def __init__(self, tasks: List[Dict[str, Any]]):
+        self.tasks = tasks
+        self.dependencies: List[List[int]] = [[] for _ in tasks]
+        self.dependents: List[List[int]] = [[] for _ in tasks]
+
+        by_name = {}
+        by_order = {}
+        for i, task in enumerate(tasks):
+            by_name.setdefault(task.get("name"), i)
+            if task.get("order") is not None:
+                by_order.setdefault(str(task["order"]), i)
+
+        for i, task in enumerate(tasks):
+            for dep in task.get("dependencies") or []:
+                j = by_name.get(dep) if isinstance(dep, str) else None
+                if j is None:
+                    j = by_order.get(str(dep))
+                if j is None:
+                    logger.warning(f"Ignoring unknown dependency {dep!r} of task {task.get('name')!r}")
+                    continue
+                if j != i and j not in self.dependencies[i]:
+                    self.dependencies[i].append(j)
+                    self.dependents[j].append(i)
+
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[int]:
+        remaining = [len(deps) for deps in self.dependencies]
+        ready = [i for i, count in enumerate(remaining) if count == 0]
+        order = []
+        while ready:
+            i = ready.pop(0)
+            order.append(i)
+            for j in self.dependents[i]:
+                remaining[j] -= 1
+                if remaining[j] == 0:
+                    ready.append(j)
+
+        if len(order) < len(self.tasks):
+            cycle = [self.tasks[i].get("name", f"Task {i + 1}") for i in self._find_cycle(remaining)]
+            raise TaskGraphError("Task dependency cycle: " + " -> ".join(cycle))
+        return order
+
+    def _find_cycle(self, remaining: List[int]) -> List[int]:
+        # Every task left with unmet dependencies is on or behind a cycle;
+        # walking dependencies from any of them must revisit a task
+        start = next(i for i, count in enumerate(remaining) if count > 0)
+        path = [start]
+        while True:
+            nxt = next(j for j in self.dependencies[path[-1]] if remaining[j] > 0)
+            if nxt in path:
+                return path[path.index(nxt):] + [nxt]
+            path.append(nxt)
+
+    def critical_path(self) -> Tuple[int, List[int]]:
+        """Longest chain of dependent tasks by estimated minutes"""
+        finish: List[int] = [0] * len(self.tasks)
+        previous: List[int] = [-1] * len(self.tasks)
+        for i in self.order:
+            start = 0
+            for j in self.dependencies[i]:
+                if finish[j] > start:
+                    start, previous[i] = finish[j], j
+            finish[i] = start + int(self.tasks[i].get("estimated_minutes") or 0)
+
+        if not self.tasks:
+            return 0, []
+        last = max(range(len(self.tasks)), key=lambda i: finish[i])
+        path = []
+        while last != -1:
+            path.append(last)
+            last = previous[last]
+        return finish[path[0]], path[::-1]
+
+    def critical_path_minutes(self) -> int:
+        return self.critical_path()[0]
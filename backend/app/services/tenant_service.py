@@ -0,0 +1,54 @@
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+from typing import Dict, List
+
+from app.db.partitioning import drop_company_partitions
+from app.models.agent import Agent
+from app.models.app_signature import AppSignatureBand
+from app.models.company import Company
+from app.models.dashboard import DashboardCounter
+from app.models.file_index import AgentFile, AgentFileChunk
+from app.models.migration import Migration
+from app.models.task_event import MigrationTaskEvent
+from app.models.user import User
+
+
+class TenantService:
+    """Removes a company and everything stored for it"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def offboard(self, company: Company) -> Dict[str, List[str]]:
+        """Delete a company's data in one transaction
+
+        Inventories and metrics are dropped with the company's partitions
+        rather than deleted row by row; the remaining tables are small per
+        company. Returns the ids of the deleted users and agents, so callers
+        can evict them from caches.
+        """
+        company_id = company.id
+        agent_ids = select(Agent.id).where(Agent.company_id == company_id).scalar_subquery()
+        migration_ids = select(Migration.id).where(or_(
+            Migration.company_id == company_id,
+            Migration.source_agent_id.in_(agent_ids),
+            Migration.target_agent_id.in_(agent_ids)
+        )).scalar_subquery()
+        user_ids = [row.id for row in self.db.query(User.id).filter(User.company_id == company_id)]
+        deleted_agent_ids = [row.id for row in self.db.query(Agent.id).filter(Agent.company_id == company_id)]
+
+        drop_company_partitions(self.db.connection(), company_id)
+
+        self.db.query(MigrationTaskEvent).filter(
+            MigrationTaskEvent.migration_id.in_(migration_ids)
+        ).delete(synchronize_session=False)
+        self.db.query(Migration).filter(Migration.id.in_(migration_ids)).delete(synchronize_session=False)
+        for model in (AppSignatureBand, AgentFile, AgentFileChunk):
+            self.db.query(model).filter(model.agent_id.in_(agent_ids)).delete(synchronize_session=False)
+        self.db.query(Agent).filter(Agent.company_id == company_id).delete(synchronize_session=False)
+        self.db.query(User).filter(User.company_id == company_id).delete(synchronize_session=False)
+        self.db.query(DashboardCounter).filter(DashboardCounter.company_id == company_id).delete(synchronize_session=False)
+        self.db.delete(company)
+        self.db.commit()
+
+        return {"company_id": company_id, "users": user_ids, "agents": deleted_agent_ids}
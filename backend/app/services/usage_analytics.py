@@ -0,0 +1,152 @@
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
+import re
+
+from app.core.config import settings
+from app.models.inventory import Inventory
+from app.models.metrics import MetricsSample
+
+ACTIVE = "active"
+RARE = "rare"
+DEAD = "dead"
+# Not enough metrics history to tell whether the application is used
+UNKNOWN = "unknown"
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def aggregate_usage(samples: List[Any]) -> Dict[str, Dict[str, Any]]:
+    """Usage per process across consecutive metrics samples of one agent
+
+    The agent reports running totals since it started, so usage in a period
+    is the increase between samples. A total that drops means the agent
+    restarted and the new total is all fresh usage; a process that appears
+    in a sample was seen running. The first sample is only the baseline.
+    """
+    usage: Dict[str, Dict[str, Any]] = {}
+    previous: Optional[Dict[str, float]] = None
+
+    for timestamp, entries in samples:
+        current: Dict[str, float] = {}
+        for entry in entries or []:
+            name = (entry.get("application_name") or "").strip()
+            if not name:
+                continue
+            key = name.lower()
+            minutes = float(entry.get("total_minutes_used") or 0)
+            current[key] = minutes
+
+            stats = usage.setdefault(key, {
+                "process": name,
+                "executable_path": entry.get("executable_path") or "",
+                "minutes": 0.0,
+                "last_used": None,
+            })
+            if previous is None:
+                continue
+            before = previous.get(key)
+            if before is None or minutes != before:
+                stats["minutes"] += minutes - before if before is not None and minutes > before else minutes
+                stats["last_used"] = timestamp
+        previous = current
+
+    return usage
+
+
+def match_usage(app: Dict[str, Any], usage: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Usage of the processes belonging to an installed application
+
+    A process belongs to the application when its executable lives under the
+    application's install location, or when the process name is one of the
+    words of the application name.
+    """
+    location = (app.get("install_location") or "").replace("/", "\\").rstrip("\\").lower()
+    words = set(re.split(r"[^a-z0-9+]+", (app.get("name") or "").lower()))
+    words.discard("")
+
+    matches = []
+    for key, stats in usage.items():
+        path = stats["executable_path"].replace("/", "\\").lower()
+        if len(location) > 3 and path.startswith(location + "\\"):
+            matches.append(stats)
+        elif re.sub(r"\.exe$", "", key) in words:
+            matches.append(stats)
+    return matches
+
+
+class UsageAnalytics:
+    """Classifies installed applications by how much they were used
+
+    Usage is aggregated over every metrics sample in the window. An
+    application is active above USAGE_ACTIVE_MINUTES, rare when used less
+    and dead when not used at all. Machines observed for less than
+    USAGE_MIN_OBSERVATION_DAYS leave every application unknown.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def agent_usage(self, agent_id: str, company_id: str, days: Optional[int] = None) -> Dict[str, Any]:
+        """Process usage of an agent; ``company_id`` is its tenant_key, the metrics partition"""
+        now = datetime.utcnow()
+        start = now - timedelta(days=days or settings.USAGE_WINDOW_DAYS)
+        samples = self.db.query(
+            MetricsSample.timestamp, MetricsSample.application_usage
+        ).filter(
+            MetricsSample.company_id == company_id,
+            MetricsSample.agent_id == agent_id,
+            MetricsSample.timestamp >= start
+        ).order_by(MetricsSample.timestamp).all()
+
+        observed_days = (now - _naive_utc(samples[0][0])).total_seconds() / 86400 if samples else 0.0
+        return {
+            "window_days": days or settings.USAGE_WINDOW_DAYS,
+            "samples": len(samples),
+            "observed_days": round(observed_days, 1),
+            "processes": aggregate_usage(samples),
+        }
+
+    def classify(self, inventory: Inventory, days: Optional[int] = None) -> Dict[str, Any]:
+        """Usage class of each installed application of an inventory"""
+        usage = self.agent_usage(inventory.agent_id, inventory.company_id, days)
+        enough_history = usage["observed_days"] >= settings.USAGE_MIN_OBSERVATION_DAYS
+
+        applications: Dict[str, Dict[str, Any]] = {}
+        for app in inventory.installed_applications or []:
+            name = (app.get("name") or "").strip()
+            if not name:
+                continue
+            matches = match_usage(app, usage["processes"])
+            minutes = sum(stats["minutes"] for stats in matches)
+            used = [stats["last_used"] for stats in matches if stats["last_used"]]
+
+            if not enough_history:
+                status = UNKNOWN
+            elif minutes >= settings.USAGE_ACTIVE_MINUTES:
+                status = ACTIVE
+            elif used:
+                status = RARE
+            else:
+                status = DEAD
+            applications[name] = {
+                "status": status,
+                "minutes": round(minutes, 2),
+                "last_used": max(used).isoformat() if used else None,
+            }
+
+        counts = {status: 0 for status in (ACTIVE, RARE, DEAD, UNKNOWN)}
+        for stats in applications.values():
+            counts[stats["status"]] += 1
+
+        return {
+            "window_days": usage["window_days"],
+            "samples": usage["samples"],
+            "observed_days": usage["observed_days"],
+            "counts": counts,
+            "applications": applications,
+        }
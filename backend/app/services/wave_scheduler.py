@@ -0,0 +1,314 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
+import asyncio
+import ipaddress
+import logging
+
+from app.core.cache import cache
+from app.core.config import settings
+from app.db.partitioning import tenant_key
+from app.db.session import SessionLocal
+from app.models.agent import Agent
+from app.models.dashboard import adjust_counters, counter_changes, migration_counters
+from app.models.inventory import Inventory
+from app.models.migration import Migration, MigrationStatus
+from app.services.migration_lease import run_token
+from app.services.migration_recovery import run_in_background
+
+logger = logging.getLogger(__name__)
+
+# Assumed duration of migrations without a time estimate in their plan
+DEFAULT_MIGRATION_MINUTES = 120
+UNASSIGNED_SITE = "unassigned"
+
+
+def agent_site(agent: Optional[Agent]) -> str:
+    """Network site of an agent: an explicit ``site`` in its metadata, else its subnet"""
+    metadata = (agent.agent_metadata if agent else None) or {}
+    if metadata.get("site"):
+        return str(metadata["site"])
+
+    address = metadata.get("ip_address")
+    if address:
+        try:
+            ip = ipaddress.ip_address(address)
+            prefix = 24 if ip.version == 4 else 64
+            return str(ipaddress.ip_network(f"{ip}/{prefix}", strict=False))
+        except ValueError:
+            pass
+    return UNASSIGNED_SITE
+
+
+def expected_minutes(migration: Migration) -> int:
+    return migration.critical_path_minutes or migration.estimated_duration_minutes or DEFAULT_MIGRATION_MINUTES
+
+
+def simulate_admissions(
+    queued: List[Dict[str, Any]],
+    running: List[Dict[str, Any]],
+    now: datetime,
+    limits: Dict[str, float]
+) -> Dict[str, datetime]:
+    """Start time of every queued migration under the wave limits
+
+    ``queued`` entries need id, company, site, minutes, rate (MB/minute of
+    site bandwidth they use) and must be in queue order; ``running`` entries
+    need company, site, rate and finishes_at. Whenever capacity frees up the
+    company with the fewest running migrations goes first, so a tenant that
+    queues a large wave can't starve the others. Within a site migrations
+    start in queue order. Migrations that can never be admitted are left out.
+    """
+    active = [dict(entry) for entry in running]
+    pending: Dict[str, List[Dict[str, Any]]] = {}
+    for entry in queued:
+        pending.setdefault(entry["company"], []).append(entry)
+
+    starts: Dict[str, datetime] = {}
+    t = now
+    while pending:
+        per_company: Dict[str, int] = {}
+        per_site: Dict[str, int] = {}
+        site_rate: Dict[str, float] = {}
+        for entry in active:
+            per_company[entry["company"]] = per_company.get(entry["company"], 0) + 1
+            per_site[entry["site"]] = per_site.get(entry["site"], 0) + 1
+            site_rate[entry["site"]] = site_rate.get(entry["site"], 0.0) + entry["rate"]
+
+        while len(active) < limits["global"]:
+            # Sites where an earlier migration is waiting for bandwidth
+            held = set()
+            chosen = None
+            for company in sorted(pending, key=lambda c: (per_company.get(c, 0), pending[c][0]["position"])):
+                if per_company.get(company, 0) >= limits["company"]:
+                    continue
+                for entry in pending[company]:
+                    site = entry["site"]
+                    if site in held or per_site.get(site, 0) >= limits["site"]:
+                        continue
+                    # A site with nothing running always takes one migration,
+                    # however large, so big machines are never starved
+                    if per_site.get(site, 0) and site_rate.get(site, 0.0) + entry["rate"] > limits["site_rate"]:
+                        held.add(site)
+                        continue
+                    chosen = entry
+                    break
+                if chosen:
+                    break
+            if chosen is None:
+                break
+
+            pending[chosen["company"]].remove(chosen)
+            if not pending[chosen["company"]]:
+                del pending[chosen["company"]]
+            starts[chosen["id"]] = t
+            active.append({**chosen, "finishes_at": t + timedelta(minutes=chosen["minutes"])})
+            per_company[chosen["company"]] = per_company.get(chosen["company"], 0) + 1
+            per_site[chosen["site"]] = per_site.get(chosen["site"], 0) + 1
+            site_rate[chosen["site"]] = site_rate.get(chosen["site"], 0.0) + chosen["rate"]
+
+        if not pending or not active:
+            break
+        # Advance to the next time a running migration finishes
+        t = min(entry["finishes_at"] for entry in active)
+        active = [entry for entry in active if entry["finishes_at"] > t]
+
+    return starts
+
+
+class WaveScheduler:
+    """Admits queued migrations under global, per-company, per-site and bandwidth limits
+
+    Every worker runs the scheduler; starting a migration is a conditional
+    update from QUEUED, so a migration is only ever started once.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def limits() -> Dict[str, float]:
+        return {
+            "global": settings.WAVE_MAX_CONCURRENT_MIGRATIONS,
+            "company": settings.WAVE_MAX_PER_COMPANY,
+            "site": settings.WAVE_MAX_PER_SITE,
+            # Megabits per second to MB per minute
+            "site_rate": settings.WAVE_SITE_BANDWIDTH_MBPS * 60 / 8,
+        }
+
+    def enqueue(self, wave: str, migration_ids: List[str]) -> List[Migration]:
+        """Queue READY migrations as part of a wave"""
+        migrations = self.db.query(Migration).options(
+            joinedload(Migration.source_agent)
+        ).filter(Migration.id.in_(migration_ids)).all()
+
+        found = {m.id for m in migrations}
+        missing = [mid for mid in migration_ids if mid not in found]
+        if missing:
+            raise ValueError(f"Migrations not found: {', '.join(missing)}")
+        not_ready = [m.id for m in migrations if m.status != MigrationStatus.READY]
+        if not_ready:
+            raise ValueError(f"Migrations must be in READY status to queue: {', '.join(not_ready)}")
+
+        data_sizes = self._data_sizes(migrations)
+        now = datetime.utcnow()
+        # Keep the order the migrations were submitted in
+        position = {mid: i for i, mid in enumerate(migration_ids)}
+        for migration in sorted(migrations, key=lambda m: position[m.id]):
+            migration.status = MigrationStatus.QUEUED
+            migration.wave = wave
+            migration.site = agent_site(migration.source_agent)
+            migration.total_data_size_mb = data_sizes.get(migration.source_agent_id, 0)
+            migration.queued_at = now
+            now += timedelta(microseconds=1)
+        self.db.commit()
+        cache.invalidate("migration", *migration_ids)
+        return migrations
+
+    def schedule(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Simulate admissions from the current queue and running migrations"""
+        now = now or datetime.utcnow()
+        migrations = self.db.query(Migration).options(
+            joinedload(Migration.source_agent)
+        ).filter(
+            Migration.status.in_([MigrationStatus.QUEUED, MigrationStatus.IN_PROGRESS])
+        ).order_by(Migration.queued_at, Migration.created_at).all()
+
+        queued, running = [], []
+        for migration in migrations:
+            minutes = expected_minutes(migration)
+            entry = {
+                "id": migration.id,
+                "company": migration.company_id,
+                "site": migration.site or agent_site(migration.source_agent),
+                "minutes": minutes,
+                "rate": (migration.total_data_size_mb or 0) / minutes,
+            }
+            if migration.status == MigrationStatus.QUEUED:
+                entry["position"] = len(queued)
+                queued.append(entry)
+            else:
+                started = migration.started_at or now
+                if started.tzinfo:
+                    started = started.astimezone(timezone.utc).replace(tzinfo=None)
+                # Overdue migrations are assumed to finish any moment
+                entry["finishes_at"] = max(started + timedelta(minutes=minutes), now)
+                running.append(entry)
+
+        starts = simulate_admissions(queued, running, now, self.limits())
+        return {
+            "now": now,
+            "migrations": migrations,
+            "queued": queued,
+            "running": running,
+            "starts": starts,
+        }
+
+    def admit(self) -> List[str]:
+        """Start every queued migration the limits allow right now"""
+        schedule = self.schedule()
+        # Read before the commits below expire the rows
+        counted = {m.id: (m.company_id, m.progress_percent) for m in schedule["migrations"]}
+        admitted = []
+        for migration_id, start in schedule["starts"].items():
+            if start > schedule["now"]:
+                continue
+            lease_owner = run_token()
+            updated = self.db.query(Migration).filter(
+                Migration.id == migration_id,
+                Migration.status == MigrationStatus.QUEUED
+            ).update({
+                Migration.status: MigrationStatus.IN_PROGRESS,
+                Migration.attempt: func.coalesce(Migration.attempt, 0) + 1,
+                Migration.lease_owner: lease_owner,
+                Migration.lease_expires_at: datetime.utcnow() + timedelta(seconds=settings.MIGRATION_LEASE_SECONDS)
+            }, synchronize_session=False)
+            if updated == 1:
+                # Bulk updates bypass the dashboard counters' mapper events
+                company_id, progress_percent = counted[migration_id]
+                adjust_counters(self.db.connection(), counter_changes(
+                    migration_counters(company_id, MigrationStatus.QUEUED, progress_percent),
+                    migration_counters(company_id, MigrationStatus.IN_PROGRESS, progress_percent)
+                ))
+            self.db.commit()
+            if updated == 1:
+                cache.invalidate("migration", migration_id)
+                run_in_background(migration_id, lease_owner)
+                admitted.append(migration_id)
+
+        if admitted:
+            logger.info(f"Admitted {len(admitted)} queued migrations")
+        return admitted
+
+    def queue_report(self, wave: Optional[str] = None, company_id: Optional[str] = None) -> Dict[str, Any]:
+        """Queued migrations in expected start order with their ETAs
+
+        The ETAs account for every company's migrations, but with
+        ``company_id`` only that company's are listed and counted.
+        """
+        schedule = self.schedule()
+        by_id = {m.id: m for m in schedule["migrations"]}
+        starts = schedule["starts"]
+
+        entries = []
+        for entry in schedule["queued"]:
+            migration = by_id[entry["id"]]
+            if (wave and migration.wave != wave) or (company_id and entry["company"] != company_id):
+                continue
+            start = starts.get(entry["id"])
+            entries.append({
+                "id": migration.id,
+                "name": migration.name,
+                "wave": migration.wave,
+                "company_id": entry["company"],
+                "site": entry["site"],
+                "total_data_size_mb": migration.total_data_size_mb,
+                "queued_at": migration.queued_at,
+                "estimated_start": start,
+                "estimated_completion": start + timedelta(minutes=entry["minutes"]) if start else None,
+            })
+        entries.sort(key=lambda e: (e["estimated_start"] is None, e["estimated_start"] or schedule["now"]))
+        for position, entry in enumerate(entries, 1):
+            entry["position"] = position
+
+        return {
+            "generated_at": schedule["now"],
+            "wave": wave,
+            "limits": {
+                "max_concurrent_migrations": settings.WAVE_MAX_CONCURRENT_MIGRATIONS,
+                "max_per_company": settings.WAVE_MAX_PER_COMPANY,
+                "max_per_site": settings.WAVE_MAX_PER_SITE,
+                "site_bandwidth_mbps": settings.WAVE_SITE_BANDWIDTH_MBPS,
+            },
+            "running": sum(1 for entry in schedule["running"] if not company_id or entry["company"] == company_id),
+            "queued": len(entries),
+            "migrations": entries,
+        }
+
+    def _data_sizes(self, migrations: List[Migration]) -> Dict[str, int]:
+        """total_data_size_mb of the latest inventory of each migration's source agent"""
+        sizes: Dict[str, int] = {}
+        rows = self.db.query(
+            Inventory.agent_id, Inventory.total_data_size_mb
+        ).filter(
+            # Migrations carry their source agent's company, so only their partitions are read
+            Inventory.company_id.in_({tenant_key(m.company_id) for m in migrations}),
+            Inventory.agent_id.in_([m.source_agent_id for m in migrations])
+        ).order_by(Inventory.timestamp).all()
+        for agent_id, size in rows:
+            sizes[agent_id] = size or 0
+        return sizes
+
+
+async def run_wave_scheduler():
+    """Admit queued migrations periodically"""
+    while True:
+        db = SessionLocal()
+        try:
+            WaveScheduler(db).admit()
+        except Exception as e:
+            logger.error(f"Wave scheduling failed: {e}")
+        finally:
+            db.close()
+        await asyncio.sleep(settings.WAVE_SCHEDULER_INTERVAL_SECONDS)
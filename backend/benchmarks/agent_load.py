@@ -0,0 +1,348 @@
+"""Synthetic agent fleet for measuring how many agents one backend supports.
+
+Each simulated agent follows AgentWorker.cs: it registers, posts a full
+inventory, then posts metrics every 15 minutes, polls for commands every 5
+minutes and repeats discovery every 6 hours. --time-scale shortens those
+intervals, so 2,000 agents at --time-scale 10 load the backend like 20,000
+real ones. Throughput, p50/p99 latency per endpoint and the SQL the backend
+ran (scraped from /metrics) are reported at the end.
+
+Against a backend that is already running:
+
+    python -m benchmarks.agent_load --url http://localhost:8000 --agents 5000 --duration 120
+
+Or start one on a throwaway SQLite database (or any DATABASE_URL):
+
+    python -m benchmarks.agent_load --start-backend --database-url sqlite:///./loadtest.db
+
+Save a run with --save-baseline, then pass --baseline in CI to exit with
+status 1 when throughput, latency or queries per request regress by more
+than --tolerance.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+from benchmarks.inventory_factory import make_inventory, make_metrics
+
+# AgentWorker.cs timers, in seconds
+DISCOVERY_INTERVAL = 6 * 3600
+METRICS_INTERVAL = 15 * 60
+COMMAND_SYNC_INTERVAL = 5 * 60
+
+OPERATIONS = ("register", "inventory", "metrics", "commands")
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--url", default="http://localhost:8000", help="Backend base URL")
+parser.add_argument("--agents", type=int, default=1000, help="Number of simulated agents")
+parser.add_argument("--duration", type=float, default=60, help="Seconds to run after the fleet has started")
+parser.add_argument("--ramp", type=float, default=30, help="Seconds over which agents start up")
+parser.add_argument("--time-scale", type=float, default=1.0, help="Speed-up applied to the agent timers")
+parser.add_argument("--applications", type=int, default=150, help="Mean installed applications per inventory")
+parser.add_argument("--registry-keys", type=int, default=400, help="Registry settings per inventory")
+parser.add_argument("--inventory-variants", type=int, default=32, help="Distinct inventory payloads to generate")
+parser.add_argument("--max-connections", type=int, default=500, help="HTTP connections to the backend")
+parser.add_argument("--company-id", default=None, help="Company the agents register under")
+parser.add_argument("--seed", type=int, default=1, help="Seed for payloads, agent ids and timer phases")
+parser.add_argument("--start-backend", action="store_true", help="Run the backend with uvicorn for the test")
+parser.add_argument("--database-url", default="sqlite:///./loadtest.db", help="Database for --start-backend")
+parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for --start-backend")
+parser.add_argument("--port", type=int, default=8765, help="Port for --start-backend")
+parser.add_argument("--output", default=None, help="Write the results as JSON to this file")
+parser.add_argument("--save-baseline", default=None, help="Store the results as the baseline in this file")
+parser.add_argument("--baseline", default=None, help="Compare against the baseline in this file")
+parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression against the baseline")
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+@dataclass
+class OperationStats:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: Dict[str, int] = field(default_factory=dict)
+
+    def record(self, seconds: float, status: str):
+        self.latencies.append(seconds)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if not status.startswith("2"):
+            self.errors += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        return {
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "throughput": round(len(self.latencies) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(self.latencies, 0.50) * 1000, 2),
+            "p99_ms": round(percentile(self.latencies, 0.99) * 1000, 2),
+            "max_ms": round(max(self.latencies, default=0.0) * 1000, 2),
+            "statuses": dict(sorted(self.statuses.items())),
+        }
+
+
+class Fleet:
+    """Simulated agents sharing one HTTP client"""
+
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.args = args
+        self.stats = {operation: OperationStats() for operation in OPERATIONS}
+        rng = random.Random(args.seed)
+        # Payloads are encoded once; agents pick one, like machines built from the same images
+        self.inventories = []
+        for _ in range(max(1, args.inventory_variants)):
+            inventory = make_inventory(
+                rng,
+                applications=max(1, int(rng.gauss(args.applications, args.applications / 4))),
+                registry_keys=args.registry_keys
+            )
+            self.inventories.append((inventory, json.dumps(inventory).encode()))
+
+    async def request(self, operation: str, method: str, path: str, agent_id: str, content: bytes = None):
+        headers = {"X-Agent-Id": agent_id}
+        if content is not None:
+            headers["Content-Type"] = "application/json"
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, content=content, headers=headers)
+            await response.aread()
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        self.stats[operation].record(time.perf_counter() - start, status)
+
+    async def periodic(self, interval: float, deadline: float, action):
+        # Agents start at random times, so their timers are spread over the interval
+        next_run = time.monotonic() + interval
+        while next_run < deadline:
+            await asyncio.sleep(max(0.0, next_run - time.monotonic()))
+            await action()
+            next_run += interval
+
+    async def run_agent(self, index: int, deadline: float):
+        args = self.args
+        rng = random.Random(f"{args.seed}-{index}")
+        agent_id = f"loadtest-{args.seed}-{index:06d}"
+        inventory, inventory_body = rng.choice(self.inventories)
+        started = time.monotonic()
+
+        await asyncio.sleep(rng.uniform(0, args.ramp))
+        registration = {
+            "computer_name": f"LOADTEST-{index:06d}",
+            "user_name": inventory["system_info"]["user_name"],
+            "os_version": inventory["system_info"]["os_version"],
+            "company_id": args.company_id,
+        }
+        await self.request("register", "POST", "/api/v1/agents/register", agent_id, json.dumps(registration).encode())
+        await self.request("inventory", "POST", "/api/v1/agents/inventory", agent_id, inventory_body)
+
+        async def send_metrics():
+            elapsed_minutes = (time.monotonic() - started) * args.time_scale / 60
+            body = json.dumps(make_metrics(rng, inventory, elapsed_minutes)).encode()
+            await self.request("metrics", "POST", "/api/v1/agents/metrics", agent_id, body)
+
+        async def poll_commands():
+            await self.request("commands", "GET", f"/api/v1/agents/{agent_id}/commands", agent_id)
+
+        async def discover():
+            await self.request("inventory", "POST", "/api/v1/agents/inventory", agent_id, inventory_body)
+
+        await asyncio.gather(
+            self.periodic(DISCOVERY_INTERVAL / args.time_scale, deadline, discover),
+            self.periodic(METRICS_INTERVAL / args.time_scale, deadline, send_metrics),
+            self.periodic(COMMAND_SYNC_INTERVAL / args.time_scale, deadline, poll_commands),
+        )
+
+
+async def scrape_db_load(client: httpx.AsyncClient) -> Dict[str, float]:
+    """Totals of the backend's SQL counters; empty if /metrics isn't reachable"""
+    try:
+        response = await client.get("/metrics")
+        response.raise_for_status()
+    except httpx.HTTPError:
+        return {}
+    totals = {"queries": 0.0, "query_seconds": 0.0, "pool_wait_seconds": 0.0}
+    for family in text_string_to_metric_families(response.text):
+        for sample in family.samples:
+            if sample.name == "db_queries_total":
+                totals["queries"] += sample.value
+            elif sample.name == "http_request_db_seconds_sum":
+                totals["query_seconds"] += sample.value
+            elif sample.name == "db_pool_checkout_wait_seconds_sum":
+                totals["pool_wait_seconds"] += sample.value
+    return totals
+
+
+async def run(args) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        fleet = Fleet(client, args)
+        before = await scrape_db_load(client)
+        start = time.monotonic()
+        deadline = start + args.ramp + args.duration
+        await asyncio.gather(*(fleet.run_agent(i, deadline) for i in range(args.agents)))
+        elapsed = time.monotonic() - start
+        after = await scrape_db_load(client)
+
+    operations = {operation: fleet.stats[operation].summary(elapsed) for operation in OPERATIONS}
+    overall = OperationStats()
+    for stats in fleet.stats.values():
+        overall.latencies += stats.latencies
+        overall.errors += stats.errors
+    total = overall.summary(elapsed)
+    del total["statuses"]
+
+    results = {
+        "config": {
+            "agents": args.agents,
+            "time_scale": args.time_scale,
+            "equivalent_agents": int(args.agents * args.time_scale),
+            "duration": args.duration,
+            "ramp": args.ramp,
+            "applications": args.applications,
+            "registry_keys": args.registry_keys,
+        },
+        "elapsed_seconds": round(elapsed, 2),
+        "overall": total,
+        "operations": operations,
+    }
+    if before and after:
+        queries = after["queries"] - before["queries"]
+        results["database"] = {
+            "queries": int(queries),
+            "queries_per_second": round(queries / elapsed, 2),
+            "queries_per_request": round(queries / total["requests"], 2) if total["requests"] else 0.0,
+            "query_seconds": round(after["query_seconds"] - before["query_seconds"], 3),
+            "pool_wait_seconds": round(after["pool_wait_seconds"] - before["pool_wait_seconds"], 3),
+        }
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Descriptions of every figure that regressed by more than ``tolerance``"""
+    regressions = []
+
+    def check(name: str, current: float, previous: float, higher_is_better: bool):
+        if not previous:
+            return
+        change = (current - previous) / previous
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(f"{name}: {previous} -> {current} ({change:+.0%})")
+
+    if results["config"] != baseline.get("config"):
+        print("Warning: the baseline was recorded with a different configuration", file=sys.stderr)
+
+    check("overall throughput", results["overall"]["throughput"], baseline["overall"]["throughput"], True)
+    for operation, current in results["operations"].items():
+        previous = baseline.get("operations", {}).get(operation)
+        if not previous:
+            continue
+        check(f"{operation} p50_ms", current["p50_ms"], previous["p50_ms"], False)
+        check(f"{operation} p99_ms", current["p99_ms"], previous["p99_ms"], False)
+        error_rate = current["errors"] / current["requests"] if current["requests"] else 0.0
+        previous_rate = previous["errors"] / previous["requests"] if previous["requests"] else 0.0
+        if error_rate > previous_rate + 0.01:
+            regressions.append(f"{operation} error rate: {previous_rate:.1%} -> {error_rate:.1%}")
+    if "database" in results and "database" in baseline:
+        check(
+            "queries per request", results["database"]["queries_per_request"],
+            baseline["database"]["queries_per_request"], False
+        )
+    return regressions
+
+
+def print_report(results: Dict[str, Any]):
+    config = results["config"]
+    print(
+        f"{config['agents']} agents at {config['time_scale']}x "
+        f"(~{config['equivalent_agents']} real agents), {results['elapsed_seconds']}s"
+    )
+    print(f"{'operation':<12}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, row in [*results["operations"].items(), ("total", results["overall"])]:
+        print(
+            f"{name:<12}{row['requests']:>10}{row['errors']:>8}{row['throughput']:>10}"
+            f"{row['p50_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}"
+        )
+    database = results.get("database")
+    if database:
+        print(
+            f"database: {database['queries']} queries ({database['queries_per_second']}/s, "
+            f"{database['queries_per_request']} per request), {database['query_seconds']}s in SQL, "
+            f"{database['pool_wait_seconds']}s waiting for connections"
+        )
+
+
+def start_backend(args) -> subprocess.Popen:
+    env = {**os.environ, "DATABASE_URL": args.database_url}
+    # The schema normally comes from Alembic; a throwaway database just gets create_all
+    subprocess.run(
+        [sys.executable, "-c", "import app.models; from app.db.base import Base; from app.db.session import engine; "
+                               "Base.metadata.create_all(bind=engine)"],
+        env=env, check=True
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        env=env
+    )
+    args.url = f"http://127.0.0.1:{args.port}"
+    for _ in range(100):
+        try:
+            if httpx.get(f"{args.url}/health").status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("The backend did not start")
+
+
+def main():
+    args = parser.parse_args()
+    backend = start_backend(args) if args.start_backend else None
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if backend is not None:
+            backend.terminate()
+            backend.wait()
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"Regressed by more than {args.tolerance:.0%} against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
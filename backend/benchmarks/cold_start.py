@@ -0,0 +1,86 @@
+"""Cold start time of the API, from launching the server to its first healthy response.
+
+Starts `python main.py --production` repeatedly and reports how long each
+start took, along with the loading and warmup phases the worker reports in
+/health:
+
+    python -m benchmarks.cold_start --runs 5 --workers 4 --database-url sqlite:///./loadtest.db
+"""
+from typing import Any, Dict, List
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--runs", type=int, default=5, help="Number of starts to time")
+parser.add_argument("--workers", type=int, default=1, help="WEB_CONCURRENCY for the server")
+parser.add_argument("--database-url", default=None, help="DATABASE_URL for the server")
+parser.add_argument("--port", type=int, default=8766, help="Port to start the server on")
+parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for a start")
+parser.add_argument("--output", default=None, help="Write the results as JSON to this file")
+
+
+def start_once(args) -> Dict[str, Any]:
+    env = {**os.environ, "WEB_CONCURRENCY": str(args.workers)}
+    if args.database_url:
+        env["DATABASE_URL"] = args.database_url
+    url = f"http://127.0.0.1:{args.port}/health"
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "main.py", "--production", "--port", str(args.port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < args.timeout:
+            if process.poll() is not None:
+                raise SystemExit(f"The server exited with status {process.returncode}")
+            try:
+                response = httpx.get(url, timeout=1)
+                if response.status_code == 200:
+                    return {
+                        "seconds": round(time.perf_counter() - start, 3),
+                        "worker": response.json().get("startup_seconds", {}),
+                    }
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.05)
+        raise SystemExit(f"The server did not become healthy within {args.timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    args = parser.parse_args()
+    runs: List[Dict[str, Any]] = []
+    for i in range(args.runs):
+        run = start_once(args)
+        runs.append(run)
+        worker = run["worker"]
+        print(
+            f"run {i + 1}: healthy after {run['seconds']:.2f}s "
+            f"(worker: {worker.get('load', 0):.2f}s loading, {worker.get('warmup', 0):.2f}s warming up)"
+        )
+
+    seconds = [run["seconds"] for run in runs]
+    results = {
+        "workers": args.workers,
+        "median_seconds": round(statistics.median(seconds), 3),
+        "max_seconds": max(seconds),
+        "runs": runs,
+    }
+    print(f"median {results['median_seconds']:.2f}s, max {results['max_seconds']:.2f}s over {args.runs} runs")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""Micro-benchmarks for the planning and execution hot paths.
+
+Each benchmark runs against generated inventories of increasing size and
+reports the median and fastest time and the peak memory allocated by one
+run (measured separately with tracemalloc, which slows the code it traces).
+The LLM is replaced by a transport that streams a canned plan sized to the
+inventory, and the database is an in-memory SQLite, so the numbers only
+cover this code.
+
+    python -m benchmarks.hot_paths
+    python -m benchmarks.hot_paths --sizes 100,1000 --only plan_parser,execute_migration
+
+Save a run with --save-baseline and pass --baseline to exit with status 1
+when a benchmark got slower or allocated more than --tolerance beyond it.
+"""
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.models  # noqa: F401  (registers every table with Base.metadata)
+from app.db.base import Base
+from app.db.partitioning import tenant_key
+from app.models.agent import Agent
+from app.models.inventory import Inventory
+from app.models.migration import Migration, MigrationStatus
+from app.services.ai_service import AIService
+from app.services.ai_transport import TransportStream
+from app.services.migration_service import MigrationService
+from app.services.plan_parser import PlanStreamParser
+from benchmarks.inventory_factory import make_inventory
+
+# Size of the text deltas the Messages API streams
+CHUNK_CHARS = 64
+# Timings this small are dominated by noise and never count as regressions
+NOISE_FLOOR_MS = 0.05
+# Runs this slow are timed once; repeating them changes little but the wait
+SLOW_RUN_SECONDS = 1.0
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--sizes", default="100,500,1000,5000", help="Installed applications per inventory")
+parser.add_argument("--registry-keys", type=int, default=100000, help="Registry settings per inventory")
+parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark and size")
+parser.add_argument("--only", default="", help="Comma-separated benchmarks to run")
+parser.add_argument("--seed", type=int, default=1, help="Seed for the generated inventories")
+parser.add_argument("--output", default=None, help="Write the results as JSON to this file")
+parser.add_argument("--save-baseline", default=None, help="Store the results as the baseline in this file")
+parser.add_argument("--baseline", default=None, help="Compare against the baseline in this file")
+parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed regression against the baseline")
+
+
+def plan_response(inventory: Dict[str, Any]) -> str:
+    """A completion shaped like a real plan: one install task per application"""
+    applications = inventory["installed_applications"]
+    tasks = [{
+        "name": "Prepare target machine",
+        "order": 1,
+        "estimated_minutes": 15,
+        "instructions": "Join the domain, apply Windows updates and sign in as the user.",
+        "dependencies": []
+    }]
+    for i, application in enumerate(applications):
+        tasks.append({
+            "name": f"Install {application['name']}",
+            "order": i + 2,
+            "estimated_minutes": 10,
+            "instructions": f"Install {application['name']} {application['version']} from the software catalog.",
+            "dependencies": ["Prepare target machine"]
+        })
+    plan = {
+        "plan": "Migrate the user's applications, settings and data to the new machine.",
+        "tasks": tasks,
+        "hardware_spec": {"ram": {"recommendation_gb": 32}, "storage": {"recommendation_gb": 1024}},
+        "recommendations": {"cleanup": "Drop applications that haven't been used in 90 days."},
+        "manual_steps": ["Sign in to Microsoft 365", "Re-enter saved browser passwords"],
+        "estimated_minutes": 10 * len(applications) + 15,
+        "risks": [{"risk": "Licensed software needs reactivation", "mitigation": "Release licenses first"}]
+    }
+    return "Here is the migration plan:\n\n" + json.dumps(plan, indent=2)
+
+
+def plan_text(inventory: Dict[str, Any]) -> str:
+    """A plan written as prose, as handled by the text fallback"""
+    lines = ["Migration plan", ""]
+    for i, application in enumerate(inventory["installed_applications"]):
+        lines.append(f"Step {i + 1}. Install {application['name']} {application['version']}")
+        lines.append(f"   Download it from the vendor and check the license of {application['publisher']}.")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def chunks(text: str) -> List[str]:
+    return [text[i:i + CHUNK_CHARS] for i in range(0, len(text), CHUNK_CHARS)]
+
+
+class StubTransport:
+    """Streams a canned completion immediately"""
+
+    def __init__(self, text: str):
+        self.chunks = chunks(text)
+
+    @asynccontextmanager
+    async def stream(self, **request):
+        result = TransportStream()
+
+        async def text():
+            for chunk in self.chunks:
+                yield chunk
+            result.usage = {"input_tokens": 0, "output_tokens": 0}
+
+        result.text_stream = text()
+        yield result
+
+
+class BookkeepingMigrationService(MigrationService):
+    """Runs the scheduling, event log and progress writes but no tasks"""
+
+    async def _execute_task(self, task: dict, migration: Migration):
+        return
+
+
+class Context:
+    """Data shared by the benchmarks of one inventory size"""
+
+    def __init__(self, size: int, registry_keys: int, seed: int, loop: asyncio.AbstractEventLoop):
+        self.size = size
+        self.loop = loop
+        self.data = make_inventory(random.Random(seed), applications=size, registry_keys=registry_keys)
+        totals = {
+            "total_applications": size,
+            "total_data_size_mb": sum(location["size_mb"] for location in self.data["user_data_locations"]),
+        }
+        self.inventory = Inventory(**self.data, **totals)
+        self.response = plan_response(self.data)
+        self.tasks = json.loads(self.response[self.response.index("{"):])["tasks"]
+
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine)
+        self.sessions = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        with self.sessions() as db:
+            agent = Agent(agent_id=f"benchmark-{size}", computer_name=f"BENCH-{size}")
+            db.add(agent)
+            db.flush()
+            db.add(Inventory(agent_id=agent.id, company_id=tenant_key(None), **self.data, **totals))
+            db.commit()
+            self.agent_id = agent.id
+
+
+def bench_prepare_inventory_context(ctx: Context) -> Callable[[], Any]:
+    service = AIService(transport=StubTransport(""))
+    return lambda: json.dumps(service._prepare_inventory_context(ctx.inventory), indent=2)
+
+
+def bench_plan_parser(ctx: Context) -> Callable[[], Any]:
+    pieces = chunks(ctx.response)
+
+    def run():
+        plan_parser = PlanStreamParser()
+        for piece in pieces:
+            plan_parser.feed(piece)
+        return plan_parser.close()
+    return run
+
+
+def bench_extract_tasks_from_text(ctx: Context) -> Callable[[], Any]:
+    service = AIService(transport=StubTransport(""))
+    text = plan_text(ctx.data)
+    return lambda: service._extract_tasks_from_text(text)
+
+
+def bench_default_hardware_spec(ctx: Context) -> Callable[[], Any]:
+    return lambda: AIService._generate_default_hardware_spec(ctx.inventory)
+
+
+def bench_generate_migration_plan(ctx: Context) -> Callable[[], Any]:
+    service = AIService(transport=StubTransport(ctx.response))
+
+    async def on_task(task):
+        pass
+
+    def run():
+        with ctx.sessions() as db:
+            return ctx.loop.run_until_complete(service.generate_migration_plan(ctx.agent_id, db, on_task))
+    return run
+
+
+def bench_execute_migration(ctx: Context) -> Callable[[], Any]:
+    def run():
+        with ctx.sessions() as db:
+            # A fresh migration each run; a finished one would resume with nothing to do
+            migration = Migration(
+                name=f"Benchmark {ctx.size}",
+                source_agent_id=ctx.agent_id,
+                status=MigrationStatus.READY,
+                tasks=ctx.tasks
+            )
+            db.add(migration)
+            db.commit()
+            ctx.loop.run_until_complete(BookkeepingMigrationService(db).execute_migration(migration.id))
+    return run
+
+
+BENCHMARKS = {
+    "prepare_inventory_context": bench_prepare_inventory_context,
+    "plan_parser": bench_plan_parser,
+    "extract_tasks_from_text": bench_extract_tasks_from_text,
+    "default_hardware_spec": bench_default_hardware_spec,
+    "generate_migration_plan": bench_generate_migration_plan,
+    "execute_migration": bench_execute_migration,
+}
+
+
+def measure(run: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    # The first run warms up caches and lazy imports
+    start = time.perf_counter()
+    run()
+    timings = [time.perf_counter() - start]
+    if timings[0] < SLOW_RUN_SECONDS:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "min_ms": round(min(timings) * 1000, 3),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Descriptions of every benchmark that regressed by more than ``tolerance``"""
+    regressions = []
+    for name, current in results["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if not previous:
+            continue
+        for key in ("median_ms", "peak_kb"):
+            if key == "median_ms" and max(current[key], previous[key]) < NOISE_FLOOR_MS:
+                continue
+            if previous[key] and (current[key] - previous[key]) / previous[key] > tolerance:
+                change = (current[key] - previous[key]) / previous[key]
+                regressions.append(f"{name} {key}: {previous[key]} -> {current[key]} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    selected = [name.strip() for name in args.only.split(",") if name.strip()] or list(BENCHMARKS)
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    loop = asyncio.new_event_loop()
+    results = {
+        "config": {"sizes": sizes, "registry_keys": args.registry_keys, "repeat": args.repeat},
+        "benchmarks": {},
+    }
+    print(f"{'benchmark':<40}{'median ms':>12}{'min ms':>12}{'peak KiB':>12}")
+    for size in sizes:
+        ctx = Context(size, args.registry_keys, args.seed, loop)
+        for name in selected:
+            key = f"{name}[{size}]"
+            row = results["benchmarks"][key] = measure(BENCHMARKS[name](ctx), args.repeat)
+            print(f"{key:<40}{row['median_ms']:>12}{row['min_ms']:>12}{row['peak_kb']:>12}")
+    loop.close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"Regressed by more than {args.tolerance:.0%} against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
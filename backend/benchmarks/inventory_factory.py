@@ -0,0 +1,193 @@
+"""Synthetic agent payloads shaped like the Windows agent's
+
+Inventories follow agent/PCSuccessionAgent/Models/Models.cs with the field
+names the backend reads. Sizes default to a typical office PC; pass larger
+counts to build the inventories of heavily customised machines.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import random
+
+# (name, publisher) of software found on most corporate machines
+COMMON_APPLICATIONS = [
+    ("Microsoft 365 Apps for enterprise - en-us", "Microsoft Corporation"),
+    ("Microsoft Edge", "Microsoft Corporation"),
+    ("Microsoft Teams", "Microsoft Corporation"),
+    ("Microsoft OneDrive", "Microsoft Corporation"),
+    ("Microsoft Visual C++ 2015-2022 Redistributable (x64)", "Microsoft Corporation"),
+    ("Microsoft Visual C++ 2015-2022 Redistributable (x86)", "Microsoft Corporation"),
+    ("Microsoft .NET Runtime - 6.0.25 (x64)", "Microsoft Corporation"),
+    ("Microsoft Visual Studio Code", "Microsoft Corporation"),
+    ("Google Chrome", "Google LLC"),
+    ("Mozilla Firefox (x64 en-US)", "Mozilla"),
+    ("Adobe Acrobat Reader DC", "Adobe Systems Incorporated"),
+    ("Zoom", "Zoom Video Communications, Inc."),
+    ("Slack", "Slack Technologies Inc."),
+    ("7-Zip 23.01 (x64)", "Igor Pavlov"),
+    ("Notepad++ (64-bit x64)", "Notepad++ Team"),
+    ("VLC media player", "VideoLAN"),
+    ("Git", "The Git Development Community"),
+    ("Python 3.11.7 (64-bit)", "Python Software Foundation"),
+    ("Node.js", "Node.js Foundation"),
+    ("Docker Desktop", "Docker Inc."),
+    ("Cisco AnyConnect Secure Mobility Client", "Cisco Systems, Inc."),
+    ("FortiClient VPN", "Fortinet Technologies Inc"),
+    ("CrowdStrike Windows Sensor", "CrowdStrike, Inc."),
+    ("Sophos Endpoint Agent", "Sophos Limited"),
+    ("Dell Command | Update", "Dell Inc."),
+    ("HP Support Assistant", "HP Inc."),
+    ("Lenovo Vantage Service", "Lenovo Group Ltd."),
+    ("Intel(R) Graphics Driver", "Intel Corporation"),
+    ("NVIDIA Graphics Driver 546.01", "NVIDIA Corporation"),
+    ("Realtek High Definition Audio Driver", "Realtek Semiconductor Corp."),
+    ("Java 8 Update 391 (64-bit)", "Oracle Corporation"),
+    ("Citrix Workspace 2311", "Citrix Systems, Inc."),
+    ("TeamViewer", "TeamViewer"),
+    ("WinSCP 6.1.2", "Martin Prikryl"),
+    ("PuTTY release 0.80 (64-bit)", "Simon Tatham"),
+    ("Postman x86_64 10.21.0", "Postman"),
+    ("Tableau Desktop 2023.3", "Tableau Software"),
+    ("Power BI Desktop (x64)", "Microsoft Corporation"),
+    ("SAP GUI for Windows 8.00", "SAP SE"),
+    ("AutoCAD 2024 - English", "Autodesk"),
+]
+
+REGISTRY_ROOTS = [
+    r"HKCU\Software\Microsoft\Office\16.0\Common",
+    r"HKCU\Software\Microsoft\Windows\CurrentVersion\Explorer\Advanced",
+    r"HKCU\Control Panel\Desktop",
+    r"HKCU\Control Panel\International",
+    r"HKCU\Software\Microsoft\Edge\Main",
+    r"HKCU\Software\Policies\Microsoft\Windows",
+    r"HKCU\Environment",
+]
+
+DATA_LOCATIONS = ["Desktop", "Documents", "Downloads", "Pictures", "Videos", "Music", "OneDrive"]
+
+
+def make_application(rng: random.Random, index: int) -> Dict[str, Any]:
+    if index < len(COMMON_APPLICATIONS):
+        name, publisher = COMMON_APPLICATIONS[index]
+    else:
+        # Line-of-business software, plugins and drivers make up the long tail
+        name = f"Contoso Line of Business Tool {index:05d}"
+        publisher = rng.choice(["Contoso Ltd.", "Fabrikam, Inc.", "Northwind Traders", "Tailspin Toys"])
+    folder = name.split(" (")[0].split(" - ")[0]
+    product_code = "{%08X-%04X-%04X-%04X-%012X}" % (
+        rng.getrandbits(32), rng.getrandbits(16), rng.getrandbits(16), rng.getrandbits(16), rng.getrandbits(48)
+    )
+    return {
+        "name": name,
+        "version": f"{rng.randint(1, 30)}.{rng.randint(0, 9)}.{rng.randint(0, 9999)}",
+        "publisher": publisher,
+        "install_date": (datetime(2023, 1, 1) + timedelta(days=rng.randint(0, 700))).strftime("%Y%m%d"),
+        "install_location": f"C:\\Program Files\\{folder}",
+        "uninstall_string": f"MsiExec.exe /X{product_code}",
+        "registry_key": f"HKLM\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall\\{product_code}",
+    }
+
+
+def make_registry_settings(rng: random.Random, count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "path": f"{REGISTRY_ROOTS[i % len(REGISTRY_ROOTS)]}\\Key{i // len(REGISTRY_ROOTS):06d}",
+            "value_name": f"Value{i:06d}",
+            "value": str(rng.randint(0, 1 << 16)),
+            "type": rng.choice(["REG_SZ", "REG_DWORD", "REG_EXPAND_SZ"]),
+        }
+        for i in range(count)
+    ]
+
+
+def make_inventory(
+    rng: random.Random,
+    applications: int = 150,
+    registry_keys: int = 400,
+    certificates: int = 8,
+    vpn_connections: int = 1,
+    computer_name: Optional[str] = None,
+) -> Dict[str, Any]:
+    """A full discovery payload as posted to /api/v1/agents/inventory"""
+    computer_name = computer_name or f"PC-{rng.randint(0, 999999):06d}"
+    not_before = datetime(2024, 1, 1) + timedelta(days=rng.randint(0, 300))
+    return {
+        "system_info": {
+            "computer_name": computer_name,
+            "user_name": f"user{rng.randint(0, 99999):05d}",
+            "domain_name": "CONTOSO",
+            "os_version": rng.choice(["Windows 10 Pro 22H2", "Windows 11 Enterprise 23H2"]),
+            "is_64_bit": True,
+            "processor_count": rng.choice([4, 8, 12, 16]),
+            "total_memory_mb": rng.choice([8192, 16384, 32768]),
+            "processor_name": "Intel(R) Core(TM) i7-1185G7 @ 3.00GHz",
+            "manufacturer": rng.choice(["Dell Inc.", "HP", "LENOVO"]),
+            "model": rng.choice(["Latitude 7420", "EliteBook 840 G8", "ThinkPad T14 Gen 2"]),
+            "machine_name": computer_name,
+        },
+        "installed_applications": [make_application(rng, i) for i in range(applications)],
+        "registry_settings": make_registry_settings(rng, registry_keys),
+        "certificates": [
+            {
+                "subject": f"CN={computer_name}.contoso.com" if i == 0 else f"CN=Contoso Issuing CA {i}",
+                "issuer": "CN=Contoso Root CA",
+                "thumbprint": "%040X" % rng.getrandbits(160),
+                "not_before": not_before.isoformat(),
+                "not_after": (not_before + timedelta(days=365)).isoformat(),
+                "store_location": "CurrentUser" if i == 0 else "LocalMachine",
+                "store_name": "My" if i == 0 else "Root",
+                "has_private_key": i == 0,
+            }
+            for i in range(certificates)
+        ],
+        "vpn_connections": [
+            {
+                "name": f"Contoso VPN {i + 1}",
+                "type": "IKEv2",
+                "server_address": f"vpn{i + 1}.contoso.com",
+                "settings": {"split_tunneling": "true", "remember_credential": "true"},
+            }
+            for i in range(vpn_connections)
+        ],
+        "user_data_locations": [
+            {
+                "path": f"C:\\Users\\user\\{location}",
+                "type": "user_folder",
+                "size_mb": rng.randint(10, 20000),
+                "file_count": rng.randint(10, 50000),
+            }
+            for location in DATA_LOCATIONS
+        ],
+    }
+
+
+def make_metrics(rng: random.Random, inventory: Dict[str, Any], elapsed_minutes: float) -> Dict[str, Any]:
+    """A usage report as posted to /api/v1/agents/metrics every 15 minutes"""
+    now = datetime.utcnow()
+    used = inventory["installed_applications"][:20]
+    return {
+        "application_usage": [
+            {
+                "application_name": app["name"],
+                "executable_path": f"{app['install_location']}\\app.exe",
+                "first_seen": (now - timedelta(minutes=elapsed_minutes)).isoformat(),
+                "last_seen": now.isoformat(),
+                "total_minutes_used": round(rng.uniform(0, elapsed_minutes), 1),
+                "launch_count": rng.randint(0, 20),
+            }
+            for app in used
+            if rng.random() < 0.6
+        ],
+        "file_access": [
+            {
+                "file_path": f"C:\\Users\\user\\Documents\\Report {rng.randint(0, 999)}.docx",
+                "last_accessed": now.isoformat(),
+                "access_type": rng.choice(["Read", "Write"]),
+            }
+            for _ in range(rng.randint(0, 10))
+        ],
+        "system_performance": {
+            "cpu_usage_percent": round(rng.uniform(2, 60), 1),
+            "memory_usage_percent": round(rng.uniform(30, 90), 1),
+            "disk_usage_percent": round(rng.uniform(20, 95), 1),
+        },
+    }
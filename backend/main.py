@@ -1,13 +1,31 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
+from sqlalchemy import select
+import asyncio
 import logging
+import time
 
 from app.api.v1.api import api_router
+from app.core.cache import cache
 from app.core.config import settings
-from app.db.session import engine
+from app.core.metrics import (
+    STARTUP_SECONDS, MetricsMiddleware, render_metrics, run_background_refresh, track_background, worker_exited
+)
+from app.core.serving import prepare_metrics_dir, process_age, startup_seconds, web_workers
+from app.core.sql_profiler import SQLProfilerMiddleware
+from app.core.security import password_hasher
+from app.db.session import (
+    SessionLocal, client_key, engine, prime_pools, replica_router, run_replica_lag_checks
+)
 from app.db.base import Base
+from app.db.partitioning import ensure_partitions
+from app.models.agent import Agent
+from app.models.company import Company
+from app.services.mcp_client import check_server_command, get_mcp_pool, run_mcp_health_checks
+from app.services.migration_recovery import run_recovery_loop, running_migrations
+from app.services.wave_scheduler import run_wave_scheduler
 
 # Configure logging
 logging.basicConfig(
@@ -17,15 +35,63 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def warm_up(app: FastAPI):
+    """Prime connection pools and caches so the first requests don't pay for them"""
+    prime_pools()
+    # Compiles the lookup every agent request starts with into SQLAlchemy's statement cache
+    with SessionLocal() as db:
+        db.query(Agent).filter(Agent.agent_id == "").first()
+    password_hasher.warm_up()
+    app.openapi()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    load_seconds = process_age()
+    warmup_started = time.perf_counter()
     logger.info("Starting PC Succession API")
+    if settings.MCP_ENABLED:
+        check_server_command(settings.MCP_SERVER_COMMAND)
     # Create database tables
     # Base.metadata.create_all(bind=engine)  # Uncomment for initial setup
+    # Partitions of companies created before partitioning was set up
+    try:
+        with engine.begin() as connection:
+            ensure_partitions(connection, connection.execute(select(Company.id)).scalars().all())
+    except Exception as e:
+        logger.error(f"Could not check tenant partitions: {e}")
+    # Uvicorn only accepts connections for this worker once startup is done
+    try:
+        warm_up(app)
+    except Exception as e:
+        logger.error(f"Warmup failed: {e}")
+    startup_seconds.update(load=load_seconds, warmup=time.perf_counter() - warmup_started)
+    startup_seconds["total"] = startup_seconds["load"] + startup_seconds["warmup"]
+    for phase, seconds in startup_seconds.items():
+        STARTUP_SECONDS.labels(phase).set(seconds)
+    logger.info(
+        f"Ready in {startup_seconds['total']:.2f}s "
+        f"({startup_seconds['load']:.2f}s loading, {startup_seconds['warmup']:.2f}s warming up)"
+    )
+    # Resume migrations orphaned by a restarted or crashed worker
+    recovery = asyncio.create_task(run_recovery_loop())
+    # Start queued migration waves as capacity frees up
+    scheduler = asyncio.create_task(run_wave_scheduler())
+    health_checks = asyncio.create_task(run_mcp_health_checks())
+    replica_checks = asyncio.create_task(run_replica_lag_checks())
+    background_gauges = asyncio.create_task(run_background_refresh())
     yield
     # Shutdown
     logger.info("Shutting down PC Succession API")
+    recovery.cancel()
+    scheduler.cancel()
+    health_checks.cancel()
+    replica_checks.cancel()
+    background_gauges.cancel()
+    await get_mcp_pool().close()
+    password_hasher.shutdown()
+    worker_exited()
 
 
 app = FastAPI(
@@ -44,6 +110,25 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+
+app.add_middleware(MetricsMiddleware)
+if settings.SQL_PROFILING_ENABLED:
+    app.add_middleware(SQLProfilerMiddleware)
+
+track_background("migrations", running_migrations)
+track_background("password_hashes", lambda: password_hasher.pending)
+track_background("mcp_calls", lambda: get_mcp_pool().in_flight)
+
+
+@app.middleware("http")
+async def track_writes(request: Request, call_next):
+    # Reads that follow a client's own writes go to the primary for a while
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        replica_router.record_write(client_key(request))
+    return response
+
+
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -57,18 +142,54 @@ async def root():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, media_type = render_metrics()
+    return Response(body, media_type=media_type)
+
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "password_hashing": password_hasher.stats(),
+        "replicas": replica_router.status(),
+        "cache": cache.stats(),
+        "startup_seconds": {phase: round(seconds, 3) for phase, seconds in startup_seconds.items()}
+    }
 
 
 if __name__ == "__main__":
+    import argparse
+    import os
     import uvicorn
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True
-    )
+
+    parser = argparse.ArgumentParser(description="Run the PC Succession API")
+    parser.add_argument("--production", action="store_true",
+                        help="Preforked workers instead of the auto-reloading development server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    if args.production:
+        workers = web_workers()
+        # Workers split DATABASE_MAX_CONNECTIONS by the number of processes sharing it
+        os.environ["WEB_CONCURRENCY"] = str(workers)
+        # Each worker writes its metrics there, and /metrics on any worker reports them all
+        prepare_metrics_dir()
+        uvicorn.run(
+            "main:app",
+            host=args.host,
+            port=args.port,
+            workers=workers,
+            proxy_headers=True
+        )
+    else:
+        uvicorn.run(
+            "main:app",
+            host=args.host,
+            port=args.port,
+            reload=True
+        )
 
 
@@ -0,0 +1,111 @@
+"""Local stand-in for the PC Succession MCP server (mcp/src/index.ts) over stdio.
+
+It speaks the same newline-delimited JSON-RPC and exposes the same tools,
+but only sleeps instead of touching the machine. Point the backend at it to
+exercise task execution without a Windows target:
+
+    MCP_ENABLED=true MCP_SERVER_COMMAND="python mcp_stub_server.py --delay-ms 500 --host {host}"
+
+Requests are handled concurrently, like the real server, so responses can
+arrive out of order.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+
+TOOLS = [
+    "install_application",
+    "configure_system",
+    "transfer_files",
+    "install_certificates",
+    "configure_vpn",
+    "exec_powershell",
+    "verify_installation",
+]
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--host", default="localhost", help="Host name reported in tool output")
+parser.add_argument("--delay-ms", type=int, default=200, help="Time each tool call takes")
+parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of tool calls that fail")
+parser.add_argument("--fail-tools", default="", help="Comma-separated tools that always fail")
+args = parser.parse_args()
+
+write_lock = asyncio.Lock()
+
+
+async def send(message: dict):
+    async with write_lock:
+        sys.stdout.write(json.dumps(message) + "\n")
+        sys.stdout.flush()
+
+
+def tool_result(text: str, is_error: bool = False) -> dict:
+    result = {"content": [{"type": "text", "text": text}]}
+    if is_error:
+        result["isError"] = True
+    return result
+
+
+async def call_tool(params: dict) -> dict:
+    name = params.get("name")
+    if name not in TOOLS:
+        raise ValueError(f"Unknown tool: {name}")
+
+    await asyncio.sleep(args.delay_ms / 1000)
+    if name in args.fail_tools.split(",") or random.random() < args.error_rate:
+        return tool_result(f"Error: {name} failed on {args.host}", is_error=True)
+    return tool_result(f"{name} completed on {args.host} with {json.dumps(params.get('arguments') or {})}")
+
+
+async def handle(message: dict):
+    method = message.get("method")
+    params = message.get("params") or {}
+    try:
+        if method == "initialize":
+            result = {
+                "protocolVersion": params.get("protocolVersion"),
+                "capabilities": {"tools": {}},
+                "serverInfo": {"name": "pc-succession-mcp-stub", "version": "1.0.0"},
+            }
+        elif method == "ping":
+            result = {}
+        elif method == "tools/list":
+            result = {"tools": [{"name": name, "inputSchema": {"type": "object"}} for name in TOOLS]}
+        elif method == "tools/call":
+            result = await call_tool(params)
+        else:
+            await send({"jsonrpc": "2.0", "id": message["id"],
+                        "error": {"code": -32601, "message": f"Method not found: {method}"}})
+            return
+    except Exception as e:
+        await send({"jsonrpc": "2.0", "id": message["id"], "error": {"code": -32603, "message": str(e)}})
+        return
+    await send({"jsonrpc": "2.0", "id": message["id"], "result": result})
+
+
+async def main():
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=16 * 1024 * 1024)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    handlers = set()
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        message = json.loads(line)
+        # Notifications carry no id and need no response
+        if "id" not in message:
+            continue
+        handler = asyncio.create_task(handle(message))
+        handlers.add(handler)
+        handler.add_done_callback(handlers.discard)
+
+    if handlers:
+        await asyncio.wait(handlers)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
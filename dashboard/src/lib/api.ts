@@ -47,6 +47,10 @@ export const migrationsApi = {
   start: (id: string) => api.post(`/migrations/${id}/start`),
 }
 
+export const dashboardApi = {
+  summary: (params?: { company_id?: string }) => api.get('/dashboard/summary', { params }),
+}
+
 export const companiesApi = {
   list: () => api.get('/companies'),
   get: (id: string) => api.get(`/companies/${id}`),
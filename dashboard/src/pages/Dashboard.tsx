@@ -1,6 +1,7 @@
 import { useQuery } from '@tanstack/react-query'
 import { Link } from 'react-router-dom'
-import { agentsApi, migrationsApi } from '@/lib/api'
+import { agentsApi, dashboardApi, migrationsApi } from '@/lib/api'
+import type { DashboardSummary } from '@/types'
 import { Monitor, GitCompare, Activity, Clock } from 'lucide-react'
 
 export function Dashboard() {
@@ -14,9 +15,18 @@ export function Dashboard() {
     queryFn: () => migrationsApi.list().then(res => res.data),
   })
 
-  const activeAgents = agents?.filter((a: any) => a.status === 'active').length || 0
-  const activeMigrations = migrations?.filter((m: any) => m.status === 'in_progress').length || 0
-  const completedMigrations = migrations?.filter((m: any) => m.status === 'completed').length || 0
+  // Counted by the API; the lists above only feed the recent items below
+  const { data: summary } = useQuery<DashboardSummary>({
+    queryKey: ['dashboard-summary'],
+    queryFn: () => dashboardApi.summary().then(res => res.data),
+  })
+
+  const activeAgents = summary?.agents.by_status.active || 0
+  const activeMigrations = summary?.migrations.active.count || 0
+  const completedMigrations = summary?.migrations.by_status.completed || 0
+  const pendingMigrations = summary
+    ? summary.migrations.by_status.planning + summary.migrations.by_status.ready + summary.migrations.by_status.queued
+    : 0
 
   const stats = [
     {
@@ -42,7 +52,7 @@ export function Dashboard() {
     },
     {
       name: 'Pending Migrations',
-      value: migrations?.filter((m: any) => m.status === 'planning' || m.status === 'ready').length || 0,
+      value: pendingMigrations,
       icon: Clock,
       color: 'text-orange-600',
       bg: 'bg-orange-100',
@@ -89,7 +89,7 @@ export interface Migration {
   name: string
   source_agent_id: string
   target_agent_id: string | null
-  status: 'planning' | 'ready' | 'in_progress' | 'completed' | 'failed' | 'cancelled'
+  status: 'planning' | 'ready' | 'queued' | 'in_progress' | 'completed' | 'failed' | 'cancelled'
   migration_plan: any
   tasks: MigrationTask[]
   completed_tasks: any[]
@@ -106,6 +106,27 @@ export interface Migration {
   manual_steps: ManualStep[]
 }
 
+export interface DashboardSummary {
+  company_id: string | null
+  generated_at: string
+  agents: {
+    total: number
+    by_status: Record<Agent['status'], number>
+    stale: number
+    never_seen: number
+    stale_after_hours: number
+  }
+  migrations: {
+    total: number
+    by_status: Record<Migration['status'], number>
+    active: {
+      count: number
+      average_progress_percent: number
+    }
+  }
+  managed_data_mb: number
+}
+
 export interface MigrationTask {
   name: string
   order: number